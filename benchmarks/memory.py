@@ -0,0 +1,174 @@
+import sys
+sys.path.append('.')
+import gc
+import os
+import random
+import resource
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List
+
+import click
+from pydantic import BaseModel
+
+from benchmarks.synthetic import genomeSpec, synthetic_fasta
+from src.find_ideal_segments.encoding import TRACKS, build_lookup_table
+from src.find_ideal_segments.io.faidx import IndexedFasta
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.iterator import IterableSequenceNumRotateCalculation
+from src.find_ideal_segments.finder.file.base import selectedWindow
+
+STAGES = ['encoding', 'iterator_init', 'rotate_on_window', 'find_round', 'external_sort']
+# 外部排序的行数与序列长度之比，与 run.py 相同
+SORT_LINES_PER_BASE = 1 / 1000
+
+class stagePeak(BaseModel):
+    stage: str
+    length: int
+    elements: int
+    traced_peak: int
+    rss_peak: int
+    rss_exact: bool
+
+class stageBudget(BaseModel):
+    '''The allowed traced peak of a stage, `fixed + per_element * elements` bytes.'''
+    per_element: float
+    fixed: int = 1 << 20
+
+    def limit(self, elements: int) -> int:
+        return int(self.fixed + self.per_element * elements)
+
+# elements 为序列长度，external_sort 为行数
+DEFAULT_BUDGETS: Dict[str, stageBudget] = {
+    # 编码后的 uint8 序列，加上每块行的查找表结果和去掉换行的副本
+    'encoding': stageBudget(per_element=1.1, fixed=16 << 20),
+    # 输入已是 numpy 数组时不复制
+    'iterator_init': stageBudget(per_element=0.01),
+    # float64 窗口值，加上每块的临时数组
+    'rotate_on_window': stageBudget(per_element=8.5, fixed=64 << 20),
+    'find_round': stageBudget(per_element=1, fixed=64 << 20),
+    # 排序块内每行的模型和原始行
+    'external_sort': stageBudget(per_element=4096),
+}
+
+def reset_peak_rss() -> bool:
+    '''Reset VmHWM of the process (Linux), False when the peak RSS can not be reset.'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss() -> int:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss 在 Linux 上是 KB，在 macOS 上是字节
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def current_rss() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return peak_rss()
+
+@contextmanager
+def measure_peak(stage: str, length: int, peaks: List[stagePeak], elements: int = None):
+    '''Record the tracemalloc high-water mark and the peak RSS growth of the block into `peaks`.
+
+    numpy reports its buffers to tracemalloc, so the traced peak is exact and reproducible. The peak RSS also sees
+    memory outside of Python, it is exact only where VmHWM can be reset, otherwise it is the process peak so far.
+    '''
+    gc.collect()
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    traced_before = tracemalloc.get_traced_memory()[0]
+    rss_exact = reset_peak_rss()
+    rss_before = current_rss()
+    try:
+        yield
+    finally:
+        traced_peak = tracemalloc.get_traced_memory()[1] - traced_before
+        rss_peak = max(peak_rss() - rss_before, 0)
+        if started:
+            tracemalloc.stop()
+        peaks.append(stagePeak(
+            stage=stage, length=length, elements=length if elements is None else elements,
+            traced_peak=traced_peak, rss_peak=rss_peak, rss_exact=rss_exact
+        ))
+
+def profile_length(length: int, work_dir: str, window: int = 1000, sort_chunk_size: int = None) -> List[stagePeak]:
+    '''The peaks of every stage on one synthetic sequence of `length` bases.'''
+    peaks: List[stagePeak] = []
+    fasta_file = os.path.abspath(synthetic_fasta(genomeSpec(size=length, contigs=1), work_dir))
+    fasta = IndexedFasta(fasta_file)
+    seq_id, _ = next(iter(fasta.records()))
+    lookup_table = build_lookup_table(TRACKS['GC'])
+    with measure_peak('encoding', length, peaks):
+        arr = fasta.read(seq_id, lookup_table=lookup_table)
+    fasta.close()
+    with measure_peak('iterator_init', length, peaks):
+        rotator = IterableSequenceNumRotateCalculation(window, arr)
+    with measure_peak('rotate_on_window', length, peaks):
+        rotator.rotate_window_values = rotator.rotate_on_whole_sequence_()
+    with measure_peak('find_round', length, peaks):
+        rotator.find_next_ideal_windows(0.5)
+    del rotator, arr
+
+    lines = max(int(length * SORT_LINES_PER_BASE), 1000)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(dir=work_dir) as run_dir:
+        with JsonlIO(selectedWindow, file_path=f'{run_dir}/windows.jsonl') as windows:
+            windows.empty()
+            for _ in range(lines):
+                start_idx = rng.randrange(length)
+                diff = round(rng.random(), 4)
+                windows.add_line(selectedWindow(
+                    seq_id=seq_id, start_idx=start_idx, end_idx=start_idx + window,
+                    consecutive_window_length=1, score=0.5 + diff, score_diff=diff
+                ))
+            windows.flush()
+            with measure_peak('external_sort', length, peaks, elements=lines):
+                windows.sort_by_fileds(('score_diff', 'start_idx'), chunk_size=sort_chunk_size or lines)
+    return peaks
+
+def check_budgets(peaks: List[stagePeak], budgets: Dict[str, stageBudget] = DEFAULT_BUDGETS) -> List[str]:
+    '''The stages whose traced peak is over budget.'''
+    return [
+        f'{i.stage} at length {i.length}: {i.traced_peak / 2**20:.1f} MB, budget {budgets[i.stage].limit(i.elements) / 2**20:.1f} MB'
+        for i in peaks if i.stage in budgets and i.traced_peak > budgets[i.stage].limit(i.elements)
+    ]
+
+@click.command()
+@click.option('-l', '--length', 'lengths', required=False, multiple=True, type=int, default=[10**6, 10**7], help='The sequence lengths to profile, can be given more than once, default=1000000 and 10000000')
+@click.option('-W', '--window', 'window', required=False, default=1000, type=int, help='The window size, default=1000')
+@click.option('-w', '--work-dir', 'work_dir', required=False, default=None, help='The directory of the generated sequences, reused by later runs, default is a temporary directory')
+def main(lengths, window, work_dir):
+    '''Report the traced and RSS peak of every stage per sequence length, exit with 1 when a stage is over budget.'''
+    peaks = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for length in lengths:
+            peaks += profile_length(length, work_dir or temp_dir, window)
+    click.echo(f'{"stage":<18}{"length":>12}{"traced MB":>12}{"RSS MB":>12}{"bytes/elem":>12}')
+    for i in peaks:
+        rss = f'{i.rss_peak / 2**20:.1f}' + ('' if i.rss_exact else '*')
+        click.echo(f'{i.stage:<18}{i.length:>12}{i.traced_peak / 2**20:>12.1f}{rss:>12}{i.traced_peak / max(i.elements, 1):>12.2f}')
+    if not all(i.rss_exact for i in peaks):
+        click.echo('* the peak RSS of the process so far, VmHWM can not be reset here')
+    over_budget = check_budgets(peaks)
+    if over_budget:
+        click.echo('Over budget:\n  ' + '\n  '.join(over_budget), err=True)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import sys
+sys.path.append('.')
+import json
+import os
+import pathlib
+import platform
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import click
+import numpy as np
+from pydantic import BaseModel
+
+from benchmarks.synthetic import genomeSpec, synthetic_fasta
+from src.find_ideal_segments.encoding import TRACKS, build_lookup_table
+from src.find_ideal_segments.io.faidx import IndexedFasta
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.iterator import IterableSequenceNumRotateCalculation
+from src.find_ideal_segments.finder.file.base import selectedWindow
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+
+PROFILES: Dict[str, genomeSpec] = {
+    '1M': genomeSpec(size=10**6, contigs=10),
+    '10M': genomeSpec(size=10**7, contigs=20, n_fraction=0.02, soft_mask_fraction=0.1),
+    '100M': genomeSpec(size=10**8, contigs=25, gc_sd=0.08, n_fraction=0.03, soft_mask_fraction=0.3),
+    '1G': genomeSpec(size=10**9, contigs=50, n_fraction=0.05, gap_length=50_000, soft_mask_fraction=0.5),
+    # 与人类基因组相近: 24 条染色体加上未定位的小序列
+    '3G': genomeSpec(size=3 * 10**9, contigs=200, n_fraction=0.05, gap_length=100_000, soft_mask_fraction=0.5),
+}
+STAGES = ['fasta2jsonl', 'index', 'encoding', 'rotate_on_window', 'finder_rounds', 'external_sort', 'decypher']
+# fasta2jsonl 把每个碱基写成 json 字符，更大的基因组只会测量磁盘
+JSONL_SIZE_LIMIT = 10**7
+DEFAULT_BASELINE = str(pathlib.Path(__file__).parent / 'baseline.json')
+
+class benchmarkResult(BaseModel):
+    profile: str
+    spec: genomeSpec
+    stages: Dict[str, float]
+    environment: Dict[str, str]
+
+class timedFinder(findIdealGCContentSegmentsonFasta):
+    '''A GC finder that times the decypher of the result apart from the rounds.'''
+    decypher_seconds = 0.0
+
+    def decypher_result(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().decypher_result(*args, **kwargs)
+        finally:
+            self.decypher_seconds += time.perf_counter() - start
+
+def environment() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': str(os.cpu_count()),
+    }
+
+def run_benchmark(profile: str, spec: genomeSpec, work_dir: str, window: int = 1000, top: int = 1000, ideal_value: float = 0.5) -> benchmarkResult:
+    '''Generate (or reuse) the genome of `spec` in `work_dir` and time every stage on it.'''
+    stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(name: str):
+        start = time.perf_counter()
+        yield
+        stages[name] = stages.get(name, 0) + time.perf_counter() - start
+
+    fasta_file = os.path.abspath(synthetic_fasta(spec, work_dir))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(dir=work_dir) as run_dir:
+        # 窗口值缓存 .rotate_windows 写在当前目录，每次都从空目录开始
+        os.chdir(run_dir)
+        try:
+            if spec.size <= JSONL_SIZE_LIMIT:
+                with stage('fasta2jsonl'):
+                    findIdealGCContentSegmentsonFasta.fasta2jsonl(fasta_file, 'genome.jsonl')
+
+            pathlib.Path(f'{fasta_file}.fai').unlink(missing_ok=True)
+            with stage('index'):
+                fasta = IndexedFasta(fasta_file)
+
+            lookup_table = build_lookup_table(TRACKS['GC'])
+            for seq_id, _ in fasta.records():
+                with stage('encoding'):
+                    arr = fasta.read(seq_id, lookup_table=lookup_table)
+                with stage('rotate_on_window'):
+                    IterableSequenceNumRotateCalculation(window, arr).rotate_on_whole_sequence_()
+            fasta.close()
+
+            finder = timedFinder(fasta_file=fasta_file, window=window, top=top, ideal_value=ideal_value)
+            with stage('finder_rounds'):
+                finder.find(save_path='result.jsonl')
+            stages['finder_rounds'] -= finder.decypher_seconds
+            stages['decypher'] = finder.decypher_seconds
+
+            lines = min(max(spec.size // 1000, 1000), 10**6)
+            rng = random.Random(spec.seed)
+            with JsonlIO(selectedWindow, file_path='windows.jsonl') as windows:
+                windows.empty()
+                for i in range(lines):
+                    start_idx = rng.randrange(spec.size)
+                    diff = round(rng.random(), 4)
+                    windows.add_line(selectedWindow(
+                        seq_id=f'chr{rng.randrange(spec.contigs) + 1}', start_idx=start_idx, end_idx=start_idx + window,
+                        consecutive_window_length=1, score=ideal_value + diff, score_diff=diff
+                    ))
+                windows.flush()
+                with stage('external_sort'):
+                    # 至少 4 个排序块，测量归并
+                    windows.sort_by_fileds(('score_diff', 'start_idx'), chunk_size=lines // 4 + 1)
+        finally:
+            os.chdir(cwd)
+    return benchmarkResult(
+        profile=profile,
+        spec=spec,
+        stages={name: round(stages[name], 4) for name in STAGES if name in stages},
+        environment=environment()
+    )
+
+def load_baseline(baseline_file: str) -> Dict[str, Dict[str, float]]:
+    if not pathlib.Path(baseline_file).exists():
+        return {}
+    with open(baseline_file) as f:
+        return json.load(f)['profiles']
+
+def save_baseline(baseline_file: str, results: List[benchmarkResult]) -> None:
+    profiles = load_baseline(baseline_file)
+    for result in results:
+        profiles[result.profile] = result.stages
+    with open(baseline_file, 'w') as f:
+        json.dump({'environment': environment(), 'profiles': profiles}, f, indent=2)
+        f.write('\n')
+
+def compare(result: benchmarkResult, baseline: Dict[str, Dict[str, float]], tolerance: float = 0.25, min_seconds: float = 0.05) -> List[str]:
+    '''The stages slower than the baseline by more than `tolerance`, differences under `min_seconds` are noise.'''
+    regressions = []
+    for name, seconds in result.stages.items():
+        base = baseline.get(result.profile, {}).get(name)
+        if base is not None and seconds > base * (1 + tolerance) and seconds - base > min_seconds:
+            regressions.append(f'{result.profile}/{name}: {seconds:.3f}s, baseline {base:.3f}s (+{(seconds / base - 1) * 100 if base else float("inf"):.0f}%)')
+    return regressions
+
+@click.command()
+@click.option('-p', '--profile', 'profiles', required=False, multiple=True, default=['1M', '10M'], type=click.Choice(list(PROFILES)), help='The synthetic genome profiles to run, can be given more than once, default="1M" and "10M"')
+@click.option('-w', '--work-dir', 'work_dir', required=False, default=None, help='The directory of the generated genomes, reused by later runs, default is a temporary directory')
+@click.option('-b', '--baseline', 'baseline_file', required=False, default=DEFAULT_BASELINE, help='The baseline json file, default="benchmarks/baseline.json"')
+@click.option('-u', '--update-baseline', 'update_baseline', is_flag=True, default=False, help='Save the timings of this run as the baseline of the profiles')
+@click.option('-t', '--tolerance', 'tolerance', required=False, default=0.25, type=float, help='The allowed slowdown of a stage against the baseline, default=0.25')
+@click.option('-o', '--output', 'output_file', required=False, default=None, help='Write the results of this run to a json file')
+def main(profiles, work_dir, baseline_file, update_baseline, tolerance, output_file):
+    '''Time every stage on deterministic synthetic genomes and compare them with the baseline.'''
+    baseline = load_baseline(baseline_file)
+    results = []
+    regressions = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for profile in profiles:
+            result = run_benchmark(profile, PROFILES[profile], work_dir or temp_dir)
+            results.append(result)
+            click.echo(f'{profile}:')
+            for name, seconds in result.stages.items():
+                base = baseline.get(profile, {}).get(name)
+                click.echo(f'  {name:<18}{seconds:>10.3f}s' + ('' if base is None else f'  (baseline {base:.3f}s)'))
+            regressions += compare(result, baseline, tolerance)
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump([i.model_dump() for i in results], f, indent=2)
+    if update_baseline:
+        save_baseline(baseline_file, results)
+        click.echo(f'Baseline saved in "{baseline_file}".')
+    elif regressions:
+        click.echo('Regressions:\n  ' + '\n  '.join(regressions), err=True)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import pathlib
+
+import numpy as np
+from pydantic import BaseModel
+
+# 每次生成的碱基数，为行宽的整数倍时写入的块不会打断行
+CHUNK_LINES = 1 << 16
+BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+class genomeSpec(BaseModel):
+    '''A synthetic genome, the same spec and seed always give the same fasta.
+
+    The contig lengths follow a log-normal distribution. The GC content of every `region_length` region is drawn
+    from a normal distribution around `gc` (isochores), `n_fraction` of the bases are runs of `N` with an
+    exponential length around `gap_length`, and `soft_mask_fraction` of the bases are lowercase runs.
+    '''
+    size: int
+    contigs: int = 1
+    gc: float = 0.41
+    gc_sd: float = 0.05
+    region_length: int = 100_000
+    n_fraction: float = 0.0
+    gap_length: int = 10_000
+    soft_mask_fraction: float = 0.0
+    mask_length: int = 300
+    line_width: int = 60
+    seed: int = 0
+
+    def digest(self) -> str:
+        return hashlib.sha1(self.model_dump_json().encode()).hexdigest()[:12]
+
+def contig_lengths(spec: genomeSpec, rng: np.random.Generator) -> np.ndarray:
+    weights = rng.lognormal(0, 1, spec.contigs)
+    lengths = np.maximum((weights / weights.sum() * spec.size).astype(np.int64), 1)
+    # 舍入的误差加到最长的序列上，总长度与 size 相同
+    lengths[np.argmax(lengths)] += spec.size - lengths.sum()
+    return lengths
+
+def random_runs(rng: np.random.Generator, length: int, fraction: float, mean_length: int) -> np.ndarray:
+    '''Runs `[start, end)` covering about `fraction` of `length` bases.'''
+    if fraction <= 0 or length == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    count = rng.poisson(fraction * length / mean_length)
+    starts = rng.integers(0, length, count)
+    ends = np.minimum(starts + rng.exponential(mean_length, count).astype(np.int64) + 1, length)
+    return np.stack([starts, ends], axis=1)
+
+def generate_bases(spec: genomeSpec, rng: np.random.Generator, length: int) -> np.ndarray:
+    '''The uint8 bases of `length` positions, one GC content per region.'''
+    regions = -(-length // spec.region_length)
+    gc = np.clip(rng.normal(spec.gc, spec.gc_sd, regions), 0, 1).repeat(spec.region_length)[:length]
+    u = rng.random(length)
+    # u < gc 时为 G/C，否则为 A/T，再各自平分
+    idx = np.where(u < gc, np.where(u < gc / 2, 2, 1), np.where(u < gc + (1 - gc) / 2, 0, 3))
+    bases = BASES[idx]
+    for start, end in random_runs(rng, length, spec.soft_mask_fraction, spec.mask_length):
+        bases[start:end] |= 0x20  # 小写字母比大写多 0x20，重叠的区域不会重复修改
+    for start, end in random_runs(rng, length, spec.n_fraction, spec.gap_length):
+        bases[start:end] = ord('N')
+    return bases
+
+def write_fasta(spec: genomeSpec, fasta_file: str) -> str:
+    '''Write the genome of `spec` into `fasta_file` chunk by chunk, the memory use does not depend on the size.'''
+    rng = np.random.default_rng(spec.seed)
+    chunk_size = spec.line_width * CHUNK_LINES
+    tmp_file = f'{fasta_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        for i, length in enumerate(contig_lengths(spec, rng)):
+            f.write(f'>chr{i + 1}\n'.encode())
+            for start in range(0, length, chunk_size):
+                bases = generate_bases(spec, rng, min(chunk_size, length - start))
+                lines = len(bases) // spec.line_width
+                block = np.empty((lines, spec.line_width + 1), dtype=np.uint8)
+                block[:, :-1] = bases[:lines * spec.line_width].reshape(lines, spec.line_width)
+                block[:, -1] = ord('\n')
+                f.write(block.tobytes())
+                # 只有序列的最后一行可能不满
+                rest = bases[lines * spec.line_width:]
+                if len(rest):
+                    f.write(rest.tobytes() + b'\n')
+    os.replace(tmp_file, fasta_file)
+    return fasta_file
+
+def synthetic_fasta(spec: genomeSpec, work_dir: str) -> str:
+    '''The fasta of `spec` in `work_dir`, generated only when it does not exist yet.'''
+    pathlib.Path(work_dir).mkdir(parents=True, exist_ok=True)
+    fasta_file = f'{work_dir}/synthetic.{spec.digest()}.fa'
+    if not pathlib.Path(fasta_file).exists():
+        write_fasta(spec, fasta_file)
+    return fasta_file
@@ -0,0 +1,136 @@
+import pathlib
+from typing import Optional
+
+import numpy as np
+
+from .io.atomic import atomic_path
+
+# 直方图的区间数，区间在最小值和最大值之间等分
+CATALOG_BINS = 512
+# 统计时每次读取的窗口值数量，内存映射的窗口值不会一次读入内存
+CATALOG_BUILD_CHUNK_SIZE = 1 << 22
+
+
+def summary_file_of(cache_file: str) -> str:
+    """窗口值缓存文件对应的概要文件，保存在缓存文件旁边"""
+    return f'{cache_file.removesuffix(".npy")}.summary.npz'
+
+
+class WindowValueSummary:
+    """整条序列窗口值的数量、最小值、最大值、总和以及直方图
+
+    直方图的区间由 np.linspace(最小值, 最大值, bins + 1) 给出，每个窗口值落在的区间由与区间边界的比较决定，
+    因此由直方图得到的差异下界与逐个计算差异的浮点运算一致。保存为 npz 文件:
+        count, min, max, sum: 窗口值的数量、最小值、最大值和总和
+        counts: 每个区间的窗口值数量
+    """
+
+    def __init__(self, count: int, min: float, max: float, sum: float, counts: np.ndarray):
+        self.count = count
+        self.min = min
+        self.max = max
+        self.sum = sum
+        self.counts = counts
+
+    @property
+    def edges(self) -> np.ndarray:
+        return np.linspace(self.min, self.max, len(self.counts) + 1)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else float('nan')
+
+    @classmethod
+    def build(cls, values: np.ndarray, bins: int = CATALOG_BINS) -> 'WindowValueSummary':
+        """
+        由整条序列的窗口值生成概要，分块读取窗口值
+
+        Args:
+            values: 窗口值，可以是内存映射的数组
+            bins: 直方图的区间数
+
+        Returns:
+            WindowValueSummary
+        """
+        chunks = range(0, len(values), CATALOG_BUILD_CHUNK_SIZE)
+        if not len(chunks):
+            return cls(0, float('inf'), float('-inf'), 0.0, np.zeros(bins, dtype=np.int64))
+        low, high, total = float('inf'), float('-inf'), 0.0
+        for start in chunks:
+            chunk = np.asarray(values[start:start + CATALOG_BUILD_CHUNK_SIZE])
+            low, high, total = min(low, float(chunk.min())), max(high, float(chunk.max())), total + float(chunk.sum())
+        counts = np.zeros(bins, dtype=np.int64)
+        for start in chunks:
+            counts += np.histogram(values[start:start + CATALOG_BUILD_CHUNK_SIZE], bins=bins, range=(low, high))[0]
+        return cls(len(values), low, high, total, counts)
+
+    @classmethod
+    def load(cls, path: str) -> 'WindowValueSummary':
+        with np.load(path) as data:
+            return cls(int(data['count']), float(data['min']), float(data['max']), float(data['sum']), data['counts'])
+
+    def save(self, path: str) -> None:
+        """先写入临时文件再替换，其他进程不会读到不完整的概要"""
+        with atomic_path(path) as tmp_path, open(tmp_path, 'wb') as f:
+            np.savez(f, count=self.count, min=self.min, max=self.max, sum=self.sum, counts=self.counts)
+
+    @staticmethod
+    def is_fresh(path: str, cache_file: str) -> bool:
+        """概要存在且不早于窗口值缓存文件"""
+        return pathlib.Path(path).exists() and pathlib.Path(path).stat().st_mtime >= pathlib.Path(cache_file).stat().st_mtime
+
+    def quantile(self, q: float) -> float:
+        """
+        由直方图估计的分位数，区间内按均匀分布插值
+
+        Args:
+            q: 0 到 1 之间的分位
+
+        Returns:
+            分位数，没有窗口值时为 nan
+        """
+        if not self.count:
+            return float('nan')
+        cumulative = np.cumsum(self.counts)
+        target = q * self.count
+        i = min(int(np.searchsorted(cumulative, target)), len(self.counts) - 1)
+        before = cumulative[i - 1] if i else 0
+        fraction = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        edges = self.edges
+        return float(min(max(edges[i] + fraction * (edges[i + 1] - edges[i]), self.min), self.max))
+
+    def diff_lower_bound(self, ideal_value: float) -> float:
+        """
+        窗口值与理想值的最小差异的下界，即最近的非空区间与理想值的距离
+
+        Args:
+            ideal_value: 理想值
+
+        Returns:
+            差异下界，没有窗口值时为 inf
+        """
+        if not self.count:
+            return float('inf')
+        edges = self.edges
+        distances = np.maximum(np.maximum(edges[:-1] - ideal_value, ideal_value - edges[1:]), 0)
+        return float(distances[self.counts > 0].min())
+
+
+def load_window_value_summary(cache_file: str) -> Optional[WindowValueSummary]:
+    """
+    读取窗口值缓存文件旁边的概要，不存在或早于缓存文件时由缓存的窗口值生成并保存
+
+    Args:
+        cache_file: 窗口值缓存文件
+
+    Returns:
+        WindowValueSummary，缓存文件不存在时为 None
+    """
+    if not pathlib.Path(cache_file).exists():
+        return None
+    path = summary_file_of(cache_file)
+    if WindowValueSummary.is_fresh(path, cache_file):
+        return WindowValueSummary.load(path)
+    summary = WindowValueSummary.build(np.load(cache_file, mmap_mode='r'))
+    summary.save(path)
+    return summary
@@ -44,7 +44,10 @@ class SequenceNumRotateCalculation:
         ideal_value: float, 
         window_apply_method: Literal['sum', 'mean'] = 'mean',
         filter_out_partial_overlapped_result: bool = True,
-        cached_rotate_window_values: np.ndarray = None
+        cached_rotate_window_values: np.ndarray = None,
+        chunk_size: int = 10**6,
+        chunk_value_ranges: Optional[np.ndarray] = None,
+        max_diff: float = float('inf')
     ) -> Tuple[float, List[Tuple[int, int]]]:
         """
         查找最接近理想值的连续窗口
@@ -53,13 +56,18 @@ class SequenceNumRotateCalculation:
             ideal_value: 理想值
             window_apply_method: 窗口计算方法
             filter_out_partial_overlapped_result: 是否过滤部分重叠的结果
+            chunk_size: 分块处理时每块大小
+            chunk_value_ranges: 每块窗口值的 (最小值, 最大值)，例如由 WindowValuePyramid 得到，不可能比当前最小差异更接近理想值的块不再计算
+            max_diff: 已知的最小差异的上界，例如其他子序列中的窗口，下界超过它的块不再计算
             
         Returns:
-            列表，每个元素为(起始索引, 连续窗口数量)
+            列表，每个元素为(起始索引, 连续窗口数量)，所有块都被跳过时为空列表
         """
         # 对于超大数组，使用分块处理
         return self._find_ideal_windows_chunked(
-                ideal_value, window_apply_method, filter_out_partial_overlapped_result, cached_rotate_window_values=cached_rotate_window_values
+                ideal_value, window_apply_method, filter_out_partial_overlapped_result, chunk_size=chunk_size,
+                cached_rotate_window_values=cached_rotate_window_values,
+                chunk_value_ranges=chunk_value_ranges, max_diff=max_diff
             )
             
         
@@ -69,7 +77,9 @@ class SequenceNumRotateCalculation:
         window_apply_method: Literal['sum', 'mean'] = 'mean',
         filter_out_partial_overlapped_result: bool = True,
         chunk_size: int = 10**6,
-        cached_rotate_window_values: np.ndarray = None
+        cached_rotate_window_values: np.ndarray = None,
+        chunk_value_ranges: Optional[np.ndarray] = None,
+        max_diff: float = float('inf')
     ) ->  Tuple[float, List[Tuple[int, int]]]:
         """
         分块处理大数组，查找理想窗口
@@ -79,6 +89,8 @@ class SequenceNumRotateCalculation:
             window_apply_method: 窗口计算方法
             filter_out_partial_overlapped_result: 是否过滤部分重叠结果
             chunk_size: 每块大小
+            chunk_value_ranges: 每块窗口值的 (最小值, 最大值)
+            max_diff: 已知的最小差异的上界
             
         Returns:
             列表，每个元素为(起始索引, 连续窗口数量)
@@ -93,14 +105,19 @@ class SequenceNumRotateCalculation:
         for chunk_idx in range(total_chunks):
             start_idx = chunk_idx*chunk_size
             end_idx = min(start_idx + chunk_size + self.window - 1, self.length)
-            
-            # 提取当前块
-            chunk_arr = self.arr[start_idx:end_idx].astype(np.float64)
+
+            if chunk_value_ranges is not None:
+                # 块内窗口值的范围与理想值的距离超过当前最小差异时，块内不会有更好或相同的窗口
+                low, high = chunk_value_ranges[chunk_idx]
+                if max(low - ideal_value, ideal_value - high, 0) > min(min_diff, max_diff):
+                    continue
 
             # 计算当前块的窗口值
             if cached_rotate_window_values is not None:
-                chunk_window_values = cached_rotate_window_values[start_idx:start_idx+len(chunk_arr)-self.window+1]
+                chunk_window_values = cached_rotate_window_values[start_idx:end_idx-self.window+1]
             else:
+                # 提取当前块
+                chunk_arr = self.arr[start_idx:end_idx].astype(np.float64)
                 chunk_window_values = self.rotate_on_window(arr=chunk_arr, method=window_apply_method)
             
             # 计算与理想值的差异
@@ -116,14 +133,31 @@ class SequenceNumRotateCalculation:
                 # 找到当前块中的候选索引
                 chunk_candidates = np.where(chunk_diff == chunk_min_diff)[0]
                 closest_score = chunk_window_values[chunk_candidates[0]]
-                # 调整索引到原始数组
-                adjusted_indices = chunk_candidates + start_idx
-                all_candidates.extend(adjusted_indices)
+                # 调整索引到原始数组，按连续的游程保存，很长的序列上并列的窗口很多时也不会逐个保存索引
+                all_candidates.append(self._consecutive_runs(chunk_candidates + start_idx))
         
         if not all_candidates:
             return []
         
-        return float(closest_score), self._group_consecutive_indices(np.array(all_candidates), filter_out_partial_overlapped_result)
+        return float(closest_score), self._group_consecutive_runs(np.concatenate(all_candidates), filter_out_partial_overlapped_result)
+
+    @staticmethod
+    def _consecutive_runs(indices: np.ndarray) -> np.ndarray:
+        """
+        将递增的索引分为连续的游程
+
+        Args:
+            indices: 递增的索引数组
+
+        Returns:
+            int64 数组，shape 为 (游程数, 2)，每行为(起始索引, 连续窗口数量)
+        """
+        if len(indices) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        split_points = np.flatnonzero(np.diff(indices) > 1) + 1
+        starts = indices[np.concatenate(([0], split_points))]
+        ends = indices[np.concatenate((split_points - 1, [len(indices) - 1]))] + 1
+        return np.stack([starts, ends - starts], axis=1).astype(np.int64)
     
     def _group_consecutive_indices(
         self, 
@@ -140,18 +174,33 @@ class SequenceNumRotateCalculation:
         Returns:
             列表，每个元素为(起始索引, 连续窗口数量)
         """
-        if len(indices) == 0:
+        return self._group_consecutive_runs(self._consecutive_runs(np.asarray(indices)), filter_out_partial_overlaped)
+
+    def _group_consecutive_runs(
+        self,
+        runs: np.ndarray,
+        filter_out_partial_overlaped: bool
+    ) -> List[Tuple[int, int]]:
+        """
+        合并首尾相接的游程（例如跨越分块边界的游程）
+
+        Args:
+            runs: 按起始索引递增的游程数组，每行为(起始索引, 连续窗口数量)
+            filter_out_partial_overlaped: 是否过滤部分重叠结果
+
+        Returns:
+            列表，每个元素为(起始索引, 连续窗口数量)
+        """
+        if len(runs) == 0:
             return []
-            
-        # 计算索引差分
-        diffs = np.diff(indices)
-        # 找到非连续点
-        split_points = np.where(diffs > 1)[0]
-        # 分组
-        groups = np.split(indices, split_points + 1)
-        
+
+        starts, ends = runs[:, 0], runs[:, 0] + runs[:, 1]
+        split_points = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+        group_starts = starts[np.concatenate(([0], split_points))]
+        group_ends = ends[np.concatenate((split_points - 1, [len(runs) - 1]))]
+
         # 生成结果
-        result = [(int(group[0]), len(group)) for group in groups]
+        result = [(int(start), int(end - start)) for start, end in zip(group_starts, group_ends)]
         
         # 过滤重叠窗口
         if filter_out_partial_overlaped:
@@ -169,6 +218,160 @@ class SequenceNumRotateCalculation:
             
         return result
 
+    def find_ideal_variable_windows(
+        self,
+        ideal_value: float,
+        min_window: int,
+        max_window: int,
+        top: int = 1,
+        window_apply_method: Literal['sum', 'mean'] = 'mean',
+        window_step: int = 1,
+        filter_out_overlapped_result: bool = True,
+        block_size: int = 1 << 20,
+        max_cells: int = 1 << 24
+    ) -> List[Tuple[int, int, float]]:
+        """
+        在 [min_window, max_window] 范围内的所有窗口长度上查找最接近理想值的片段
+
+        所有长度共用一个前缀和。(起始, 长度) 平面分为若干个起始位置 × 长度的小格，小格内窗口值的上下界由前缀和分段的
+        最小值和最大值给出。每一轮按下界从小到大每次向量化计算约 block_size 个组合，找到与理想值差异最小、且与已选片段
+        不重叠的片段，下界大于当前最小差异的小格不再计算。
+
+        Args:
+            ideal_value: 理想值
+            min_window: 最小窗口大小
+            max_window: 最大窗口大小，超过数组长度时取数组长度
+            top: 返回的片段数量
+            window_apply_method: 窗口计算方法
+            window_step: 窗口长度的步长
+            filter_out_overlapped_result: 是否过滤重叠的片段，不过滤时只排除已选的 (起始, 长度)
+            block_size: 每次计算的 (起始, 长度) 组合数量
+            max_cells: 小格数量的上限，每个小格的上下界占用 12 字节
+
+        Returns:
+            列表，每个元素为(起始索引, 窗口长度, 窗口值)，按与理想值的差异从小到大排序，差异相同时按起始索引和长度排序
+        """
+        max_window = min(max_window, self.length)
+        assert 1 <= min_window <= max_window, 'min_window must be between 1 and the smaller of max_window and the length of the array'
+        lengths = np.arange(min_window, max_window + 1, window_step, dtype=np.int64)
+        prefix = np.zeros(self.length + 1, dtype=np.float64)
+        np.cumsum(self.arr, dtype=np.float64, out=prefix[1:])
+        n_starts = self.length - min_window + 1
+
+        # 小格: cell_size 个起始位置 × group_size 个长度，覆盖约 cell_size 个碱基的长度
+        cell_size = max(16, int(np.ceil(np.sqrt(n_starts * len(lengths) * window_step / max_cells))))
+        group_size = max(1, min(len(lengths), cell_size // window_step))
+        n_groups = -(-len(lengths) // group_size)
+        # 补齐最后一组的长度超出数组，不会被选中
+        group_lengths = np.concatenate((lengths, np.full(n_groups * group_size - len(lengths), self.length + 1))).reshape(n_groups, group_size)
+        bounds = self._variable_window_bounds(prefix, ideal_value, n_starts, lengths, cell_size, group_size, window_apply_method, block_size)
+        order = np.argsort(bounds, kind='stable')
+        cells_per_batch = max(1, block_size // (cell_size * group_size))
+
+        # 每一轮选出一个片段，与按差异排序后依次选择不重叠的片段结果相同
+        selected: List[Tuple[float, int, int, float]] = []
+        selected_starts = np.zeros(0, dtype=np.int64)
+        selected_ends = np.zeros(0, dtype=np.int64)
+        for _ in range(top):
+            best = None
+            for batch_start in range(0, len(order), cells_per_batch):
+                cells = order[batch_start:batch_start + cells_per_batch]
+                if best is not None:
+                    # 下界等于最小差异的小格只可能得到相同的差异，起始位置在最优片段之后时不会被选中
+                    cell_bounds = bounds[cells]
+                    cells = cells[(cell_bounds < best[0]) | ((cell_bounds == best[0]) & (cells // n_groups * cell_size <= best[1]))]
+                    if len(cells) == 0:
+                        break
+                starts = ((cells // n_groups * cell_size)[:, None] + np.arange(cell_size)[None, :])[:, :, None]
+                cell_lengths = group_lengths[cells % n_groups][:, None, :]
+                ends = starts + cell_lengths
+                values = prefix[np.minimum(ends, self.length)] - prefix[np.minimum(starts, self.length)]
+                if window_apply_method != 'sum':
+                    values /= cell_lengths
+                diffs = np.abs(values - ideal_value)
+                excluded = (ends > self.length) | (starts >= n_starts)
+                if len(selected_starts) and filter_out_overlapped_result:
+                    # 已选片段互不重叠，只需检查起始位置在结束位置之前的最后一个已选片段
+                    last = np.searchsorted(selected_starts, ends, side='left') - 1
+                    excluded |= (last >= 0) & (selected_ends[np.maximum(last, 0)] > starts)
+                elif len(selected_starts):
+                    for start, length in zip(selected_starts, selected_ends - selected_starts):
+                        excluded |= (starts == start) & (cell_lengths == length)
+                diffs[excluded] = np.inf
+                min_diff = diffs.min()
+                if min_diff == np.inf or (best is not None and min_diff > best[0]):
+                    continue
+                idx = np.flatnonzero(diffs == min_diff)
+                starts, cell_lengths, values = np.broadcast_to(starts, ends.shape).ravel()[idx], np.broadcast_to(cell_lengths, ends.shape).ravel()[idx], values.ravel()[idx]
+                i = np.lexsort((cell_lengths, starts))[0]
+                candidate = (float(min_diff), int(starts[i]), int(cell_lengths[i]), float(values[i]))
+                if best is None or candidate[:3] < best[:3]:
+                    best = candidate
+            if best is None:
+                break
+            selected.append(best)
+            i = np.searchsorted(selected_starts, best[1])
+            selected_starts = np.insert(selected_starts, i, best[1])
+            selected_ends = np.insert(selected_ends, i, best[1] + best[2])
+        return [(start, length, value) for _, start, length, value in selected]
+
+    @staticmethod
+    def _variable_window_bounds(
+        prefix: np.ndarray,
+        ideal_value: float,
+        n_starts: int,
+        lengths: np.ndarray,
+        cell_size: int,
+        group_size: int,
+        window_apply_method: Literal['sum', 'mean'],
+        block_size: int
+    ) -> np.ndarray:
+        """
+        计算每个小格内窗口值与理想值差异的下界
+
+        Returns:
+            float32 数组，第 b 个起始块第 j 组长度的小格位于 b * 组数 + j
+        """
+        n_groups = -(-len(lengths) // group_size)
+        n_blocks = -(-n_starts // cell_size)
+        group_min = lengths[::group_size]
+        group_max = lengths[np.minimum(np.arange(1, n_groups + 1) * group_size, len(lengths)) - 1]
+        # 前缀和按 cell_size 分段，第 b 段覆盖第 b 块的全部起始位置
+        segment_starts = np.arange(0, len(prefix), cell_size)
+        segment_min = np.minimum.reduceat(prefix, segment_starts)
+        segment_max = np.maximum.reduceat(prefix, segment_starts)
+        # 第 b 块第 j 组的结束位置 (起始 + 长度) 落在第 b + first[j] 到 b + last[j] 段内
+        first = group_min // cell_size
+        last = (cell_size - 1 + group_max) // cell_size
+        pad = np.full(int(last.max()) + 1, np.inf)
+        segment_min_padded = np.concatenate((segment_min, pad))
+        segment_max_padded = np.concatenate((segment_max, -pad))
+        # 累加的舍入误差不能让下界超过真实的差异
+        epsilon = 1e-9 * max(1.0, float(np.abs(prefix).max()))
+
+        bounds = np.empty(n_blocks * n_groups, dtype=np.float32)
+        blocks_per_part = max(1, block_size // n_groups)
+        for part_start in range(0, n_blocks, blocks_per_part):
+            blocks = np.arange(part_start, min(part_start + blocks_per_part, n_blocks))
+            end_min = np.full((len(blocks), n_groups), np.inf)
+            end_max = np.full((len(blocks), n_groups), -np.inf)
+            for k in range(int((last - first).max()) + 1):
+                idx = blocks[:, None] + np.minimum(first + k, last)[None, :]
+                np.minimum(end_min, segment_min_padded[idx], out=end_min)
+                np.maximum(end_max, segment_max_padded[idx], out=end_max)
+            sum_low = end_min - segment_max[blocks][:, None]
+            sum_high = end_max - segment_min[blocks][:, None]
+            if window_apply_method == 'sum':
+                value_low, value_high = sum_low, sum_high
+            else:
+                with np.errstate(invalid='ignore'):
+                    value_low = np.minimum(sum_low / group_min, sum_low / group_max)
+                    value_high = np.maximum(sum_high / group_min, sum_high / group_max)
+            bound = np.maximum(np.maximum(value_low - ideal_value, ideal_value - value_high).ravel() - epsilon, 0)
+            # 转为 float32 时向下取整，下界不会变大
+            bound32 = bound.astype(np.float32)
+            bounds[part_start * n_groups:(part_start + len(blocks)) * n_groups] = np.where(bound32 > bound, np.nextafter(bound32, np.float32(-np.inf)), bound32)
+        return bounds
 
 if __name__ == '__main__':
     import random
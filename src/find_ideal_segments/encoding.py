@@ -0,0 +1,174 @@
+import numpy as np
+from typing import Dict, Optional
+
+# ACGT（不区分大小写）的 2 bit 编码，其他字符为 4
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _base in enumerate('ACGT'):
+    BASE_CODES[ord(_base)] = BASE_CODES[ord(_base.lower())] = _code
+# 4**12 项的查找表约为 16M，更长的 k-mer 查找表过大
+MAX_KMER_SIZE = 12
+# 编码 k-mer 时每次处理的碱基数
+KMER_CHUNK_SIZE = 1 << 22
+
+def _track(bases: str) -> Dict[str, int]:
+    return {base: 1 for base in bases + bases.lower()}
+
+# 命名的碱基组成轨道，都从同一个 uint8 碱基序列通过查找表得到
+TRACKS: Dict[str, Dict[str, int]] = {
+    'GC': _track('GC'),
+    'AT': _track('AT'),
+    'purine': _track('AG'),
+    'pyrimidine': _track('CT'),
+    'keto': _track('GT'),
+    'amino': _track('AC'),
+    'CpG': {'CG': 1},
+}
+
+def track_dict(track: str|Dict[str, float|int]) -> Dict[str, float|int]:
+    """
+    返回轨道对应的词典
+
+    Args:
+        track: TRACKS 中的轨道名，或者自定义的词典
+
+    Returns:
+        词典，键为单个字符或等长的 k-mer，值为对应的数值
+    """
+    if isinstance(track, dict):
+        return track
+    if track not in TRACKS:
+        raise ValueError(f'Unknown track "{track}", use one of {", ".join(TRACKS)} or a word dict.')
+    return TRACKS[track]
+
+def _table_dtype(word_dict: Dict[str, float|int], beyond_word_dict_value: float|int) -> type:
+    """所有取值都是 0-255 的整数时为 uint8，否则为 float64"""
+    values = list(word_dict.values()) + [beyond_word_dict_value]
+    return np.uint8 if all(float(v).is_integer() and 0 <= v <= 255 for v in values) else np.float64
+
+def build_lookup_table(word_dict: Dict[str, float|int], beyond_word_dict_value: float|int = 0) -> 'np.ndarray|KmerLookupTable':
+    """
+    根据单字符词典生成 256 项的查找表，用于将 uint8 序列直接编码为数值序列。
+    键为多个字符的词典生成 KmerLookupTable
+
+    Args:
+        word_dict: 词典，键为单个字符（或等长的 k-mer），值为对应的数值
+        beyond_word_dict_value: 词典之外的字符对应的数值
+
+    Returns:
+        长度为 256 的查找表。所有取值都是 0-255 的整数时为 uint8，否则为 float64
+    """
+    if any(len(word) > 1 for word in word_dict):
+        return KmerLookupTable(word_dict, beyond_word_dict_value)
+    lut = np.full(256, beyond_word_dict_value, dtype=_table_dtype(word_dict, beyond_word_dict_value))
+    for word, value in word_dict.items():
+        code = word.encode()
+        if len(code) != 1:
+            raise ValueError(f'Only single character words can be encoded by lookup table, got "{word}".')
+        lut[code[0]] = value
+    return lut
+
+class KmerLookupTable:
+    """k-mer 词典的查找表
+
+    序列的每个位置取以该位置开始的 k-mer: ACGT 按 2 bit 打包，逐位左移得到滚动编码，再通过 4**k 项的查找表得到数值。
+    k-mer 不区分大小写；含有 ACGT 以外字符的 k-mer，以及序列末尾不足 k 个碱基的位置，取词典之外的值。
+    编码后的序列与原序列等长，窗口 [s, s+w) 的值由以其中每个位置开始的 k-mer 计算。
+    """
+
+    def __init__(self, word_dict: Dict[str, float|int], beyond_word_dict_value: float|int = 0):
+        """
+        Args:
+            word_dict: 词典，键为等长的 k-mer，值为对应的数值
+            beyond_word_dict_value: 词典之外的 k-mer 对应的数值
+        """
+        lengths = {len(word) for word in word_dict}
+        if len(lengths) != 1:
+            raise ValueError(f'All words of a k-mer dict must have the same length, got lengths {sorted(lengths)}.')
+        self.k = lengths.pop()
+        if self.k > MAX_KMER_SIZE:
+            raise ValueError(f'k-mers longer than {MAX_KMER_SIZE} are not supported, got {self.k}.')
+        # 最后一项为无效 k-mer
+        self.table = np.full(4**self.k + 1, beyond_word_dict_value, dtype=_table_dtype(word_dict, beyond_word_dict_value))
+        for word, value in word_dict.items():
+            self.table[self.code_of(word)] = value
+
+    def code_of(self, word: str) -> int:
+        codes = BASE_CODES[np.frombuffer(word.encode(), dtype=np.uint8)]
+        if len(codes) != self.k or (codes > 3).any():
+            raise ValueError(f'Only k-mers of A, C, G and T can be encoded, got "{word}".')
+        return int(sum(int(c) << 2 * (self.k - 1 - i) for i, c in enumerate(codes)))
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.table.dtype
+
+    def max(self):
+        return self.table.max()
+
+    def codes(self, bases: np.ndarray) -> np.ndarray:
+        """
+        计算每个位置开始的 k-mer 的滚动编码
+
+        Args:
+            bases: uint8 序列
+
+        Returns:
+            与 bases 等长的 uint32 编码，无效的位置为 4**k
+        """
+        invalid_code = 4**self.k
+        codes = np.full(len(bases), invalid_code, dtype=np.uint32)
+        m = len(bases) - self.k + 1
+        if m <= 0:
+            return codes
+        base_codes = BASE_CODES[bases]
+        code = codes[:m]
+        code[:] = 0
+        invalid = np.zeros(m, dtype=bool)
+        for i in range(self.k):
+            part = base_codes[i:i + m]
+            code <<= 2
+            code |= part & 3
+            invalid |= part > 3
+        code[invalid] = invalid_code
+        return codes
+
+    def encode(self, bases: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        将 uint8 序列编码为数值序列，分块计算，中间数组的大小与序列长度无关
+
+        Args:
+            bases: uint8 序列
+            out: 写入结果的数组，默认新建数组
+
+        Returns:
+            与 bases 等长的数值序列
+        """
+        out = np.empty(len(bases), dtype=self.dtype) if out is None else out
+        for start in range(0, len(bases), KMER_CHUNK_SIZE):
+            end = min(start + KMER_CHUNK_SIZE, len(bases))
+            # 多取 k-1 个碱基，块末尾的 k-mer 使用下一块的碱基
+            codes = self.codes(bases[start:end + self.k - 1])[:end - start]
+            np.take(self.table, codes, out=out[start:end])
+        return out
+
+    def __getitem__(self, bases: np.ndarray) -> np.ndarray:
+        return self.encode(bases)
+
+def kmer_size_of(lookup_table: np.ndarray|KmerLookupTable) -> int:
+    return lookup_table.k if isinstance(lookup_table, KmerLookupTable) else 1
+
+def encode(bases: np.ndarray, lookup_table: np.ndarray|KmerLookupTable, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    使用查找表将 uint8 序列编码为数值序列
+
+    Args:
+        bases: uint8 序列
+        lookup_table: build_lookup_table 生成的查找表
+        out: 写入结果的数组，默认新建数组
+
+    Returns:
+        与 bases 等长的数值序列
+    """
+    if isinstance(lookup_table, KmerLookupTable):
+        return lookup_table.encode(bases, out=out)
+    return np.take(lookup_table, bases, out=out)
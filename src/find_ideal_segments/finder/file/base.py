@@ -1,9 +1,13 @@
-from ...iterator import IterableSequenceNumRotateCalculation
-from typing import List, Literal, Annotated
+from ...iterator import IterableSequenceNumRotateCalculation, rotate_window_cache_file
+from ...catalog import WindowValueSummary, load_window_value_summary
+from ...pyramid import WindowValuePyramid
+from ...seqarray import NumericArray
+from typing import List, Literal, Annotated, Optional, Callable, Iterable, Iterator
 from typing import Tuple
 import json
-import pandas as pd
-from ...io.jsonl import JsonlIO
+import pathlib
+import numpy as np
+from ...io.jsonl import JsonlIO, Compression
 from pydantic import BaseModel
 import time
 import logging
@@ -14,8 +18,9 @@ class iterResult(BaseModel):
     windows: List[Tuple[int, int]]
 
 class seqItem(BaseModel):
+    '''`seq` is a numpy array, lists and memory mapped arrays are accepted, see `seqarray.NumericArray`.'''
     id: str
-    seq: List[int|float]
+    seq: NumericArray
     iter_results:List[iterResult] = []
 
 class selectedWindow(BaseModel):
@@ -37,8 +42,18 @@ class windowFinderinJsonl:
         window_apply_method: Literal['sum', 'mean'] = 'mean',
         filter_out_partial_overlapped_result: bool = True,
         sort_chunk_size: int = 10_000_000,
-        precision:int = 4
+        precision:int = 4,
+        intermediate_compression: Optional[Compression] = None,
+        seq_loader: Optional[Callable[[str], np.ndarray]] = None,
+        scan_chunk_size: int = 10**6,
+        window_cache_resident_bytes: Optional[int] = None
     ):
+        '''`seq_loader` loads the numeric sequence by its id. When it is given, the `seq` of the items in
+        `file` is ignored and can be left empty, so the round bundles only carry ids and iteration results.
+
+        `scan_chunk_size` is the number of elements scanned at once, window values of a sequence larger than
+        `window_cache_resident_bytes` are memory mapped from `.rotate_windows` instead of loaded, see `memory.plan_memory`.
+        '''
         self.file: JsonlIO[seqItem]= JsonlIO(seqItem, file_path=file, mode='r')
         self.window = window
         self.top = top
@@ -47,6 +62,113 @@ class windowFinderinJsonl:
         self.filter_out_partial_overlapped_result = filter_out_partial_overlapped_result
         self.sort_chunk_size = sort_chunk_size
         self.precision = precision
+        self.intermediate_compression = intermediate_compression
+        self.seq_loader = seq_loader
+        self.scan_chunk_size = scan_chunk_size
+        self.window_cache_resident_bytes = window_cache_resident_bytes
+        self.window_value_summaries: dict[str, Optional[WindowValueSummary]] = {}
+        self.window_value_pyramids: dict[str, WindowValuePyramid] = {}
+
+    def cache_id_of(self, seq_id: str) -> str:
+        '''The id of the cached rotate window values of a sequence, see `IterableSequenceNumRotateCalculation`.
+        Subclasses that derive the numeric sequence from other parameters should add them to the id.
+        '''
+        return seq_id
+
+    def load_rotate_window_values(self, seq_id: str) -> Optional[np.ndarray]:
+        '''The window values on the whole sequence, `None` lets the rotator compute and cache them in `.rotate_windows`.
+        Subclasses that keep the values (or prefix sums) in memory can return them here.
+        '''
+        return None
+
+    def skipped_regions_of(self, seq_id: str) -> Optional[np.ndarray]:
+        '''The `[start, end)` regions of a sequence that are never scanned, e.g. runs of `N`. `None` scans the whole sequence.
+        '''
+        return None
+
+    def rotator_options(self) -> dict:
+        '''The memory related keyword arguments of `IterableSequenceNumRotateCalculation`.'''
+        return dict(chunk_size=self.scan_chunk_size, max_resident_bytes=self.window_cache_resident_bytes)
+
+    def window_value_pyramid(self, seq_id: str, values: Optional[np.ndarray]) -> Optional[WindowValuePyramid]:
+        '''The pyramid of the window values given by `load_rotate_window_values`, built once and kept for every round
+        of the run when the values are not cached in `.rotate_windows`. `None` lets the rotator load the pyramid
+        saved next to the cache file.
+        '''
+        if values is None or pathlib.Path(rotate_window_cache_file(self.cache_id_of(seq_id), self.window, self.window_apply_method)).exists():
+            return None
+        if seq_id not in self.window_value_pyramids:
+            self.window_value_pyramids[seq_id] = WindowValuePyramid.build(values)
+        return self.window_value_pyramids[seq_id]
+
+    def window_value_summary(self, seq_id: str) -> Optional[WindowValueSummary]:
+        '''The histogram of the window values of a sequence from the catalog next to its `.rotate_windows` cache,
+        `None` until the window values are cached. Summaries are built once and kept for later runs.
+        '''
+        if seq_id not in self.window_value_summaries:
+            summary = load_window_value_summary(rotate_window_cache_file(self.cache_id_of(seq_id), self.window, self.window_apply_method))
+            if summary is None:
+                return None
+            self.window_value_summaries[seq_id] = summary
+        return self.window_value_summaries[seq_id]
+
+    def diff_lower_bound(self, seq: seqItem) -> float:
+        '''A lower bound of the difference of the next windows of a sequence. Every round only excludes more windows,
+        so the next windows are never closer to the ideal value than the last ones, nor than the nearest window
+        value in the catalog.
+        '''
+        lower_bound = float('-inf')
+        if seq.iter_results:
+            if seq.iter_results[-1].score is None:
+                return float('inf')
+            lower_bound = abs(seq.iter_results[-1].score - self.ideal_value)
+        summary = self.window_value_summary(seq.id)
+        if summary is not None:
+            lower_bound = max(lower_bound, summary.diff_lower_bound(self.ideal_value))
+        return lower_bound
+
+    def catalog(self) -> Iterator[Tuple[str, WindowValueSummary]]:
+        '''Yield `(seq_id, summary)` of every sequence, the window values that are not cached yet are computed and cached.
+        '''
+        for seq in self.file:
+            summary = self.window_value_summary(seq.id)
+            if summary is None:
+                values = self.load_rotate_window_values(seq.id)
+                if values is None:
+                    arr = seq.seq if self.seq_loader is None else self.seq_loader(seq.id)
+                    values = np.zeros(0, dtype=np.float64) if len(arr) < self.window else IterableSequenceNumRotateCalculation(
+                        window=self.window,
+                        arr=arr,
+                        cache_id=self.cache_id_of(seq.id),
+                        **self.rotator_options()
+                    ).load_whole_sequence_rotate_window_values(window_apply_method=self.window_apply_method)
+                # 窗口值只在内存中时不保存概要
+                summary = self.window_value_summary(seq.id) or WindowValueSummary.build(values)
+            yield seq.id, summary
+
+    def iter_next_windows(self, seqs: Iterable[seqItem]) -> Iterator[Tuple[seqItem, Optional[float], List[Tuple[int, int]]]]:
+        '''Find the next ideal windows of every sequence, yield `(seq, score, windows)` in the order of `seqs`.
+        Subclasses can override it to scan the sequences in another way, e.g. in parallel.
+        '''
+        for seq in seqs:
+            pre_finded_windows = [i.windows for i in seq.iter_results]
+            values = self.load_rotate_window_values(seq.id)
+            rotator = IterableSequenceNumRotateCalculation(
+                window=self.window,
+                arr=seq.seq if self.seq_loader is None else self.seq_loader(seq.id),
+                excluding_window_list=pre_finded_windows,
+                cache_id=self.cache_id_of(seq.id),
+                rotate_window_values=values,
+                skipped_regions=self.skipped_regions_of(seq.id),
+                pyramid=self.window_value_pyramid(seq.id, values),
+                **self.rotator_options()
+            )
+            score, windows = rotator.find_next_ideal_windows(
+                ideal_value=self.ideal_value,
+                window_apply_method=self.window_apply_method,
+                filter_out_partial_overlapped_result=self.filter_out_partial_overlapped_result
+            )
+            yield seq, score, windows
     
     def find(self, save_path:str=None)-> JsonlIO[selectedWindow]:
         selected_windows: JsonlIO[selectedWindow] = JsonlIO(selectedWindow, file_path=save_path)
@@ -61,41 +183,43 @@ class windowFinderinJsonl:
         sum_find_window_time_consume = 0
         sum_find_window_num = 0
         sum_file_time_consume = 0
+        sum_skipped_seq_num = 0
+        # 得分和差异都按 precision 取整，下界需要超过当前最大差异这么多才能确定序列不会被选中
+        rounding_margin = 2 * 10**-self.precision
+
+        def seqs_to_scan(seqs: Iterable[seqItem]) -> Iterator[seqItem]:
+            '''Skip the sequences that can not add a window to this round, judged by `diff_lower_bound`.
+
+            Once the candidates are full, `current_max_diff` no longer changes in the round, so a sequence skipped
+            here is skipped no matter how far `iter_next_windows` reads ahead, e.g. by the worker processes.
+            '''
+            nonlocal skipped_seq_num
+            for seq in seqs:
+                if current_candidates_windows_num >= left and self.diff_lower_bound(seq) - rounding_margin > current_max_diff:
+                    skipped_seq_num += 1
+                    continue
+                yield seq
 
         while seqs_to_seek>0:
             current_max_diff = selected_max_diff
             left = self.top - found_num
-            current_candidates_windows: JsonlIO[selectedWindow] = JsonlIO(selectedWindow)
-            current_candidates_bundle: JsonlIO[seqItem] = JsonlIO(seqItem)
+            current_candidates_windows: JsonlIO[selectedWindow] = JsonlIO(selectedWindow, compression=self.intermediate_compression)
+            current_candidates_bundle: JsonlIO[seqItem] = JsonlIO(seqItem, compression=self.intermediate_compression)
 
             logger.info(f'Running round {round_num}: {seqs_to_seek} sequences to seek, {left} windows to find...')
 
             current_candidates_windows_num = 0
-            find_window_time_consume = 0
+            skipped_seq_num = 0
             find_window_num = 0
             file_time_consume = 0
+            round_time_start = time.time()
 
             # 这一轮要找 n 个窗口
-            for seq in selected_bundle:
-                find_time_start = time.time()
-                pre_finded_windows = [i.windows for i in seq.iter_results]
-                rotator = IterableSequenceNumRotateCalculation(
-                    window=self.window,
-                    arr=seq.seq,
-                    excluding_window_list=pre_finded_windows,
-                    cache_id=seq.id
-                )
-                score, windows = rotator.find_next_ideal_windows(
-                    ideal_value=self.ideal_value,
-                    window_apply_method=self.window_apply_method,
-                    filter_out_partial_overlapped_result=self.filter_out_partial_overlapped_result
-                )
+            for seq, score, windows in self.iter_next_windows(seqs_to_scan(selected_bundle)):
                 seq.iter_results.append(iterResult(score=score, windows=windows))
 
                 windows_num = len(windows)
                 find_window_num += windows_num
-                find_time_end = time.time()
-                find_window_time_consume += (find_time_end - find_time_start)
 
                 if score is None: # 该序列已经全部分割完成
                     continue
@@ -106,7 +230,7 @@ class windowFinderinJsonl:
 
                 is_smaller_diff = (diff <= current_max_diff)
                 
-                if (len(current_candidates_windows)<left) or (is_smaller_diff):
+                if (current_candidates_windows_num<left) or (is_smaller_diff):
                     if not is_smaller_diff:
                         current_max_diff = diff
                     file_time_start = time.time()
@@ -123,6 +247,8 @@ class windowFinderinJsonl:
                     file_time_end = time.time()
                     file_time_consume += (file_time_end - file_time_start)
 
+            # 查找窗口可能与读取文件并行进行，用这一轮的总耗时减去写入候选的耗时
+            find_window_time_consume = time.time() - round_time_start - file_time_consume
             file_time_start_ = time.time()
             current_candidates_windows.sort_by_fileds(('score_diff', 'start_idx'), chunk_size=self.sort_chunk_size)
             current_candidates_windows.head(left)
@@ -138,12 +264,13 @@ class windowFinderinJsonl:
 
             file_time_end_ = time.time()
             file_time_consume += (file_time_end_ - file_time_start_)
-            logger.info(f'Round {round_num} finished: {find_window_num} windows found, {current_candidates_windows_num} windows added to candidates, {file_time_consume} seconds file time consume, {find_window_time_consume} seconds find window time consume.')
+            logger.info(f'Round {round_num} finished: {find_window_num} windows found, {current_candidates_windows_num} windows added to candidates, {skipped_seq_num} sequences skipped by the catalog, {file_time_consume} seconds file time consume, {find_window_time_consume} seconds find window time consume.')
 
             sum_find_window_time_consume += find_window_time_consume
             sum_find_window_num += find_window_num
             sum_file_time_consume += file_time_consume
+            sum_skipped_seq_num += skipped_seq_num
             round_num += 1
 
-        logger.info(f'All rounds finished: {sum_find_window_num} windows found, {sum_file_time_consume/3600:.2f} hours file time consume, {sum_find_window_time_consume/3600:.2f} hours find window time consume.')
+        logger.info(f'All rounds finished: {sum_find_window_num} windows found, {sum_skipped_seq_num} sequences skipped by the catalog, {sum_file_time_consume/3600:.2f} hours file time consume, {sum_find_window_time_consume/3600:.2f} hours find window time consume.')
         return selected_windows
\ No newline at end of file
@@ -0,0 +1,399 @@
+from ...io.jsonl import JsonlIO, Compression, detect_compression
+from ...io.sink import open_result_sink, result_file_type
+from ...io.fasta import FastaReader
+from ...io.seqstore import SequenceStore
+from ...io.faidx import IndexedFasta, UnevenLineError
+from ...io.bgzf import is_gzip, is_bgzf
+from ...io.gaps import GapIndex, gap_mask_table
+from ...io.bed import read_bed, merge_regions, complement_regions
+from ...io.intervals import IntervalIndex, index_file_of
+from ...io.stream import StreamedSequence
+from ...encoding import build_lookup_table, track_dict
+from ...iterator import rotate_window_cache_file
+from ...pyramid import pyramid_file_of
+from ...catalog import summary_file_of
+from .base import seqItem, selectedWindow, iterResult
+from .wordratio import findIdealWordRatioInSlidingWindow, wordSeqItem, selectedWindowExtended
+from .parallel import SharedMemoryWindowScanner
+from .manifest import RECORD_DIGEST_SIZE, runManifest, update_manifest, load_record_results, save_record_results
+from ...memory import memoryPlan, parse_memory_size, measure_sort_line_bytes, plan_memory
+from typing import Literal, Optional, Tuple, List, Dict
+from collections import deque
+import numpy as np
+import pathlib
+import hashlib
+import json
+import uuid
+import logging
+logger = logging.getLogger(__name__)
+
+class findIdealGCContentSegmentsonFasta(findIdealWordRatioInSlidingWindow):
+    def __init__(
+        self, 
+        fasta_file: str, 
+        window: int, 
+        top:int,
+        ideal_value: float,
+        beyond_word_dict_value: float|int = 0,
+        dict_mode: str|dict = 'GC',
+        window_apply_method: Literal['sum', 'mean'] = 'mean',
+        filter_out_partial_overlapped_result: bool = True,
+        cache: bool = True,
+        sort_chunk_size: int = 10_000_000,
+        precision:int = 4,
+        intermediate_compression: Optional[Compression] = None,
+        threads: Optional[int] = None,
+        workers: int = 1,
+        memory_limit: Optional[int|str] = None,
+        skip_gaps: bool = False,
+        skip_soft_masked: bool = False,
+        include_bed: Optional[str] = None,
+        exclude_bed: Optional[str] = None,
+        manifest: Optional[runManifest] = None
+    ):
+        # generate class annotation below
+        '''Find the ideal GC content segments in the DNA fasta file.
+
+        The fasta file is indexed into a samtools compatible `<fasta>.fai` and memory mapped, every sequence is
+        encoded by a lookup table when it is scanned. `intermediate_compression` stores the round bundles
+        as gzip/lzma streams.
+
+        A BGZF compressed fasta (`bgzip`) is accessed randomly through its `<fasta>.gzi` index and decompressed
+        by `threads` threads. A plain gzip fasta can not be accessed randomly, it is decompressed once into a
+        `.bases` file next to it.
+
+        With `workers` > 1 the sequences are parsed and encoded by a reader process into shared memory and
+        scanned by `workers` processes, see `SharedMemoryWindowScanner`. The result is the same as the serial one.
+
+        `memory_limit` (bytes or a size like "4G") derives the scan chunk size, the sort chunk size (replacing
+        `sort_chunk_size`) and whether the window values stay in memory from the longest sequence, see `apply_memory_limit`.
+
+        `skip_gaps` skips the runs of `N` and `skip_soft_masked` the lowercase (soft-masked) runs, no window overlapping
+        them is selected. The runs are indexed once into `<fasta>.<kind>.npz`, see `GapIndex`.
+
+        `include_bed` restricts the search to the regions of a BED file (exons, a capture panel, ...) and `exclude_bed`
+        skips the regions of another one, a selected window lies entirely inside the included and outside the excluded
+        regions. The sequences without an included region of `window` bases are never scanned, in the others the
+        windows between the regions are pruned by the block min/max pyramid of the window values, see `load_bed_regions`.
+
+        The content digest of every record is kept in `<fasta>.manifest.json` and added to its cache id, so after the
+        fasta is patched only the changed records are encoded and scanned again. `manifest` is the manifest built by
+        the caller, e.g. once for all the jobs of a batch. With `cache` the per-round results of every record are
+        saved into `<fasta>.<digest>.results.jsonl` and replayed by later runs with the same window, ideal value and
+        options, see `iter_next_windows`. Without `cache` nothing is reused, the records are not hashed and the window
+        values (with their pyramids and summaries) cached in `.rotate_windows` by this run are removed after `find`.
+        '''
+        word_dict = self.word_dict_of(dict_mode)
+
+        self.cache = cache
+        self.fasta_file = fasta_file
+        self.threads = threads
+        self.workers = workers
+        self.scanner: Optional[SharedMemoryWindowScanner] = None
+        self.skip_gaps = skip_gaps
+        self.skip_soft_masked = skip_soft_masked
+        self.gap_index: Optional[GapIndex] = None
+        # load_numeric_file 在父类设置 window 之前调用，按窗口大小去掉没有可搜索区域的序列
+        self.window = window
+        self.include_bed = include_bed
+        self.exclude_bed = exclude_bed
+        # BED 文件给出的每条序列不扫描的区域，以及它们的摘要
+        self.bed_skipped_regions: Dict[str, np.ndarray] = {}
+        self.bed_digest: Optional[str] = None
+        # index / bases files built by this run, removed after `find` when `cache` is False
+        self.built_files = []
+        self.manifest = manifest
+        self.record_digests: Dict[str, str] = {}
+        # 每条序列每一轮的结果，按缓存 id 保存
+        self.record_results: Dict[str, List[iterResult]] = {}
+        self.replayed_round_num = 0
+
+        super().__init__(
+            word_file=fasta_file,
+            word_dict=word_dict,
+            window=window,
+            top=top,
+            ideal_value=ideal_value,
+            window_apply_method=window_apply_method,
+            filter_out_partial_overlapped_result=filter_out_partial_overlapped_result,
+            beyond_word_dict_value=beyond_word_dict_value,
+            cache_numeric_file=cache,
+            sort_chunk_size=sort_chunk_size,
+            precision=precision,
+            intermediate_compression=intermediate_compression
+        )
+        if memory_limit is not None:
+            self.apply_memory_limit(parse_memory_size(memory_limit))
+
+    def apply_memory_limit(self, memory_limit: int) -> memoryPlan:
+        '''Size the chunks after the longest sequence and the measured size of a sorted line.
+        '''
+        lengths = [length for _, length in self.word_file.records()]
+        max_length = max(lengths, default=0)
+        sample = selectedWindow(
+            seq_id=max((seq_id for seq_id, _ in self.word_file.records()), key=len, default=''),
+            start_idx=max_length, end_idx=max_length, consecutive_window_length=max_length,
+            score=self.ideal_value + 0.1 ** self.precision, score_diff=0.1 ** self.precision
+        )
+        plan = plan_memory(
+            memory_limit,
+            max_record_length=max_length,
+            # 读取时先得到碱基，再编码为查找表的类型
+            record_itemsize=1 + self.lookup_table.dtype.itemsize,
+            window=self.window,
+            sort_line_bytes=measure_sort_line_bytes(selectedWindow, sample),
+            processes=self.workers,
+            # 多进程时所有序列编码后保存在共享内存中，单进程时序列逐块读取
+            shared_bytes=sum(lengths) * self.lookup_table.dtype.itemsize if self.workers > 1 else 0,
+            streamed_records=self.workers == 1,
+            search_bytes=self.search_bytes(max_length)
+        )
+        logger.info(f'Memory limit {memory_limit} bytes: scan chunk size {plan.scan_chunk_size}, sort chunk size {plan.sort_chunk_size}, window values over {plan.window_cache_resident_bytes} bytes are memory mapped.')
+        self.scan_chunk_size = plan.scan_chunk_size
+        self.sort_chunk_size = plan.sort_chunk_size
+        self.window_cache_resident_bytes = plan.window_cache_resident_bytes
+        return plan
+
+    def search_bytes(self, max_length: int) -> int:
+        '''The memory of the search that is not chunked, none for the fixed window, see `plan_memory`.'''
+        return 0
+
+    @staticmethod
+    def word_dict_of(dict_mode: str|dict) -> dict:
+        '''A track name of `TRACKS` ("GC", "AT", "purine", ...) or a custom word dict.'''
+        return track_dict(dict_mode)
+
+    def open_word_file(self, fasta_file: str) -> IndexedFasta|SequenceStore:
+        fasta, built_files = self.open_fasta(fasta_file, threads=self.threads)
+        self.built_files += built_files
+        return fasta
+
+    @classmethod
+    def open_fasta(cls, fasta_file: str, threads: Optional[int] = None) -> Tuple[IndexedFasta|SequenceStore, List[str]]:
+        '''Open the fasta file for random access, return it with the index / bases files built for it.
+
+        A gzip (not BGZF) fasta, or one whose lines can not be indexed by `.fai` (uneven line widths), is
+        read once into a `SequenceStore` bases file instead.
+        '''
+        if not is_gzip(fasta_file) or is_bgzf(fasta_file):
+            logger.info(f'Loading index of "{fasta_file}"...')
+            try:
+                fasta = IndexedFasta(fasta_file, threads=threads)
+                return fasta, fasta.built_files
+            except UnevenLineError as e:
+                logger.warning(f'{e} "{fasta_file}" can not be indexed, its bases are stored separately.')
+        bases_file = cls.bases_file_of(fasta_file)
+        if SequenceStore.exists(bases_file) and \
+                pathlib.Path(bases_file).stat().st_mtime >= pathlib.Path(fasta_file).stat().st_mtime:
+            logger.info(f'Loading bases of "{fasta_file}" from "{bases_file}"...')
+            return SequenceStore(bases_file), []
+        return cls.fasta2bases(fasta_file, bases_file, threads=threads), [bases_file, SequenceStore.index_path_of(bases_file)]
+
+    @staticmethod
+    def bases_file_of(fasta_file: str) -> str:
+        '''`genome.fa.gz` -> `genome.fa.bases`'''
+        return f'{fasta_file.removesuffix('.gz')}.bases'
+
+    def load_numeric_file(self):
+        '''Only the sequence ids go into the bundle file, the numeric sequences are streamed from the
+        stored bases chunk by chunk when they are scanned, see `StreamedSequence`.
+        '''
+        self.lookup_table = build_lookup_table(self.word_dict, self.beyond_word_dict_value)
+        self.numeric_file = JsonlIO(seqItem, compression=self.intermediate_compression)
+        self.lengths = dict(self.word_file.records())
+        if self.include_bed is not None or self.exclude_bed is not None:
+            self.load_bed_regions()
+        for seq_id, length in self.lengths.items():
+            if self.has_searchable_region(seq_id, length):
+                self.numeric_file.add_line(seqItem(id=seq_id, seq=[]))
+        self.numeric_file.flush()
+        self.seq_loader = lambda seq_id: StreamedSequence(self.word_file, seq_id, self.lengths[seq_id], self.lookup_table)
+        self.record_digests = self.load_record_digests()
+        if self.skip_gaps or self.skip_soft_masked:
+            self.gap_index = self.load_gap_index()
+
+    def load_bed_regions(self) -> None:
+        '''The regions outside `include_bed` and inside `exclude_bed` of every sequence go into `bed_skipped_regions`,
+        merged and clipped to the sequence. The rotator never selects a window overlapping them.
+        '''
+        include = None if self.include_bed is None else read_bed(self.include_bed)
+        exclude = {} if self.exclude_bed is None else read_bed(self.exclude_bed)
+        unknown = set(include or {}).union(exclude).difference(self.lengths)
+        if unknown:
+            logger.warning(f'{len(unknown)} sequences of the BED files are not in "{self.fasta_file}", e.g. "{sorted(unknown)[0]}".')
+        empty = np.zeros((0, 2), dtype=np.int64)
+        for seq_id, length in self.lengths.items():
+            regions = [np.clip(exclude.get(seq_id, empty), 0, length)]
+            if include is not None:
+                regions.append(complement_regions(include.get(seq_id, empty), length))
+            regions = merge_regions(np.concatenate(regions))
+            regions = regions[regions[:, 1] > regions[:, 0]]
+            if len(regions):
+                self.bed_skipped_regions[seq_id] = regions
+        self.bed_digest = hashlib.sha1(json.dumps(
+            {seq_id: regions.tolist() for seq_id, regions in sorted(self.bed_skipped_regions.items())}
+        ).encode()).hexdigest()[:12]
+        logger.info(f'Skipping {sum(int((i[:, 1] - i[:, 0]).sum()) for i in self.bed_skipped_regions.values())} bases outside the BED regions in {len(self.bed_skipped_regions)} sequences.')
+
+    def has_searchable_region(self, seq_id: str, length: int) -> bool:
+        '''Whether a window fits between the BED regions skipped in the sequence.'''
+        if seq_id not in self.bed_skipped_regions:
+            return True
+        allowed = complement_regions(self.bed_skipped_regions[seq_id], length)
+        return bool(np.any(allowed[:, 1] - allowed[:, 0] >= self.window))
+
+    def load_record_digests(self) -> Dict[str, str]:
+        '''The content digests of the records from the manifest, see `update_manifest`. Without `cache` the caches of
+        this run are removed after `find`, so the records are not hashed and a token of the run stands for the digests.
+        '''
+        if not self.cache:
+            token = uuid.uuid4().hex[:2 * RECORD_DIGEST_SIZE]
+            return {seq_id: token for seq_id in self.lengths}
+        if self.manifest is None:
+            self.manifest = update_manifest(self.fasta_file, self.word_file)
+        return self.manifest.digests()
+
+    def cache_id_of(self, seq_id: str) -> str:
+        '''The content digest of the record is added, a changed record never reuses the cached window values.
+        '''
+        return f'{super().cache_id_of(seq_id)}_{self.record_digests[seq_id]}'
+
+    def results_file_of(self) -> str:
+        '''The per-round results depend on the options below, the word dict is a part of every cache id.'''
+        content = [self.window, self.ideal_value, self.window_apply_method, self.filter_out_partial_overlapped_result, self.skip_gaps, self.skip_soft_masked]
+        if self.bed_digest is not None:
+            content.append(self.bed_digest)
+        return f'{self.fasta_file}.{hashlib.sha1(json.dumps(content).encode()).hexdigest()[:12]}.results.jsonl'
+
+    def gap_index_file_of(self) -> str:
+        kind = '_'.join(k for k, skip in [('gaps', self.skip_gaps), ('softmasked', self.skip_soft_masked)] if skip)
+        return f'{self.fasta_file}.{kind}.npz'
+
+    def load_gap_index(self) -> GapIndex:
+        '''Load the run-length index of the skipped regions, it is built by a pass over the bases when it is
+        missing or older than the fasta.
+        '''
+        gap_index_file = self.gap_index_file_of()
+        if GapIndex.is_fresh(gap_index_file, self.fasta_file):
+            gap_index = GapIndex.load(gap_index_file)
+        else:
+            logger.info(f'Indexing skipped regions of "{self.fasta_file}" into "{gap_index_file}"...')
+            gap_index = GapIndex.build(
+                ((seq_id, StreamedSequence(self.word_file, seq_id, length)) for seq_id, length in self.word_file.records()),
+                gap_mask_table(gaps=self.skip_gaps, soft_masked=self.skip_soft_masked)
+            )
+            gap_index.save(gap_index_file)
+            self.built_files.append(gap_index_file)
+        logger.info(f'Skipping {gap_index.total_length()} bases in {sum(len(gap_index[i]) for i in gap_index)} regions.')
+        return gap_index
+
+    def skipped_regions_of(self, seq_id: str) -> Optional[np.ndarray]:
+        regions = [i for i in (None if self.gap_index is None else self.gap_index[seq_id], self.bed_skipped_regions.get(seq_id)) if i is not None]
+        if not regions:
+            return None
+        return regions[0] if len(regions) == 1 else np.concatenate(regions)
+
+    def iter_next_windows(self, seqs):
+        '''The windows of a round already found by an earlier run are replayed from `record_results`, the other
+        sequences are scanned by `scan_next_windows`. The order of `seqs` is kept.
+        '''
+        order = deque()
+
+        def seqs_to_scan():
+            for seq in seqs:
+                cached = self.record_results.get(self.cache_id_of(seq.id), [])
+                replayed = cached[len(seq.iter_results)] if len(cached) > len(seq.iter_results) else None
+                order.append((seq, replayed))
+                if replayed is None:
+                    yield seq
+
+        def pop_replayed():
+            while order and order[0][1] is not None:
+                seq, replayed = order.popleft()
+                self.replayed_round_num += 1
+                yield seq, replayed.score, replayed.windows
+
+        for seq, score, windows in self.scan_next_windows(seqs_to_scan()):
+            yield from pop_replayed()
+            order.popleft()
+            cache_id = self.cache_id_of(seq.id)
+            if self.cache and len(self.record_results.get(cache_id, [])) <= len(seq.iter_results):
+                self.record_results[cache_id] = [*seq.iter_results, iterResult(score=score, windows=windows)]
+            yield seq, score, windows
+        yield from pop_replayed()
+
+    def scan_next_windows(self, seqs):
+        if self.scanner is None:
+            yield from super().iter_next_windows(seqs)
+        else:
+            yield from self.scanner.scan(
+                seqs, self.window, self.ideal_value, self.window_apply_method, self.filter_out_partial_overlapped_result,
+                cache_id_of=self.cache_id_of, rotator_options=self.rotator_options(), skipped_regions_of=self.skipped_regions_of
+            )
+
+    def segment_fetcher(self, word_file: IndexedFasta|SequenceStore):
+        return word_file.fetch
+
+    @classmethod
+    def fasta2bases(cls, fasta_file: str, bases_file: str, threads: Optional[int] = None) -> SequenceStore:
+        '''Stream the DNA fasta file (plain, gzip or BGZF) into a memory mapped bases file.
+        '''
+        logger.info(f'Converting "{fasta_file}" to "{bases_file}"...')
+        return SequenceStore.build(FastaReader(fasta_file, threads=threads), bases_file)
+    
+    @classmethod
+    def fasta2jsonl(cls, fasta_file: str, jsonl_file:str):
+        '''Convert the DNA fasta file to jsonl file.
+        '''
+        logger.info(f'Converting "{fasta_file}" to "{jsonl_file}"...')
+        with JsonlIO(wordSeqItem, file_path=jsonl_file, mode='w') as jio:
+            jio.empty()
+            for seq_id, bases in FastaReader(fasta_file):
+                jio.add_line(wordSeqItem(id=seq_id, seq=bases.tobytes().decode()))
+    
+
+    def find(self, save_path:str = None, human_readable_idx: bool = True, index: bool = False):
+        '''Find the segments and write them to `save_path` in a single pass, the format is decided by the
+        extension (see `RESULT_SINKS`), an unknown extension is replaced by `.jsonl`.
+
+        `index` also writes an `IntervalIndex` of the segments into `<save_path>.idx.npz` for overlap and nearest
+        segment queries, see `gccontent-index`, otherwise an index left by an earlier run is removed.
+        '''
+        save_file_type = result_file_type(save_path)
+        if save_file_type == 'jsonl' and detect_compression(save_path) is None:
+            save_path = f'{save_path.rsplit('.',1)[0]}.jsonl'
+        if self.workers > 1:
+            logger.info(f'Scanning sequences with {self.workers} worker processes...')
+            self.scanner = SharedMemoryWindowScanner(FastaReader(self.fasta_file, threads=self.threads), self.lookup_table, self.workers)
+        results_file = self.results_file_of()
+        if self.cache:
+            self.record_results = load_record_results(results_file)
+        else:
+            cached_files = {i for i in self.window_cache_files() if pathlib.Path(i).exists()}
+        try:
+            with open_result_sink(selectedWindowExtended, save_path) as sink:
+                super().find(human_readable_idx=human_readable_idx, sink=sink)
+        finally:
+            if self.scanner is not None:
+                self.scanner.close()
+                self.scanner = None
+        if self.cache:
+            logger.info(f'{self.replayed_round_num} rounds of sequences replayed, results saved into "{results_file}".')
+            save_record_results(results_file, self.record_results, self.record_digests.values())
+        result_length = len(sink)
+        if index:
+            logger.info(f'Indexing the segments into "{index_file_of(save_path)}"...')
+            IntervalIndex.from_result_file(save_path, one_based=human_readable_idx).save(index_file_of(save_path))
+        else:
+            # 之前运行留下的索引不再对应新的结果
+            pathlib.Path(index_file_of(save_path)).unlink(missing_ok=True)
+        if not self.cache:
+            # 同时运行的其它任务可能正要写入缓存目录，目录由命令行在所有任务结束后删除，见 remove_empty_window_cache_dir
+            for file in self.built_files + [i for i in self.window_cache_files() if i not in cached_files]:
+                pathlib.Path(file).unlink(missing_ok=True)
+        return save_path, result_length
+
+    def window_cache_files(self) -> List[str]:
+        '''The window value caches of the sequences of this run in `.rotate_windows`, with their pyramids and summaries.'''
+        cache_files = [rotate_window_cache_file(self.cache_id_of(seq_id), self.window, self.window_apply_method) for seq_id in self.lengths]
+        return [file for cache_file in cache_files for file in (cache_file, pyramid_file_of(cache_file), summary_file_of(cache_file))]
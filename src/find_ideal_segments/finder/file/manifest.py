@@ -0,0 +1,123 @@
+from ...io.jsonl import JsonlIO
+from ...io.atomic import atomic_path
+from ...io.stream import StreamedSequence, SequenceSource
+from ...iterator import ROTATE_WINDOW_CACHE_DIR
+from .base import iterResult
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+import glob
+import hashlib
+import pathlib
+import logging
+logger = logging.getLogger(__name__)
+
+# 每条序列内容摘要的字节数
+RECORD_DIGEST_SIZE = 8
+
+def record_digest_of(source: SequenceSource, seq_id: str, length: int) -> str:
+    '''The content digest of a record, the bases are read chunk by chunk.
+    '''
+    h = hashlib.blake2b(digest_size=RECORD_DIGEST_SIZE)
+    h.update(length.to_bytes(8, 'little'))
+    for _, chunk in StreamedSequence(source, seq_id, length).chunks():
+        h.update(chunk.tobytes())
+    return h.hexdigest()
+
+class recordEntry(BaseModel):
+    id: str
+    length: int
+    digest: str
+
+class runManifest(BaseModel):
+    '''The content digest of every record of a fasta, the records are only hashed again when the size or the
+    modification time of the fasta changes.
+    '''
+    fasta_size: int
+    fasta_mtime_ns: int
+    records: List[recordEntry]
+
+    @staticmethod
+    def manifest_file_of(fasta_file: str) -> str:
+        return f'{fasta_file}.manifest.json'
+
+    @classmethod
+    def load(cls, path: str) -> Optional['runManifest']:
+        if not pathlib.Path(path).exists():
+            return None
+        with open(path) as f:
+            return cls.model_validate_json(f.read())
+
+    def save(self, path: str) -> None:
+        '''Write a temporary file and replace, other processes never read a partial manifest.'''
+        with atomic_path(path) as tmp_path, open(tmp_path, 'w') as f:
+            f.write(self.model_dump_json())
+
+    @classmethod
+    def build(cls, fasta_file: str, records: Iterable[Tuple[str, int]], source: SequenceSource, previous: Optional['runManifest'] = None) -> 'runManifest':
+        '''Hash every record of `source`, `previous` is returned as it is when the fasta has not changed since it was built.
+        '''
+        stat = pathlib.Path(fasta_file).stat()
+        if previous is not None and (previous.fasta_size, previous.fasta_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return previous
+        logger.info(f'Hashing the records of "{fasta_file}"...')
+        return cls(
+            fasta_size=stat.st_size,
+            fasta_mtime_ns=stat.st_mtime_ns,
+            records=[recordEntry(id=seq_id, length=length, digest=record_digest_of(source, seq_id, length)) for seq_id, length in records]
+        )
+
+    def digests(self) -> Dict[str, str]:
+        return {i.id: i.digest for i in self.records}
+
+    def stale_records(self, previous: 'runManifest') -> List[recordEntry]:
+        '''The records of `previous` that are changed or removed in this manifest.'''
+        digests = self.digests()
+        return [i for i in previous.records if digests.get(i.id) != i.digest]
+
+def update_manifest(fasta_file: str, source: SequenceSource, save: bool = True) -> runManifest:
+    '''Load the manifest of the fasta, the records are hashed again when the fasta has changed and the cached window
+    values of the changed records are removed. The new manifest is saved when `save`.
+    '''
+    manifest_file = runManifest.manifest_file_of(fasta_file)
+    previous = runManifest.load(manifest_file)
+    manifest = runManifest.build(fasta_file, source.records(), source, previous)
+    if manifest is not previous:
+        if previous is not None:
+            stale_records = manifest.stale_records(previous)
+            removed = remove_stale_caches(stale_records)
+            logger.info(f'{len(stale_records)} records changed or removed since the last run, {removed} cached files removed.')
+        if save:
+            manifest.save(manifest_file)
+    return manifest
+
+def remove_stale_caches(records: Iterable[recordEntry]) -> int:
+    '''Remove the cached window values (and their pyramids and summaries) of changed or removed records, the cache
+    id of a record ends with its content digest, see `findIdealGCContentSegmentsonFasta.cache_id_of`.
+    '''
+    removed = 0
+    for record in records:
+        for file in glob.glob(f'{ROTATE_WINDOW_CACHE_DIR}/{glob.escape(record.id)}_*{record.digest}_*'):
+            pathlib.Path(file).unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+class recordResults(BaseModel):
+    cache_id: str
+    iter_results: List[iterResult]
+
+def load_record_results(path: str) -> Dict[str, List[iterResult]]:
+    '''The per-round results of the records found by earlier runs with the same parameters, by cache id.
+    '''
+    if not pathlib.Path(path).exists():
+        return {}
+    with JsonlIO(recordResults, path, mode='r') as f:
+        return {i.cache_id: i.iter_results for i in f}
+
+def save_record_results(path: str, results: Dict[str, List[iterResult]], digests: Iterable[str]) -> None:
+    '''Keep the results of the records whose content digest is in `digests`, others belong to changed records.
+    '''
+    digests = set(digests)
+    with atomic_path(path, suffix='.jsonl') as tmp_path, JsonlIO(recordResults, tmp_path, mode='w') as f:
+        for cache_id, iter_results in results.items():
+            if cache_id.rsplit('_', 1)[-1] in digests:
+                f.add_line(recordResults(cache_id=cache_id, iter_results=iter_results))
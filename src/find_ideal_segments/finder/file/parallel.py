@@ -0,0 +1,244 @@
+from ...iterator import IterableSequenceNumRotateCalculation
+from ...encoding import encode
+from typing import List, Literal, Tuple, Dict, Iterable, Iterator, Optional, Set, Callable
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+import multiprocessing
+import queue
+import numpy as np
+from pydantic import BaseModel
+import logging
+logger = logging.getLogger(__name__)
+
+# 共享内存块中每条序列的起始位置按 8 字节对齐，float64 编码的序列也可以直接建立视图
+ALIGNMENT = 8
+# 每个工作进程最多同时映射的共享内存块数
+WORKER_ATTACHED_BLOCKS = 4
+
+class sharedRecord(BaseModel):
+    id: str
+    block: str
+    offset: int
+    length: int
+    dtype: str
+
+
+def read_records_into_shared_memory(
+    records: Iterable[Tuple[str, np.ndarray]],
+    lookup_table: np.ndarray,
+    queue,
+    block_size: int
+) -> None:
+    """
+    读取进程: 逐条读取序列，使用查找表编码后写入共享内存块，并将序列的位置发送给主进程
+
+    多条序列依次写入同一个块，块写满后再创建新块，序列长度超过块大小时单独使用一个块。
+    共享内存块由主进程负责释放，读取结束后发送 None，出错时发送异常对象。
+
+    Args:
+        records: (序列 id, uint8 序列) 迭代器，例如 FastaReader
+        lookup_table: 编码使用的查找表
+        queue: 发送 sharedRecord 的队列
+        block_size: 共享内存块的字节数
+    """
+    shm = None
+    used = 0
+    try:
+        for seq_id, bases in records:
+            nbytes = len(bases) * lookup_table.dtype.itemsize
+            if shm is None or used + nbytes > shm.size:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(create=True, size=max(block_size, nbytes, 1))
+                used = 0
+            # 直接编码到共享内存中，不产生中间数组
+            encode(bases, lookup_table, out=np.ndarray(len(bases), dtype=lookup_table.dtype, buffer=shm.buf, offset=used))
+            queue.put(sharedRecord(id=seq_id, block=shm.name, offset=used, length=len(bases), dtype=lookup_table.dtype.str))
+            used += -(-nbytes // ALIGNMENT) * ALIGNMENT
+        queue.put(None)
+    except BaseException as e:
+        queue.put(e)
+        raise
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+_attached_blocks: OrderedDict[str, shared_memory.SharedMemory] = OrderedDict()
+
+def _attach(block: str) -> shared_memory.SharedMemory:
+    """工作进程中映射共享内存块，只保留最近使用的几个块，主进程释放的块因此能被及时回收"""
+    if block in _attached_blocks:
+        _attached_blocks.move_to_end(block)
+        return _attached_blocks[block]
+    while len(_attached_blocks) >= WORKER_ATTACHED_BLOCKS:
+        _attached_blocks.popitem(last=False)[1].close()
+    shm = shared_memory.SharedMemory(name=block)
+    _attached_blocks[block] = shm
+    return shm
+
+
+def find_next_windows_in_shared_memory(
+    task: Tuple[sharedRecord, List[List[Tuple[int, int]]], int, float, Literal['sum', 'mean'], bool, str, Optional[np.ndarray], dict]
+) -> Tuple[Optional[float], List[Tuple[int, int]]]:
+    """
+    工作进程: 在共享内存中的序列上查找下一轮理想窗口，只返回得分和窗口列表
+
+    Args:
+        task: (序列位置, 排除区域列表, 窗口大小, 理想值, 窗口计算方法, 是否过滤部分重叠的结果, 窗口缓存 id, 不扫描的区域, 内存相关参数)
+
+    Returns:
+        (得分, 窗口列表)，与 IterableSequenceNumRotateCalculation.find_next_ideal_windows 相同
+    """
+    record, excluding_window_list, window, ideal_value, window_apply_method, filter_out_partial_overlapped_result, cache_id, skipped_regions, options = task
+    shm = _attach(record.block)
+    arr = np.ndarray(record.length, dtype=np.dtype(record.dtype), buffer=shm.buf, offset=record.offset)
+    rotator = IterableSequenceNumRotateCalculation(
+        window=window,
+        arr=arr,
+        excluding_window_list=excluding_window_list,
+        cache_id=cache_id,
+        skipped_regions=skipped_regions,
+        **options
+    )
+    result = rotator.find_next_ideal_windows(
+        ideal_value=ideal_value,
+        window_apply_method=window_apply_method,
+        filter_out_partial_overlapped_result=filter_out_partial_overlapped_result
+    )
+    # 释放对共享内存的引用，之后才能关闭该块
+    del rotator, arr
+    return result
+
+
+class SharedMemoryWindowScanner:
+    """多进程查找每条序列的下一轮理想窗口
+
+    一个读取进程负责解析和编码序列，并写入共享内存；工作进程直接映射共享内存中的序列进行滑动窗口计算，
+    进程之间只传递序列位置和窗口列表，不序列化大数组。序列在第一轮读取后一直保留在共享内存中，
+    之后的轮次不再重新读取和编码，已经不再参与查找的序列所在的块会被释放。
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Tuple[str, np.ndarray]],
+        lookup_table: np.ndarray,
+        workers: int,
+        block_size: int = 1 << 26,
+    ):
+        """
+        启动读取进程和工作进程
+
+        Args:
+            records: 可以被序列化到读取进程的 (序列 id, uint8 序列) 迭代器，例如 FastaReader
+            lookup_table: 编码使用的查找表
+            workers: 工作进程数
+            block_size: 共享内存块的字节数
+        """
+        context = multiprocessing.get_context('spawn')
+        self.queue = context.Queue()
+        self.reader = context.Process(
+            target=read_records_into_shared_memory,
+            args=(records, lookup_table, self.queue, block_size),
+            daemon=True
+        )
+        self.reader.start()
+        self.pool = context.Pool(workers)
+        self.records: Dict[str, sharedRecord] = {}
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.reading = True
+
+    def _receive(self) -> None:
+        """从读取进程接收一条序列的位置"""
+        try:
+            item = self.queue.get(timeout=1)
+        except queue.Empty:
+            if not self.reader.is_alive():
+                self.reading = False
+                raise RuntimeError(f'The reader process exited unexpectedly with code {self.reader.exitcode}.')
+            return
+        if item is None:
+            self.reading = False
+        elif isinstance(item, BaseException):
+            self.reading = False
+            raise item
+        else:
+            if item.block not in self.blocks:
+                # 主进程映射每个块，负责在不再需要时释放
+                self.blocks[item.block] = shared_memory.SharedMemory(name=item.block)
+            self.records[item.id] = item
+
+    def get(self, seq_id: str) -> sharedRecord:
+        """返回序列在共享内存中的位置，序列还没有读取到时等待读取进程"""
+        while seq_id not in self.records and self.reading:
+            self._receive()
+        if seq_id not in self.records:
+            raise KeyError(f'Sequence "{seq_id}" is not found by the reader.')
+        return self.records[seq_id]
+
+    def scan(
+        self,
+        seqs: Iterable,
+        window: int,
+        ideal_value: float,
+        window_apply_method: Literal['sum', 'mean'] = 'mean',
+        filter_out_partial_overlapped_result: bool = True,
+        cache_id_of: Callable[[str], str] = str,
+        rotator_options: Optional[dict] = None,
+        skipped_regions_of: Optional[Callable[[str], Optional[np.ndarray]]] = None
+    ) -> Iterator[Tuple[object, Optional[float], List[Tuple[int, int]]]]:
+        """
+        按 seqs 的顺序返回每条序列的 (序列, 得分, 窗口列表)，序列在工作进程中并行计算
+
+        Args:
+            seqs: seqItem 迭代器，使用 id 和 iter_results 中已经找到的窗口
+            window: 窗口大小
+            ideal_value: 理想值
+            window_apply_method: 窗口计算方法
+            filter_out_partial_overlapped_result: 是否过滤部分重叠的结果
+            cache_id_of: 序列 id 到窗口缓存 id 的映射，在主进程中调用
+            rotator_options: 传给 IterableSequenceNumRotateCalculation 的分块大小等参数
+            skipped_regions_of: 序列 id 到不扫描的区域的映射，在主进程中调用
+        """
+        pending = deque()
+        used_blocks: Set[str] = set()
+
+        def tasks():
+            for seq in seqs:
+                record = self.get(seq.id)
+                used_blocks.add(record.block)
+                pending.append(seq)
+                yield (
+                    record, [i.windows for i in seq.iter_results], window, ideal_value,
+                    window_apply_method, filter_out_partial_overlapped_result, cache_id_of(seq.id),
+                    None if skipped_regions_of is None else skipped_regions_of(seq.id), rotator_options or {}
+                )
+
+        for score, windows in self.pool.imap(find_next_windows_in_shared_memory, tasks()):
+            yield pending.popleft(), score, windows
+        # 之后的轮次只会查找这一轮中的部分序列，这一轮没有用到的块可以释放
+        self.release(set(self.blocks) - used_blocks)
+
+    def release(self, blocks: Iterable[str]) -> None:
+        for block in blocks:
+            shm = self.blocks.pop(block)
+            shm.close()
+            shm.unlink()
+        self.records = {k: v for k, v in self.records.items() if v.block in self.blocks}
+
+    def close(self) -> None:
+        self.pool.terminate()
+        self.pool.join()
+        # 先取完队列中的内容，读取进程才能退出，之后释放所有块
+        try:
+            while self.reading:
+                self._receive()
+        finally:
+            self.reader.join()
+            self.release(list(self.blocks))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
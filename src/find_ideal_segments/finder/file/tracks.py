@@ -0,0 +1,122 @@
+from ...io.jsonl import Compression
+from ...encoding import build_lookup_table, track_dict, kmer_size_of
+from ...core import SequenceNumRotateCalculation
+from ...iterator import load_cached_window_values, rotate_window_cache_file
+from ...io.stream import StreamedSequence
+from .wordratio import word_dict_digest
+from .gccontent import findIdealGCContentSegmentsonFasta
+from pydantic import BaseModel
+from typing import Literal, Optional, List, Dict
+import numpy as np
+import hashlib
+import json
+import logging
+logger = logging.getLogger(__name__)
+
+class trackTarget(BaseModel):
+    '''One term of the combined objective, `weight * |window value of the track - value|`.'''
+    track: str|Dict[str, float|int]
+    value: float
+    weight: float = 1
+    beyond: float|int = 0
+
+    @classmethod
+    def parse(cls, text: str) -> 'trackTarget':
+        '''Parse "TRACK=VALUE" or "TRACK=VALUE:WEIGHT", e.g. "GC=0.5" or "purine=0.5:2".'''
+        track, sep, target = text.partition('=')
+        if not sep:
+            raise ValueError(f'Invalid target "{text}", use "TRACK=VALUE" or "TRACK=VALUE:WEIGHT".')
+        value, _, weight = target.partition(':')
+        return cls(track=track.strip(), value=float(value), weight=float(weight) if weight else 1)
+
+class findIdealMultiTrackSegmentsonFasta(findIdealGCContentSegmentsonFasta):
+    def __init__(
+        self,
+        fasta_file: str,
+        window: int,
+        top: int,
+        targets: List[trackTarget|dict],
+        window_apply_method: Literal['sum', 'mean'] = 'mean',
+        filter_out_partial_overlapped_result: bool = True,
+        cache: bool = True,
+        sort_chunk_size: int = 10_000_000,
+        precision: int = 4,
+        intermediate_compression: Optional[Compression] = None,
+        threads: Optional[int] = None,
+        memory_limit: Optional[int|str] = None,
+        skip_gaps: bool = False,
+        skip_soft_masked: bool = False,
+        include_bed: Optional[str] = None,
+        exclude_bed: Optional[str] = None
+    ):
+        '''Find the segments closest to several tracks at once.
+
+        The score of a window is the combined objective `sum(weight * |window value of the track - value|)` over
+        `targets`, so the ideal value is 0 and the score is the distance. Every track ("GC", "AT", "purine", ... or a
+        custom word dict) is computed from the same bases by its lookup table when the window values of a sequence
+        are cached, nothing is encoded or cached per track. The sequences are scanned in one process.
+        '''
+        if not targets:
+            raise ValueError('At least one target is needed.')
+        self.targets = [i if isinstance(i, trackTarget) else trackTarget(**i) for i in targets]
+        self.lookup_tables = [build_lookup_table(track_dict(i.track), i.beyond) for i in self.targets]
+        content = [(word_dict_digest(track_dict(i.track), i.beyond), i.value, i.weight) for i in self.targets]
+        self.objective_digest = hashlib.sha1(json.dumps(content).encode()).hexdigest()[:12]
+        super().__init__(
+            fasta_file=fasta_file,
+            window=window,
+            top=top,
+            ideal_value=0,
+            beyond_word_dict_value=self.targets[0].beyond,
+            dict_mode=self.targets[0].track,
+            window_apply_method=window_apply_method,
+            filter_out_partial_overlapped_result=filter_out_partial_overlapped_result,
+            cache=cache,
+            sort_chunk_size=sort_chunk_size,
+            precision=precision,
+            intermediate_compression=intermediate_compression,
+            threads=threads,
+            memory_limit=memory_limit,
+            skip_gaps=skip_gaps,
+            skip_soft_masked=skip_soft_masked,
+            include_bed=include_bed,
+            exclude_bed=exclude_bed
+        )
+
+    def load_numeric_file(self):
+        super().load_numeric_file()
+        # 窗口值由 load_rotate_window_values 给出，扫描时只用到序列长度，用不占内存的零数组代替编码后的序列
+        self.seq_loader = lambda seq_id: np.broadcast_to(np.uint8(0), (self.lengths[seq_id],))
+
+    def cache_id_of(self, seq_id: str) -> str:
+        return f'{seq_id}_{self.objective_digest}_{self.record_digests[seq_id]}'
+
+    def load_rotate_window_values(self, seq_id: str) -> np.ndarray:
+        length = self.lengths[seq_id] - self.window + 1
+        if length <= 0:
+            return np.zeros(0, dtype=np.float64)
+        return load_cached_window_values(
+            rotate_window_cache_file(self.cache_id_of(seq_id), self.window, self.window_apply_method),
+            length,
+            lambda out: self.fill_objective(seq_id, out),
+            max_resident_bytes=self.window_cache_resident_bytes
+        )
+
+    def fill_objective(self, seq_id: str, out: np.ndarray) -> None:
+        '''Write the combined objective of every window of the sequence into `out`, the bases are streamed chunk by
+        chunk and every track is encoded from the same chunk.
+        '''
+        chunk_size = max(self.scan_chunk_size, self.window)
+        # 每块多读取窗口大小减一，以及 k-mer 轨道在块末尾需要的 k-1 个碱基
+        overlap = self.window - 1 + max(kmer_size_of(i) for i in self.lookup_tables) - 1
+        for start, bases in StreamedSequence(self.word_file, seq_id, self.lengths[seq_id]).chunks(chunk_size, overlap=overlap):
+            if start >= len(out):
+                break
+            end = min(start + chunk_size, len(out))
+            values = np.zeros(end - start, dtype=np.float64)
+            for target, lookup_table in zip(self.targets, self.lookup_tables):
+                track_length = end - start + self.window - 1
+                track = lookup_table[bases[:track_length + kmer_size_of(lookup_table) - 1]][:track_length].astype(np.float64)
+                track_values = SequenceNumRotateCalculation(self.window, track).rotate_on_window(track, method=self.window_apply_method)
+                values += target.weight * np.abs(track_values - target.value)
+            out[start:end] = values
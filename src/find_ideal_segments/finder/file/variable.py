@@ -0,0 +1,118 @@
+from ...io.jsonl import JsonlIO, Compression
+from ...core import SequenceNumRotateCalculation
+from ...iterator import IterableSequenceNumRotateCalculation
+from ...memory import PREFIX_SUM_BYTES, VARIABLE_CELL_BYTES
+from .base import selectedWindow
+from .gccontent import findIdealGCContentSegmentsonFasta
+from typing import Literal, Optional
+import heapq
+import numpy as np
+import logging
+logger = logging.getLogger(__name__)
+
+class findIdealVariableSegmentsonFasta(findIdealGCContentSegmentsonFasta):
+    def __init__(
+        self,
+        fasta_file: str,
+        window: int,
+        max_window: int,
+        top: int,
+        ideal_value: float,
+        window_step: int = 1,
+        beyond_word_dict_value: float|int = 0,
+        dict_mode: str|dict = 'GC',
+        window_apply_method: Literal['sum', 'mean'] = 'mean',
+        filter_out_partial_overlapped_result: bool = True,
+        cache: bool = True,
+        sort_chunk_size: int = 10_000_000,
+        precision: int = 4,
+        intermediate_compression: Optional[Compression] = None,
+        threads: Optional[int] = None,
+        memory_limit: Optional[int|str] = None,
+        skip_gaps: bool = False,
+        skip_soft_masked: bool = False,
+        include_bed: Optional[str] = None,
+        exclude_bed: Optional[str] = None
+    ):
+        '''Find the segments closest to the ideal value among all window sizes `window`, `window + window_step`, ...
+        up to `max_window` in one pass over the fasta.
+
+        Every sequence is searched by `SequenceNumRotateCalculation.find_ideal_variable_windows` on one prefix sum, the
+        `top` best segments of every sequence are merged by their difference to the ideal value. With
+        `filter_out_partial_overlapped_result` the segments never overlap, otherwise only the same (start, length) is
+        not selected twice. The `end_idx` of a result is its start plus its length. The sequences are scanned in one process.
+        `memory_limit` counts the longest sequence loaded whole with its prefix sum, see `search_bytes`.
+        '''
+        if max_window < window:
+            raise ValueError(f'max_window {max_window} is smaller than window {window}.')
+        self.max_window = max_window
+        self.window_step = window_step
+        super().__init__(
+            fasta_file=fasta_file,
+            window=window,
+            top=top,
+            ideal_value=ideal_value,
+            beyond_word_dict_value=beyond_word_dict_value,
+            dict_mode=dict_mode,
+            window_apply_method=window_apply_method,
+            filter_out_partial_overlapped_result=filter_out_partial_overlapped_result,
+            cache=cache,
+            sort_chunk_size=sort_chunk_size,
+            precision=precision,
+            intermediate_compression=intermediate_compression,
+            threads=threads,
+            memory_limit=memory_limit,
+            skip_gaps=skip_gaps,
+            skip_soft_masked=skip_soft_masked,
+            include_bed=include_bed,
+            exclude_bed=exclude_bed
+        )
+
+    def search_bytes(self, max_length: int) -> int:
+        '''The longest sub-sequence is loaded whole with its float64 prefix sum, and the bounds of its
+        (start, length) cells are kept while searching it.
+        '''
+        n_lengths = (self.max_window - self.window) // self.window_step + 1
+        # 小格至少为 16 个起始位置 × 16 个碱基的长度，数量不超过 find_ideal_variable_windows 的 max_cells
+        n_cells = min(1 << 24, -(-max_length * n_lengths * self.window_step // 256))
+        return max_length * (self.lookup_table.dtype.itemsize + PREFIX_SUM_BYTES) + n_cells * VARIABLE_CELL_BYTES
+
+    def select_windows(self, save_path: str = None) -> JsonlIO[selectedWindow]:
+        '''Search every sequence (between its skipped regions) for its `top` best segments and keep the `top` best of all.
+        '''
+        # (差异, 序列顺序, 起始, 长度, 窗口值, 序列 id)，不同序列或不同子序列的片段不会重叠
+        best = []
+        for seq_order, (seq_id, _) in enumerate(self.word_file.records()):
+            arr = self.seq_loader(seq_id)
+            rotator = IterableSequenceNumRotateCalculation(self.window, arr, skipped_regions=self.skipped_regions_of(seq_id))
+            for offset, sub_arr in rotator.get_sub_arrs(arr, []):
+                # 所有窗口大小共用子序列的前缀和，子序列整段读入
+                segments = SequenceNumRotateCalculation(self.window, np.asarray(sub_arr)).find_ideal_variable_windows(
+                    ideal_value=self.ideal_value,
+                    min_window=self.window,
+                    max_window=self.max_window,
+                    top=self.top,
+                    window_apply_method=self.window_apply_method,
+                    window_step=self.window_step,
+                    filter_out_overlapped_result=self.filter_out_partial_overlapped_result,
+                    block_size=self.scan_chunk_size
+                )
+                for start, length, score in segments:
+                    score = round(score, self.precision)
+                    best.append((round(abs(score - self.ideal_value), self.precision), seq_order, offset + start, length, score, seq_id))
+            best = heapq.nsmallest(self.top, best)
+            logger.info(f'Searched "{seq_id}", the closest difference so far is {best[0][0] if best else None}.')
+
+        selected_windows: JsonlIO[selectedWindow] = JsonlIO(selectedWindow, file_path=save_path)
+        selected_windows.empty()
+        for diff, _, start, length, score, seq_id in best:
+            selected_windows.add_line(selectedWindow(
+                seq_id=seq_id,
+                start_idx=start,
+                end_idx=start + length,
+                consecutive_window_length=1,
+                score=score,
+                score_diff=diff
+            ))
+        selected_windows.flush()
+        return selected_windows
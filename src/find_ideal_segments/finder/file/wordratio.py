@@ -1,6 +1,13 @@
 from .base import windowFinderinJsonl, JsonlIO, seqItem, selectedWindow
-from typing import Literal, List, Dict
+from ...io.jsonl import Compression, strip_jsonl_suffix, with_compression_suffix
+from ...io.sink import ResultSink
+from ...encoding import KmerLookupTable
+from typing import Literal, List, Dict, Optional, Callable
+import numpy as np
+from ...seqarray import numeric_dtype_of
 import pathlib
+import hashlib
+import json
 import logging
 import shutil
 logger = logging.getLogger(__name__)
@@ -11,6 +18,13 @@ class wordSeqItem(seqItem):
 class selectedWindowExtended(selectedWindow):
     seq: str = None
 
+def word_dict_digest(word_dict: Dict[str, float|int], beyond_word_dict_value: float|int = 0) -> str:
+    '''A short digest of the word dict, sequences encoded by the same dict share it.
+    '''
+    # 1 和 1.0 编码结果相同，统一为浮点数
+    content = [sorted((k, float(v)) for k, v in word_dict.items()), float(beyond_word_dict_value)]
+    return hashlib.sha1(json.dumps(content).encode()).hexdigest()[:12]
+
 class findIdealWordRatioInSlidingWindow(windowFinderinJsonl):
     def __init__(
         self, 
@@ -24,29 +38,46 @@ class findIdealWordRatioInSlidingWindow(windowFinderinJsonl):
         beyond_word_dict_value: float|int = 0,
         cache_numeric_file: bool|str = False,
         sort_chunk_size: int = 10_000_000,
-        precision:int = 4
+        precision:int = 4,
+        intermediate_compression: Optional[Compression] = None
     ):
-        self.word_file:JsonlIO[wordSeqItem] = JsonlIO(wordSeqItem, file_path=word_file, mode='r')
+        self.word_file:JsonlIO[wordSeqItem] = self.open_word_file(word_file)
         self.word_dict = word_dict
         self.beyond_word_dict_value = beyond_word_dict_value
+        self.word_dict_digest = word_dict_digest(word_dict, beyond_word_dict_value)
         self.cache_numeric_file = cache_numeric_file
+        self.intermediate_compression = intermediate_compression
+        self.seq_loader = None
         self.load_numeric_file()
-        super().__init__(self.numeric_file.file_path, window, top, ideal_value, window_apply_method, filter_out_partial_overlapped_result, sort_chunk_size, precision)
+        super().__init__(
+            self.numeric_file.file_path, window, top, ideal_value, window_apply_method, filter_out_partial_overlapped_result, 
+            sort_chunk_size, precision, intermediate_compression, seq_loader=self.seq_loader
+        )
+
+    def cache_id_of(self, seq_id: str) -> str:
+        '''Sequences encoded by different word dicts have different rotate window values.
+        '''
+        return f'{seq_id}_{self.word_dict_digest}'
+
+    def open_word_file(self, word_file: str) -> JsonlIO[wordSeqItem]:
+        return JsonlIO(wordSeqItem, file_path=word_file, mode='r')
     
     def load_numeric_file(self):
         logger.info(f'Loading numeric file for "{self.word_file.file_path}"...')
         if self.cache_numeric_file:
             cache_file_path = self.cache_numeric_file \
                 if isinstance(self.cache_numeric_file, str) \
-                    else (self.word_file.file_path.rsplit('.',1)[0] + '.numeric.jsonl')
+                    else with_compression_suffix(strip_jsonl_suffix(self.word_file.file_path) + '.numeric.jsonl', self.intermediate_compression)
             
-            if pathlib.Path(cache_file_path).exists():
+            # 单词文件更新后重新编码
+            if pathlib.Path(cache_file_path).exists() and \
+                    pathlib.Path(cache_file_path).stat().st_mtime >= pathlib.Path(self.word_file.file_path).stat().st_mtime:
                 self.numeric_file = JsonlIO(seqItem, file_path=cache_file_path)
             else:
                 self.numeric_file = self.to_numeric_file(self.word_file, self.word_dict, self.beyond_word_dict_value, save_path=cache_file_path)
 
         else:
-            self.numeric_file = self.to_numeric_file(self.word_file, self.word_dict, self.beyond_word_dict_value)
+            self.numeric_file = self.to_numeric_file(self.word_file, self.word_dict, self.beyond_word_dict_value, compression=self.intermediate_compression)
         logger.info(f'Numeric file loaded from "{self.numeric_file.file_path}".')
 
     @classmethod
@@ -55,33 +86,59 @@ class findIdealWordRatioInSlidingWindow(windowFinderinJsonl):
         word_file: JsonlIO[wordSeqItem], 
         word_dict: Dict[str, float|int], 
         beyond_word_dict_value: float|int = 0,
-        save_path: str = None
+        save_path: str = None,
+        compression: Optional[Compression] = None
     )->JsonlIO[seqItem]:
+        '''Every character is a word. With k-mer words (keys of k characters) every position takes the k-mer
+        starting there, case-insensitively, the same as `KmerLookupTable`.
+        '''
+        k = KmerLookupTable(word_dict).k if any(len(word) > 1 for word in word_dict) else 1
+        if k > 1:
+            word_dict = {word.upper(): value for word, value in word_dict.items()}
         def word2num(word: str)->float|int:
             if word in word_dict:
                 return word_dict[word]
             else:
                 return beyond_word_dict_value
-        numeric_file: JsonlIO[seqItem] = JsonlIO(seqItem, file_path=save_path)
+        # 编码结果直接写入数组，不生成每个碱基一个 Python 数值的列表
+        dtype = numeric_dtype_of([*word_dict.values(), beyond_word_dict_value])
+        numeric_file: JsonlIO[seqItem] = JsonlIO(seqItem, file_path=save_path, compression=compression)
+        # 过期的缓存文件重新写入
+        numeric_file.empty()
         for seq in word_file:
+            words = seq.seq if k == 1 else (seq.seq[i:i+k].upper() for i in range(len(seq.seq)))
             item = seqItem(
                 id=seq.id,
-                seq=[word2num(i) for i in seq.seq]
+                seq=np.fromiter(map(word2num, words), dtype=dtype, count=len(seq.seq))
             )
             numeric_file.add_line(item)
+        numeric_file.flush()
         return numeric_file
     
-    def find(self, save_path = None, human_readable_idx: bool = True)->JsonlIO[selectedWindowExtended]:
-        result = super().find(save_path=save_path)
+    def find(
+        self, save_path = None, human_readable_idx: bool = True, sink: ResultSink[selectedWindowExtended] = None
+    )->JsonlIO[selectedWindowExtended]|ResultSink[selectedWindowExtended]:
+        '''When `sink` is given, the selected windows are kept in a temporary file and the decyphered
+        result is written into `sink` in one pass, `save_path` is ignored.
+        '''
+        result = self.select_windows(save_path=save_path if sink is None else None)
         logger.info(f'Compute completed. Decyphering result, human readable index:{human_readable_idx}...')
-        result = self.decypher_result(self.word_file, result, human_readable_idx)
+        result = self.decypher_result(self.word_file, result, human_readable_idx, sink=sink)
         self.numeric_file.close()
-        self.word_file.close()
+        self.close_word_file()
         return result
+
+    def select_windows(self, save_path: str = None) -> JsonlIO[selectedWindow]:
+        '''The selected windows before they are decyphered, found round by round by `windowFinderinJsonl.find`.
+        '''
+        return super().find(save_path=save_path)
+
+    def close_word_file(self):
+        self.word_file.close()
     
-    def decypher_result(
-        self, word_file:JsonlIO[wordSeqItem], result_file:JsonlIO[selectedWindow], human_readable_idx: bool = True
-    )->JsonlIO[selectedWindowExtended]:
+    def segment_fetcher(self, word_file:JsonlIO[wordSeqItem]) -> Callable[[str, int, int], str]:
+        '''Return a function that fetches the `[start, end)` segment of a sequence by its id.
+        '''
 
         class cache:
             def __init__(self, cache_size:int=100): 
@@ -111,16 +168,35 @@ class findIdealWordRatioInSlidingWindow(windowFinderinJsonl):
                 second_cache.add(id, value)
             else:
                 for seq in word_file:
-                    second_cache.add(id, seq.seq)
+                    second_cache.add(seq.id, seq.seq)
                     if seq.id == id:
                         first_cache.add(id, seq.seq)
                         break
             return first_cache.get(id)
-        
+
+        return lambda id, start, end: find_seq(id)[start:end]
+    
+    def decypher_result(
+        self, 
+        word_file:JsonlIO[wordSeqItem], 
+        result_file:JsonlIO[selectedWindow], 
+        human_readable_idx: bool = True, 
+        sink: ResultSink[selectedWindowExtended] = None
+    )->JsonlIO[selectedWindowExtended]|ResultSink[selectedWindowExtended]:
+        fetch_segment = self.segment_fetcher(word_file)
+
+        if sink is not None:
+            for item in result_file:
+                seq = fetch_segment(item.seq_id, item.start_idx, item.end_idx)
+                if human_readable_idx:
+                    item.start_idx += 1
+                sink.add_line(selectedWindowExtended(**item.model_dump(), seq=seq))
+            result_file.close()
+            return sink
+
         with JsonlIO[selectedWindowExtended](selectedWindowExtended) as tmp_result_file:
             for item in result_file:
-                seq = find_seq(item.seq_id)
-                seq = seq[item.start_idx:item.end_idx]
+                seq = fetch_segment(item.seq_id, item.start_idx, item.end_idx)
                 if human_readable_idx:
                     item.start_idx += 1
                 tmp_result_file.add_line(selectedWindowExtended(**item.model_dump(), seq=seq))
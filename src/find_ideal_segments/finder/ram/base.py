@@ -1,8 +1,8 @@
 from ...iterator import IterableSequenceNumRotateCalculation
+from ...seqarray import NumericArray
 from typing import List, Literal, Annotated
 from typing import Tuple
 import json
-import pandas as pd
 from pydantic import BaseModel
 
 class iterResult(BaseModel):
@@ -10,8 +10,9 @@ class iterResult(BaseModel):
     windows: List[Tuple[int, int]]
 
 class seqItem(BaseModel):
+    '''`seq` is a numpy array, lists and memory mapped arrays are accepted, see `seqarray.NumericArray`.'''
     id: str
-    seq: List[int|float]
+    seq: NumericArray
     iter_results:List[iterResult] = []
 
 class seqBundle(BaseModel):
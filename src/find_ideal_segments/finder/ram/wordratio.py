@@ -1,5 +1,7 @@
 from .base import windowFinderinBundleSeqs, seqBundle, seqItem
 from typing import Literal, List, Dict
+import numpy as np
+from ...seqarray import numeric_dtype_of
 
 class wordSeqItem(seqItem):
     seq: str
@@ -31,11 +33,12 @@ class findIdealWordRatioInSlidingWindow(windowFinderinBundleSeqs):
                 return self.word_dict[word]
             else:
                 return self.beyond_word_dict_value
+        dtype = numeric_dtype_of([*self.word_dict.values(), self.beyond_word_dict_value])
         bundle = seqBundle(id=word_bundle.id, seqs=[])
         for seq in word_bundle.seqs:
             item = seqItem(
                 id=seq.id,
-                seq=[word2num(i) for i in seq.seq]
+                seq=np.fromiter(map(word2num, seq.seq), dtype=dtype, count=len(seq.seq))
             )
             bundle.seqs.append(item)
         return bundle
\ No newline at end of file
@@ -0,0 +1,28 @@
+import os
+import pathlib
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def atomic_path(path: str, suffix: str = '') -> Iterator[str]:
+    """
+    先写入同一目录下名称唯一的临时文件，成功后替换目标文件，失败时删除临时文件
+
+    同一进程的多个线程（例如 gccontent-server 的并发查询）或多个进程同时写入同一文件时，
+    各自使用不同的临时文件，读取者不会读到不完整的文件。
+
+    参数:
+        path: 目标文件路径
+        suffix: 临时文件的扩展名，例如按扩展名决定压缩格式的 '.jsonl'
+
+    返回:
+        临时文件路径
+    """
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp{suffix}'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        pathlib.Path(tmp_path).unlink(missing_ok=True)
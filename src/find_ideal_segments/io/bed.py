@@ -0,0 +1,81 @@
+import gzip
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+
+def iter_bed(bed_file: str) -> Iterator[Tuple[str, int, int]]:
+    """
+    逐行读取 BED 文件的区域，跳过空行、注释、track 和 browser 行
+
+    参数:
+        bed_file: BED 文件，以 .gz 结尾时按 gzip 读取
+
+    返回:
+        (序列 id, 起始, 结束) 迭代器，从 0 开始的半开区间
+    """
+    with (gzip.open(bed_file, 'rt') if bed_file.endswith('.gz') else open(bed_file)) as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            try:
+                seq_id, start, end = fields[0], int(fields[1]), int(fields[2])
+            except (IndexError, ValueError):
+                raise ValueError(f'Invalid BED line {line_num} of "{bed_file}": {line.rstrip()!r}.')
+            if start < 0 or end < start:
+                raise ValueError(f'Invalid BED region {seq_id}:{start}-{end} at line {line_num} of "{bed_file}".')
+            yield seq_id, start, end
+
+
+def merge_regions(regions: np.ndarray) -> np.ndarray:
+    """
+    合并重叠或相接的区域
+
+    参数:
+        regions: int64 数组，shape 为 (区域数, 2)，每行为 [起始, 结束)
+
+    返回:
+        按起始位置排序且互不重叠的区域
+    """
+    regions = np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+    regions = regions[np.argsort(regions[:, 0], kind='stable')]
+    if len(regions) == 0:
+        return regions
+    # 前面所有区域的最远结束位置不小于当前起始时，当前区域并入之前的区域
+    reach = np.maximum.accumulate(regions[:, 1])
+    new_group = np.concatenate(([True], regions[1:, 0] > reach[:-1]))
+    group_ends = np.concatenate((np.flatnonzero(new_group)[1:] - 1, [len(regions) - 1]))
+    return np.stack([regions[new_group, 0], reach[group_ends]], axis=1)
+
+
+def complement_regions(regions: np.ndarray, length: int) -> np.ndarray:
+    """
+    [0, length) 中不属于任何区域的部分
+
+    参数:
+        regions: merge_regions 合并后的区域
+        length: 序列长度
+
+    返回:
+        互补的区域，shape 为 (区域数, 2)
+    """
+    regions = np.clip(regions, 0, length)
+    bounds = np.concatenate(([0], regions.ravel(), [length])).reshape(-1, 2)
+    return bounds[bounds[:, 1] > bounds[:, 0]]
+
+
+def read_bed(bed_file: str) -> Dict[str, np.ndarray]:
+    """
+    读取 BED 文件，按序列 id 合并区域
+
+    参数:
+        bed_file: BED 文件
+
+    返回:
+        字典，键为序列 id，值为 merge_regions 合并后的区域
+    """
+    regions: Dict[str, list] = {}
+    for seq_id, start, end in iter_bed(bed_file):
+        regions.setdefault(seq_id, []).append((start, end))
+    return {seq_id: merge_regions(np.array(i, dtype=np.int64)) for seq_id, i in regions.items()}
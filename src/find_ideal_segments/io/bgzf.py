@@ -0,0 +1,223 @@
+import os
+import mmap
+import struct
+import zlib
+import pathlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple, BinaryIO
+
+import numpy as np
+
+GZIP_MAGIC = b'\x1f\x8b'
+# BGZF 块头: gzip 魔数、deflate、FEXTRA 标志，附加字段中包含 'BC' 子字段记录块大小
+BGZF_HEADER = b'\x1f\x8b\x08\x04'
+
+
+def is_gzip(file_path: str) -> bool:
+    with open(file_path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def is_bgzf(file_path: str) -> bool:
+    """判断文件是否为 BGZF 格式（samtools / bgzip 生成的分块 gzip）"""
+    with open(file_path, 'rb') as f:
+        header = f.read(18)
+    return len(header) == 18 and header[:4] == BGZF_HEADER and header[12:14] == b'BC'
+
+
+def _block_size(buf, offset: int) -> Tuple[int, int]:
+    """
+    解析 offset 处的 BGZF 块头
+
+    返回:
+        (块的压缩大小, 块头长度)
+    """
+    if buf[offset:offset+4] != BGZF_HEADER:
+        raise ValueError(f'Invalid BGZF block at offset {offset}.')
+    xlen = struct.unpack_from('<H', buf, offset + 10)[0]
+    pos = offset + 12
+    while pos < offset + 12 + xlen:
+        si1, si2, slen = buf[pos], buf[pos+1], struct.unpack_from('<H', buf, pos + 2)[0]
+        if si1 == 66 and si2 == 67:
+            return struct.unpack_from('<H', buf, pos + 4)[0] + 1, 12 + xlen
+        pos += 4 + slen
+    raise ValueError(f'Missing BGZF block size at offset {offset}.')
+
+
+def read_gzi(gzi_path: str) -> np.ndarray:
+    """读取 .gzi 索引，返回包含第一个块 (0, 0) 的 [块数, 2] 数组 (压缩偏移, 解压偏移)"""
+    with open(gzi_path, 'rb') as f:
+        num = struct.unpack('<Q', f.read(8))[0]
+        entries = np.frombuffer(f.read(16 * num), dtype='<u8').reshape(num, 2)
+    return np.concatenate((np.zeros((1, 2), dtype=np.uint64), entries.astype(np.uint64)))
+
+
+def write_gzi(offsets: np.ndarray, gzi_path: str) -> None:
+    """写出与 bgzip -i 相同格式的 .gzi 索引，不包含第一个块"""
+    entries = np.ascontiguousarray(offsets[1:], dtype='<u8')
+    with open(gzi_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(entries)))
+        f.write(entries.tobytes())
+
+
+class BgzfArray:
+    """将 BGZF 文件解压后的内容作为只读 uint8 数组访问
+
+    通过 .gzi 索引定位块，切片时只解压需要的块，多个块使用线程池并行解压（zlib 解压时会释放 GIL）。
+    支持 len()、整数下标和步长为 1 的切片，可以替代 IndexedFasta 中的内存映射。
+    """
+
+    def __init__(
+        self, 
+        file_path: str, 
+        gzi_path: Optional[str] = None, 
+        threads: Optional[int] = None, 
+        cache_blocks: int = 256, 
+        write_index: bool = True
+    ):
+        """
+        打开 BGZF 文件，.gzi 索引不存在或比文件旧时重新生成
+
+        参数:
+            file_path: BGZF 文件路径
+            gzi_path: 索引路径，默认为 <file_path>.gzi
+            threads: 解压线程数，默认为 CPU 核数
+            cache_blocks: 缓存的已解压块数
+            write_index: 重新生成的索引是否写出到 gzi_path，只顺序读取一次时可以不写出
+        """
+        self.path = file_path
+        self.gzi_path = gzi_path if gzi_path is not None else file_path + '.gzi'
+        self.threads = threads or os.cpu_count() or 1
+        self.cache_blocks = cache_blocks
+        self.cache: OrderedDict[int, bytes] = OrderedDict()
+        # 多个线程共用同一个对象时保护缓存
+        self.lock = threading.Lock()
+        self.file = open(file_path, 'rb')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index_built = False
+        gzi = pathlib.Path(self.gzi_path)
+        if gzi.exists() and gzi.stat().st_mtime >= pathlib.Path(file_path).stat().st_mtime:
+            offsets = read_gzi(self.gzi_path)
+        else:
+            offsets = self._scan_blocks()
+            if write_index:
+                write_gzi(offsets, self.gzi_path)
+                self.index_built = True
+        self.coffsets = offsets[:, 0].astype(np.int64)
+        self.uoffsets = offsets[:, 1].astype(np.int64)
+        last = int(self.coffsets[-1])
+        self.length = int(self.uoffsets[-1]) + self._isize(last)
+        self.executor = ThreadPoolExecutor(max_workers=self.threads) if self.threads > 1 else None
+
+    def _isize(self, coffset: int) -> int:
+        if coffset >= len(self.buf):
+            return 0
+        size, _ = _block_size(self.buf, coffset)
+        return struct.unpack_from('<I', self.buf, coffset + size - 4)[0]
+
+    def _scan_blocks(self) -> np.ndarray:
+        """依次读取块头和块尾，得到每个块的 (压缩偏移, 解压偏移)"""
+        offsets: List[Tuple[int, int]] = []
+        coffset, uoffset = 0, 0
+        while coffset < len(self.buf):
+            size, _ = _block_size(self.buf, coffset)
+            isize = struct.unpack_from('<I', self.buf, coffset + size - 4)[0]
+            if isize or not offsets:
+                offsets.append((coffset, uoffset))
+            coffset += size
+            uoffset += isize
+        return np.array(offsets if offsets else [(0, 0)], dtype=np.uint64)
+
+    def _decompress(self, block: int) -> bytes:
+        coffset = int(self.coffsets[block])
+        size, header_len = _block_size(self.buf, coffset)
+        with memoryview(self.buf) as buf:
+            return zlib.decompress(buf[coffset + header_len:coffset + size - 8], -15)
+
+    def _blocks(self, first: int, last: int) -> List[bytes]:
+        """返回 [first, last] 块解压后的内容，未缓存的块并行解压"""
+        with self.lock:
+            return self._blocks_unlocked(first, last)
+
+    def _blocks_unlocked(self, first: int, last: int) -> List[bytes]:
+        missing = [i for i in range(first, last + 1) if i not in self.cache]
+        if self.executor is not None and len(missing) > 1:
+            decoded = list(self.executor.map(self._decompress, missing))
+        else:
+            decoded = [self._decompress(i) for i in missing]
+        result = {i: data for i, data in zip(missing, decoded)}
+        for i in range(first, last + 1):
+            if i in self.cache:
+                result[i] = self.cache[i]
+                self.cache.move_to_end(i)
+        # 只缓存少量块，顺序读取大区间时不会占用过多内存
+        for i in missing[-self.cache_blocks:]:
+            self.cache[i] = result[i]
+        while len(self.cache) > self.cache_blocks:
+            self.cache.popitem(last=False)
+        return [result[i] for i in range(first, last + 1)]
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, start: int, end: int) -> bytes:
+        """读取解压后 [start, end) 区间的字节"""
+        start, end = max(start, 0), min(end, self.length)
+        if start >= end:
+            return b''
+        first = int(np.searchsorted(self.uoffsets, start, side='right')) - 1
+        last = int(np.searchsorted(self.uoffsets, end - 1, side='right')) - 1
+        data = b''.join(self._blocks(first, last))
+        base = int(self.uoffsets[first])
+        return data[start - base:end - base]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                raise IndexError('BgzfArray only supports slices with step 1.')
+            return np.frombuffer(self.read(start, stop), dtype=np.uint8)
+        key = int(key)
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError(key)
+        return self.read(key, key + 1)[0]
+
+    def stream(self, chunk_size: int = 1 << 24) -> 'BgzfStream':
+        """返回可以顺序读取的文件对象，每次读取的多个块并行解压"""
+        return BgzfStream(self, chunk_size)
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.cache.clear()
+        self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class BgzfStream:
+    """BgzfArray 上的只读二进制文件对象，可以传给 FastaReader"""
+
+    def __init__(self, array: BgzfArray, chunk_size: int = 1 << 24):
+        self.array = array
+        self.chunk_size = chunk_size
+        self.pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = self.array.length if size is None or size < 0 else self.pos + size
+        data = self.array.read(self.pos, end)
+        self.pos += len(data)
+        return data
+
+    def close(self) -> None:
+        self.array.close()
@@ -0,0 +1,305 @@
+import os
+import pathlib
+from typing import Iterator, Tuple, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from .atomic import atomic_path
+from .bgzf import BgzfArray, is_bgzf, is_gzip
+
+NEWLINE = ord('\n')
+HEADER_START = ord('>')
+WHITESPACE_MAX = ord(' ')
+
+
+class UnevenLineError(ValueError):
+    """序列的行宽不一致（或第一行为空），不能按 .fai 索引随机访问，需要逐行读取"""
+
+
+class faiRecord(BaseModel):
+    """.fai 索引中的一行，与 samtools faidx 的格式一致"""
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+
+
+def read_fai(fai_path: str) -> List[faiRecord]:
+    records = []
+    with open(fai_path) as f:
+        for line in f:
+            if line.strip():
+                name, length, offset, line_bases, line_width = line.rstrip('\n').split('\t')[:5]
+                records.append(faiRecord(name=name, length=length, offset=offset, line_bases=line_bases, line_width=line_width))
+    return records
+
+
+def write_fai(records: List[faiRecord], fai_path: str) -> None:
+    # 中断时不留下不完整的索引，否则之后会因为比 FASTA 新而被直接使用
+    with atomic_path(fai_path) as tmp_path, open(tmp_path, 'w') as f:
+        for r in records:
+            f.write(f'{r.name}\t{r.length}\t{r.offset}\t{r.line_bases}\t{r.line_width}\n')
+
+
+def build_fai(fasta_path: str, chunk_size: int = 1 << 26, data: Optional[np.ndarray|BgzfArray] = None) -> List[faiRecord]:
+    """
+    为 FASTA 文件生成 .fai 索引，偏移为解压后的位置
+
+    每条序列除最后一行外的所有行长度必须相同，否则无法按行计算碱基位置；序列名重复时报错。
+
+    参数:
+        fasta_path: FASTA 文件路径
+        chunk_size: 统计换行时每次处理的字节数
+        data: 文件内容，默认内存映射未压缩的 FASTA 文件，BGZF 文件传入 BgzfArray
+
+    返回:
+        faiRecord 列表
+    """
+    if data is None:
+        if os.path.getsize(fasta_path) == 0:
+            return []
+        data = np.memmap(fasta_path, dtype=np.uint8, mode='r')
+    size = len(data)
+    if size == 0:
+        return []
+    records = []
+    names = set()
+    pos = _next_header(data, 0)
+    while pos < size:
+        header_end = _find(data, NEWLINE, pos)
+        header = bytes(data[pos+1:header_end]).decode().strip()
+        name = header.split(maxsplit=1)[0] if header else ''
+        if name in names:
+            raise ValueError(f'Duplicate sequence name "{name}" in "{fasta_path}".')
+        names.add(name)
+        seq_start = min(header_end + 1, size)
+        seq_end = _next_header(data, seq_start)
+        records.append(_index_record(data, name, seq_start, seq_end, chunk_size))
+        pos = seq_end
+    return records
+
+
+def _find(data: np.ndarray, value: int, start: int, step: int = 1 << 16) -> int:
+    """从 start 开始查找 value 第一次出现的位置，找不到时返回数组长度"""
+    size = len(data)
+    while start < size:
+        hits = np.flatnonzero(data[start:start+step] == value)
+        if len(hits):
+            return start + int(hits[0])
+        start += step
+    return size
+
+
+def _next_header(data: np.ndarray, start: int, step: int = 1 << 24) -> int:
+    """查找 start 之后（含）位于行首的 '>'，找不到时返回数组长度"""
+    size = len(data)
+    if start == 0 and size and data[0] == HEADER_START:
+        return 0
+    while start < size:
+        lo = max(start - 1, 0)
+        block = data[lo:start+step]
+        hits = np.flatnonzero((block[1:] == HEADER_START) & (block[:-1] == NEWLINE))
+        if len(hits):
+            return lo + int(hits[0]) + 1
+        start += step
+    return size
+
+
+def _index_record(data: np.ndarray, name: str, seq_start: int, seq_end: int, chunk_size: int) -> faiRecord:
+    """统计一条序列的长度和行宽，并检查除最后一行外的行宽是否一致"""
+    first_newline = _find(data, NEWLINE, seq_start)
+    line_width = min(first_newline, seq_end) - seq_start + 1
+    line_bases = line_width - 1
+    if line_bases > 0 and data[seq_start + line_bases - 1] == ord('\r'):
+        line_bases -= 1
+    length = 0
+    # 下一个换行应当出现的位置，出现短行（最后一行）之后只允许空行
+    expected_next = seq_start + line_width - 1
+    short_line_seen = False
+    last_newline = -1
+    for chunk_start in range(seq_start, seq_end, chunk_size):
+        chunk = data[chunk_start:min(chunk_start+chunk_size, seq_end)]
+        length += int(np.count_nonzero(chunk > WHITESPACE_MAX))
+        newlines = np.flatnonzero(chunk == NEWLINE) + chunk_start
+        if len(newlines) == 0:
+            continue
+        if not short_line_seen:
+            expected = expected_next + np.arange(len(newlines)) * line_width
+            mismatch = np.flatnonzero(newlines != expected)
+            if len(mismatch) == 0:
+                expected_next = int(expected[-1]) + line_width
+                continue
+            first = int(mismatch[0])
+            if newlines[first] > expected[first]:
+                raise UnevenLineError(f'Different line length in sequence "{name}".')
+            short_line_seen = True
+            last_newline = int(newlines[first])
+            newlines = newlines[first+1:]
+        if len(newlines):
+            # 空行之间的间隔为 1（\n）或 2（\r\n）
+            if np.any(np.diff(np.concatenate(([last_newline], newlines))) > 2):
+                raise UnevenLineError(f'Different line length in sequence "{name}".')
+            last_newline = int(newlines[-1])
+    if length and line_bases == 0:
+        raise UnevenLineError(f'Empty first line in sequence "{name}".')
+    return faiRecord(name=name, length=length, offset=seq_start, line_bases=line_bases, line_width=line_width)
+
+
+class IndexedFasta:
+    """通过 .fai 索引随机访问未压缩（内存映射）或 BGZF 压缩（.gzi 索引按块解压）的 FASTA 文件
+
+    与 SequenceStore 提供相同的访问接口，不需要再把序列转换为其它文件。
+    """
+
+    def __init__(self, fasta_path: str, fai_path: Optional[str] = None, build: bool = True, threads: Optional[int] = None):
+        """
+        打开 FASTA 文件，索引不存在或比 FASTA 文件旧时重新生成
+
+        参数:
+            fasta_path: FASTA 文件路径
+            fai_path: 索引路径，默认为 <fasta_path>.fai
+            build: 索引不可用时是否生成并写出索引
+            threads: BGZF 文件的解压线程数，默认为 CPU 核数
+        """
+        self.path = fasta_path
+        self.fai_path = fai_path if fai_path is not None else fasta_path + '.fai'
+        if is_bgzf(fasta_path):
+            self.data = BgzfArray(fasta_path, threads=threads)
+            self.built_files = [self.data.gzi_path] if self.data.index_built else []
+        elif is_gzip(fasta_path):
+            raise ValueError(f'"{fasta_path}" is gzip compressed but not BGZF, it can not be accessed randomly.')
+        else:
+            self.data = np.memmap(fasta_path, dtype=np.uint8, mode='r') if os.path.getsize(fasta_path) else np.zeros(0, dtype=np.uint8)
+            self.built_files = []
+        if self.is_index_fresh(fasta_path, self.fai_path):
+            records = read_fai(self.fai_path)
+        elif build:
+            records = build_fai(fasta_path, data=self.data)
+            write_fai(records, self.fai_path)
+            self.built_files.append(self.fai_path)
+        else:
+            raise FileNotFoundError(f'No usable index "{self.fai_path}" for "{fasta_path}".')
+        self.index: Dict[str, faiRecord] = {}
+        for r in records:
+            if r.name in self.index:
+                raise ValueError(f'Duplicate sequence name "{r.name}" in "{self.fai_path}".')
+            self.index[r.name] = r
+
+    @property
+    def index_built(self) -> bool:
+        """.fai 索引是否由本次打开时生成"""
+        return self.fai_path in self.built_files
+
+    @staticmethod
+    def is_index_fresh(fasta_path: str, fai_path: str) -> bool:
+        fai = pathlib.Path(fai_path)
+        return fai.exists() and fai.stat().st_mtime >= pathlib.Path(fasta_path).stat().st_mtime
+
+    def records(self) -> Iterator[Tuple[str, int]]:
+        """按文件顺序返回 (序列 id, 序列长度)"""
+        for r in self.index.values():
+            yield r.name, r.length
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, seq_id: str) -> bool:
+        return seq_id in self.index
+
+    def _position(self, r: faiRecord, i: int) -> int:
+        """第 i 个碱基在文件中的字节偏移"""
+        return r.offset + (i // r.line_bases) * r.line_width + i % r.line_bases
+
+    def lines_view(self, seq_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回序列的零拷贝视图
+
+        返回:
+            (完整行组成的二维视图 [行数, 每行碱基数], 最后一个不完整行)
+        """
+        r = self.index[seq_id]
+        if r.length == 0:
+            return np.zeros((0, 0), dtype=np.uint8), np.zeros(0, dtype=np.uint8)
+        full_lines = r.length // r.line_bases
+        if r.offset + full_lines * r.line_width > len(self.data):
+            # 文件末尾的最后一行没有换行，作为不完整行返回
+            full_lines -= 1
+        body = self.data[r.offset:r.offset + full_lines * r.line_width].reshape(full_lines, r.line_width)[:, :r.line_bases]
+        tail_start = r.offset + full_lines * r.line_width
+        return body, self.data[tail_start:tail_start + r.length - full_lines * r.line_bases]
+
+    def read(
+        self,
+        seq_id: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        lookup_table: Optional[np.ndarray] = None,
+        chunk_lines: int = 1 << 16
+    ) -> np.ndarray:
+        """
+        读取序列 [start, end) 区间，按块去掉换行，只读取需要的字节
+
+        参数:
+            seq_id: 序列 id
+            start: 起始位置
+            end: 结束位置，默认为序列末尾
+            lookup_table: 指定时直接返回查找表编码后的数组
+            chunk_lines: 每次处理的行数
+
+        返回:
+            uint8 序列（或编码后的数组）。序列只有一行且不编码时返回零拷贝视图
+        """
+        if lookup_table is not None and not isinstance(lookup_table, np.ndarray):
+            # k-mer 查找表（KmerLookupTable）需要跨行的相邻碱基，读取整个区间后再编码
+            return lookup_table[self.read(seq_id, start, end, chunk_lines=chunk_lines)]
+        r = self.index[seq_id]
+        end = r.length if end is None else min(end, r.length)
+        start = min(max(start, 0), end)
+        dtype = np.uint8 if lookup_table is None else lookup_table.dtype
+        if start == end:
+            return np.zeros(0, dtype=dtype)
+        first_line, last_line = start // r.line_bases, (end - 1) // r.line_bases
+        if first_line == last_line:
+            view = self.data[self._position(r, start):self._position(r, end - 1) + 1]
+            return view if lookup_table is None else lookup_table[view]
+        out = np.empty(end - start, dtype=dtype)
+        written = 0
+        line = first_line
+        while line <= last_line:
+            lines = min(chunk_lines, last_line - line + 1)
+            raw_start = r.offset + line * r.line_width
+            raw = self.data[raw_start:raw_start + lines * r.line_width]
+            if len(raw) < lines * r.line_width:
+                # 文件末尾的最后一行可能没有换行
+                raw = np.concatenate((raw, np.zeros(lines * r.line_width - len(raw), dtype=np.uint8)))
+            bases = raw.reshape(lines, r.line_width)[:, :r.line_bases]
+            if lookup_table is not None:
+                bases = lookup_table[bases]
+            lo = start - line * r.line_bases if line == first_line else 0
+            hi = min(lines * r.line_bases, end - line * r.line_bases)
+            block = bases.reshape(-1)[lo:hi]
+            out[written:written + len(block)] = block
+            written += len(block)
+            line += lines
+        return out
+
+    def __getitem__(self, seq_id: str) -> np.ndarray:
+        return self.read(seq_id)
+
+    def fetch(self, seq_id: str, start: int, end: int) -> str:
+        """返回序列 [start, end) 区间的字符串，只读取该区间所在的行"""
+        return self.read(seq_id, start, end).tobytes().decode()
+
+    def close(self) -> None:
+        """释放内存映射，仍被引用的视图在释放之前保持可用"""
+        if isinstance(self.data, BgzfArray):
+            self.data.close()
+        self.data = np.zeros(0, dtype=np.uint8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,127 @@
+import os
+import gzip
+from typing import Iterator, Tuple, List, BinaryIO, Optional
+
+import numpy as np
+
+from .bgzf import BgzfArray, is_bgzf, is_gzip
+
+# 小于等于空格的字节（换行、回车、制表符、空格）不属于序列
+WHITESPACE_MAX = ord(' ')
+LOWER_A, LOWER_Z = ord('a'), ord('z')
+CASE_OFFSET = ord('a') - ord('A')
+
+
+def strip_whitespace(buf: bytes|memoryview|np.ndarray) -> np.ndarray:
+    """
+    去掉序列字节中的换行等空白字符
+
+    参数:
+        buf: 序列的原始字节
+
+    返回:
+        uint8 数组
+    """
+    arr = np.frombuffer(buf, dtype=np.uint8) if not isinstance(buf, np.ndarray) else buf
+    return arr[arr > WHITESPACE_MAX]
+
+
+def to_upper(arr: np.ndarray) -> np.ndarray:
+    """将 uint8 序列中的小写字母原地转换为大写"""
+    np.subtract(arr, CASE_OFFSET, out=arr, where=(arr >= LOWER_A) & (arr <= LOWER_Z))
+    return arr
+
+
+class FastaReader:
+    """流式 FASTA 读取器，逐条返回 (序列 id, uint8 序列数组)
+
+    按块读取二进制数据，使用 numpy 向量化地去掉换行，不构造 Python 字符串。
+    序列 id 为标题行中第一个空白字符之前的部分，与 Biopython 的 SeqRecord.id 一致。
+    """
+
+    def __init__(self, source: str|BinaryIO, buffer_size: int = 1 << 24, uppercase: bool = False, threads: Optional[int] = None):
+        """
+        初始化 FastaReader
+
+        参数:
+            source: FASTA 文件路径或以二进制模式打开的文件对象，gzip / BGZF 压缩的文件按流解压
+            buffer_size: 每次读取的字节数
+            uppercase: 是否将小写碱基转换为大写
+            threads: BGZF 文件的解压线程数，默认为 CPU 核数
+        """
+        if isinstance(source, str) and not os.path.exists(source):
+            raise FileNotFoundError(f'No such file: "{source}"')
+        self.source = source
+        self.buffer_size = buffer_size
+        self.uppercase = uppercase
+        self.threads = threads
+
+    def _open(self) -> Tuple[BinaryIO, bool]:
+        if not isinstance(self.source, str):
+            return self.source, False
+        if is_bgzf(self.source):
+            # BGZF 按块并行解压，只读取一遍时无需写出 .gzi 索引
+            return BgzfArray(self.source, threads=self.threads, write_index=False).stream(self.buffer_size), True
+        if is_gzip(self.source):
+            return gzip.open(self.source, 'rb'), True
+        return open(self.source, 'rb'), True
+
+    def __iter__(self) -> Iterator[Tuple[str, np.ndarray]]:
+        file, should_close = self._open()
+        try:
+            yield from self._parse(file)
+        finally:
+            if should_close:
+                file.close()
+
+    def _finish(self, seq_id: str, parts: List[np.ndarray]) -> Tuple[str, np.ndarray]:
+        if not parts:
+            arr = np.zeros(0, dtype=np.uint8)
+        else:
+            # 布尔索引得到的是新数组，只有一段时无需再拷贝
+            arr = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        if self.uppercase:
+            to_upper(arr)
+        return seq_id, arr
+
+    def _parse(self, file: BinaryIO) -> Iterator[Tuple[str, np.ndarray]]:
+        buf = b''
+        seq_id: Optional[str] = None
+        parts: List[np.ndarray] = []
+        in_header = False
+        eof = False
+        while not eof:
+            block = file.read(self.buffer_size)
+            eof = not block
+            buf = buf + block if buf else block
+            pos = 0
+            while pos < len(buf):
+                if in_header:
+                    newline = buf.find(b'\n', pos)
+                    if newline == -1:
+                        if not eof:
+                            break
+                        newline = len(buf)
+                    header = buf[pos:newline].decode().strip()
+                    seq_id = header.split(maxsplit=1)[0] if header else ''
+                    parts = []
+                    in_header = False
+                    pos = newline + 1
+                else:
+                    start = buf.find(b'>', pos)
+                    end = len(buf) if start == -1 else start
+                    if seq_id is not None and end > pos:
+                        part = strip_whitespace(memoryview(buf)[pos:end])
+                        if len(part):
+                            parts.append(part)
+                    if start == -1:
+                        pos = len(buf)
+                        break
+                    if seq_id is not None:
+                        yield self._finish(seq_id, parts)
+                        seq_id = None
+                    in_header = True
+                    pos = start + 1
+            buf = buf[pos:]
+        if seq_id is not None:
+            yield self._finish(seq_id, parts)
@@ -0,0 +1,130 @@
+import pathlib
+from typing import Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from .atomic import atomic_path
+
+
+def gap_mask_table(gaps: bool = True, soft_masked: bool = False) -> np.ndarray:
+    """
+    生成 256 项的布尔查找表，标记需要跳过的字节
+
+    参数:
+        gaps: 是否跳过 N/n 组成的 gap
+        soft_masked: 是否跳过软屏蔽（小写）的碱基
+
+    返回:
+        bool 数组，table[byte] 为真表示跳过
+    """
+    table = np.zeros(256, dtype=bool)
+    if gaps:
+        table[[ord('N'), ord('n')]] = True
+    if soft_masked:
+        table[ord('a'):ord('z') + 1] = True
+    return table
+
+
+def find_runs(bases: np.ndarray, mask_table: np.ndarray) -> np.ndarray:
+    """
+    查找序列中连续被标记的区域
+
+    参数:
+        bases: uint8 序列
+        mask_table: gap_mask_table 生成的查找表
+
+    返回:
+        int64 数组，shape 为 (区域数, 2)，每行为区域的 [起始, 结束)
+    """
+    mask = np.take(mask_table, bases).view(np.int8)
+    edges = np.flatnonzero(np.diff(mask, prepend=np.int8(0), append=np.int8(0)))
+    return edges.astype(np.int64).reshape(-1, 2)
+
+
+def find_runs_in_chunks(chunks: Iterable[np.ndarray], mask_table: np.ndarray) -> np.ndarray:
+    """
+    逐块查找连续被标记的区域，跨越块边界的区域合并为一个
+
+    参数:
+        chunks: 依次相接的 uint8 序列块，例如 StreamedSequence.chunks
+        mask_table: gap_mask_table 生成的查找表
+
+    返回:
+        与 find_runs 对整条序列的结果相同
+    """
+    runs = []
+    offset = 0
+    for chunk in chunks:
+        chunk_runs = find_runs(chunk, mask_table) + offset
+        if runs and len(chunk_runs) and runs[-1][-1, 1] == chunk_runs[0, 0]:
+            runs[-1][-1, 1] = chunk_runs[0, 1]
+            chunk_runs = chunk_runs[1:]
+        # 只保留非空的结果，前一块的最后一个区域总在 runs[-1] 的末尾
+        if len(chunk_runs):
+            runs.append(chunk_runs)
+        offset += len(chunk)
+    return np.concatenate(runs) if runs else np.zeros((0, 2), dtype=np.int64)
+
+
+class GapIndex:
+    """每条序列中需要跳过的区域的游程索引
+
+    只保存每个区域的起止位置，N 占很大比例的基因组上也很小。保存为 npz 文件:
+        ids: 序列 id
+        counts: 每条序列的区域数
+        runs: 所有序列的区域依次拼接，shape 为 (区域总数, 2)
+    """
+
+    def __init__(self, runs: Dict[str, np.ndarray]):
+        self.runs = runs
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, np.ndarray]], mask_table: np.ndarray) -> 'GapIndex':
+        """
+        从 (序列 id, uint8 序列) 迭代器生成索引
+
+        参数:
+            records: 序列迭代器，例如 FastaReader；序列也可以是 StreamedSequence，逐块读取
+            mask_table: gap_mask_table 生成的查找表
+
+        返回:
+            GapIndex
+        """
+        return cls({
+            seq_id: find_runs(bases, mask_table) if isinstance(bases, np.ndarray) else find_runs_in_chunks((chunk for _, chunk in bases.chunks()), mask_table)
+            for seq_id, bases in records
+        })
+
+    @classmethod
+    def load(cls, path: str) -> 'GapIndex':
+        with np.load(path) as data:
+            ids, counts, runs = data['ids'], data['counts'], data['runs']
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        return cls({str(seq_id): runs[bounds[i]:bounds[i + 1]] for i, seq_id in enumerate(ids)})
+
+    def save(self, path: str) -> None:
+        """先写入临时文件再替换，其他进程不会读到不完整的索引"""
+        with atomic_path(path) as tmp_path, open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array(list(self.runs), dtype=str),
+                counts=np.array([len(i) for i in self.runs.values()], dtype=np.int64),
+                runs=np.concatenate(list(self.runs.values())) if self.runs else np.zeros((0, 2), dtype=np.int64)
+            )
+
+    @staticmethod
+    def is_fresh(path: str, source_path: str) -> bool:
+        return pathlib.Path(path).exists() and pathlib.Path(path).stat().st_mtime >= pathlib.Path(source_path).stat().st_mtime
+
+    def __getitem__(self, seq_id: str) -> np.ndarray:
+        return self.runs.get(seq_id, np.zeros((0, 2), dtype=np.int64))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.runs)
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def total_length(self) -> int:
+        """所有区域的碱基数"""
+        return int(sum((runs[:, 1] - runs[:, 0]).sum() for runs in self.runs.values()))
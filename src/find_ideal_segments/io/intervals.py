@@ -0,0 +1,268 @@
+import csv
+import json
+import pathlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from .jsonl import open_jsonl, detect_compression
+from .npz import NpzResultIO
+
+
+def index_file_of(result_file: str) -> str:
+    """结果文件对应的区间索引文件，保存在结果文件旁边"""
+    return f'{result_file}.idx.npz'
+
+
+def _result_type(result_file: str) -> str:
+    # 与 sink.result_file_type 相同，避免导入 sink 时的循环依赖
+    path = result_file.rsplit('.', 1)[0] if detect_compression(result_file) is not None else result_file
+    file_type = path.rsplit('.', 1)[-1].lower()
+    return file_type if file_type in ('csv', 'tsv', 'npz') else 'jsonl'
+
+
+def iter_result_lines(result_file: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    逐行读取 jsonl / csv / tsv 结果文件，不构建模型实例
+
+    参数:
+        result_file: 结果文件，可以是 gzip / lzma 压缩的
+
+    返回:
+        (行的字节偏移, 字段字典) 迭代器，压缩文件的偏移为 -1，csv / tsv 的字段值为字符串
+    """
+    file_type = _result_type(result_file)
+    compressed = detect_compression(result_file) is not None
+    with (open_jsonl(result_file, 'r') if compressed else open(result_file, 'rb')) as f:
+        offset = 0
+        header = None
+        for line in f:
+            line_offset, offset = (-1 if compressed else offset), offset + len(line)
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            if file_type == 'jsonl':
+                yield line_offset, json.loads(line)
+                continue
+            values = next(csv.reader([line], delimiter='\t' if file_type == 'tsv' else ','))
+            if header is None:
+                header = values
+                continue
+            yield line_offset, dict(zip(header, values))
+
+
+class IntervalIndex:
+    """结果窗口的区间索引，按 seq_id 分组，重叠和最近窗口的查询只需要二分查找
+
+    每条序列的区间按起点排序，同时保存终点的前缀最大值: 与 [start, end) 重叠的区间一定在
+    前缀最大值大于 start 且起点小于 end 的范围内。区间统一为从 0 开始的半开区间。
+    保存为 npz 文件:
+        seq_ids: 序列 id
+        bounds: 第 i 条序列的区间在下面数组中的范围为 [bounds[i], bounds[i+1])
+        starts, ends, rows: 按起点排序的区间以及它们在结果文件中的行号
+        max_ends: 每条序列内 ends 的前缀最大值
+        sorted_ends, end_order: 每条序列内排序后的终点以及对应的区间下标
+        line_offsets: 每行在结果文件中的字节偏移，压缩文件和 npz 文件为空数组
+        one_based: 结果文件的起点是否从 1 开始（human readable index）
+        result_stat: 建立索引时结果文件的 [大小, 修改时间（纳秒）]，结果文件改变后索引失效，见 is_fresh
+    """
+
+    ARRAYS = ('seq_ids', 'bounds', 'starts', 'ends', 'rows', 'max_ends', 'sorted_ends', 'end_order', 'line_offsets')
+
+    def __init__(self, **arrays):
+        self.one_based = bool(arrays.pop('one_based'))
+        # 不是由结果文件建立的索引没有对应的文件状态
+        self.result_stat = np.asarray(arrays.pop('result_stat', [-1, -1]), dtype=np.int64)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.seq_index = {str(seq_id): i for i, seq_id in enumerate(self.seq_ids)}
+
+    @classmethod
+    def build(
+        cls,
+        seq_ids: Iterable[str],
+        starts: np.ndarray,
+        ends: np.ndarray,
+        line_offsets: Optional[np.ndarray] = None,
+        one_based: bool = True
+    ) -> 'IntervalIndex':
+        """
+        由每一行结果的 seq_id、起点和终点建立索引
+
+        参数:
+            seq_ids: 每行的序列 id
+            starts: 每行的起点，与结果文件相同
+            ends: 每行的终点（不包含）
+            line_offsets: 每行在结果文件中的字节偏移
+            one_based: starts 是否从 1 开始
+
+        返回:
+            IntervalIndex
+        """
+        unique_ids, codes = np.unique(np.asarray(list(seq_ids), dtype=str), return_inverse=True)
+        starts = np.asarray(starts, dtype=np.int64) - int(one_based)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.lexsort((ends, starts, codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(unique_ids) + 1))
+        starts, ends = starts[order], ends[order]
+        max_ends = np.empty_like(ends)
+        end_order = np.empty_like(order)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            max_ends[lo:hi] = np.maximum.accumulate(ends[lo:hi])
+            end_order[lo:hi] = lo + np.argsort(ends[lo:hi], kind='stable')
+        return cls(
+            seq_ids=unique_ids, bounds=bounds, starts=starts, ends=ends, rows=order.astype(np.int64),
+            max_ends=max_ends, sorted_ends=ends[end_order], end_order=end_order,
+            line_offsets=np.zeros(0, dtype=np.int64) if line_offsets is None else np.asarray(line_offsets, dtype=np.int64),
+            one_based=one_based
+        )
+
+    @classmethod
+    def from_result_file(cls, result_file: str, one_based: bool = True) -> 'IntervalIndex':
+        """
+        读取一遍结果文件建立索引，支持 jsonl、csv、tsv（可以压缩）和 npz
+
+        参数:
+            result_file: 结果文件
+            one_based: 结果文件的起点是否从 1 开始，与 gccontent 的 --human-readable 相同
+
+        返回:
+            IntervalIndex
+        """
+        result_stat = cls.stat_of(result_file)
+        if _result_type(result_file) == 'npz':
+            with NpzResultIO(BaseModel, result_file) as npz:
+                columns = npz.to_columns()
+            index = cls.build(columns['seq_id'], columns['start_idx'], columns['end_idx'], one_based=one_based)
+        else:
+            seq_ids, starts, ends, offsets = [], [], [], []
+            for offset, item in iter_result_lines(result_file):
+                seq_ids.append(item['seq_id'])
+                starts.append(int(item['start_idx']))
+                ends.append(int(item['end_idx']))
+                offsets.append(offset)
+            compressed = detect_compression(result_file) is not None
+            index = cls.build(seq_ids, np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64), None if compressed else offsets, one_based)
+        index.result_stat = result_stat
+        return index
+
+    @staticmethod
+    def stat_of(result_file: str) -> np.ndarray:
+        """结果文件的 [大小, 修改时间（纳秒）]"""
+        stat = pathlib.Path(result_file).stat()
+        return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def is_fresh(self, result_file: str) -> bool:
+        """
+        索引是否由当前的结果文件建立，结果文件被重新生成或修改后索引中的行号和字节偏移都不再可用
+
+        参数:
+            result_file: 建立索引的结果文件
+
+        返回:
+            结果文件的大小和修改时间与建立索引时相同时为 True
+        """
+        return pathlib.Path(result_file).exists() and (self.stat_of(result_file) == self.result_stat).all()
+
+    @classmethod
+    def load(cls, path: str) -> 'IntervalIndex':
+        with np.load(path) as data:
+            # 旧版本的索引没有保存结果文件状态，按过期处理
+            result_stat = data['result_stat'] if 'result_stat' in data.files else [-1, -1]
+            return cls(**{name: data[name] for name in cls.ARRAYS}, one_based=bool(data['one_based']), result_stat=result_stat)
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            np.savez(f, **{name: getattr(self, name) for name in self.ARRAYS}, one_based=self.one_based, result_stat=self.result_stat)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _bounds_of(self, seq_id: str) -> Tuple[int, int]:
+        i = self.seq_index.get(seq_id)
+        return (0, 0) if i is None else (int(self.bounds[i]), int(self.bounds[i + 1]))
+
+    def overlap(self, seq_id: str, start: int, end: int) -> np.ndarray:
+        """
+        与 [start, end) 重叠的窗口
+
+        参数:
+            seq_id: 序列 id
+            start: 从 0 开始的起点
+            end: 终点（不包含）
+
+        返回:
+            窗口在结果文件中的行号，按窗口起点排序
+        """
+        lo, hi = self._bounds_of(seq_id)
+        # 起点小于 end 的区间中，终点前缀最大值大于 start 之后的区间才可能重叠
+        first = lo + int(np.searchsorted(self.max_ends[lo:hi], start, side='right'))
+        last = lo + int(np.searchsorted(self.starts[lo:hi], end, side='left'))
+        candidates = np.arange(first, max(first, last))
+        return self.rows[candidates[self.ends[candidates] > start]]
+
+    def nearest(self, seq_id: str, start: int, end: int) -> Tuple[Optional[int], np.ndarray]:
+        """
+        距离 [start, end) 最近的窗口，重叠的窗口距离为 0，距离相同的窗口都返回
+
+        参数:
+            seq_id: 序列 id
+            start: 从 0 开始的起点
+            end: 终点（不包含）
+
+        返回:
+            (距离, 按行号排序的窗口在结果文件中的行号)，序列没有窗口时距离为 None
+        """
+        rows = self.overlap(seq_id, start, end)
+        if len(rows):
+            return 0, np.sort(rows)
+        lo, hi = self._bounds_of(seq_id)
+        candidates = []
+        # 右侧: 起点不小于 end 的第一个区间，以及起点相同的区间
+        right = lo + int(np.searchsorted(self.starts[lo:hi], end, side='left'))
+        if right < hi:
+            same = lo + int(np.searchsorted(self.starts[lo:hi], self.starts[right], side='right'))
+            candidates.append((int(self.starts[right]) - end, self.rows[right:same]))
+        # 左侧: 终点不大于 start 的最后一个区间，以及终点相同的区间
+        left = lo + int(np.searchsorted(self.sorted_ends[lo:hi], start, side='right')) - 1
+        if left >= lo:
+            same = lo + int(np.searchsorted(self.sorted_ends[lo:hi], self.sorted_ends[left], side='left'))
+            candidates.append((start - int(self.sorted_ends[left]), self.rows[self.end_order[same:left + 1]]))
+        if not candidates:
+            return None, np.zeros(0, dtype=np.int64)
+        distance = min(i for i, _ in candidates)
+        return distance, np.sort(np.concatenate([r for d, r in candidates if d == distance]))
+
+    def read_rows(self, result_file: str, rows: Iterable[int]) -> List[Dict]:
+        """
+        读取结果文件中的若干行，未压缩的文本文件按字节偏移直接读取，其它文件读取一遍
+
+        参数:
+            result_file: 建立索引的结果文件
+            rows: 行号
+
+        返回:
+            字段字典列表，顺序与 rows 相同
+        """
+        if not self.is_fresh(result_file):
+            raise ValueError(f'The index is stale, "{result_file}" has changed since it was indexed.')
+        rows = [int(i) for i in rows]
+        file_type = _result_type(result_file)
+        if file_type == 'npz':
+            with NpzResultIO(BaseModel, result_file) as npz:
+                columns = npz.to_columns()
+            return [{name: (column[i].item() if isinstance(column[i], np.generic) else column[i]) for name, column in columns.items()} for i in rows]
+        if len(self.line_offsets):
+            items = []
+            with open(result_file, 'rb') as f:
+                header = None if file_type == 'jsonl' else next(csv.reader([f.readline().decode('utf-8')], delimiter='\t' if file_type == 'tsv' else ','))
+                for i in rows:
+                    f.seek(int(self.line_offsets[i]))
+                    line = f.readline().decode('utf-8')
+                    items.append(json.loads(line) if header is None else dict(zip(header, next(csv.reader([line], delimiter='\t' if file_type == 'tsv' else ',')))))
+            return items
+        wanted = set(rows)
+        found = {i: item for i, (_, item) in enumerate(iter_result_lines(result_file)) if i in wanted}
+        return [found[i] for i in rows]
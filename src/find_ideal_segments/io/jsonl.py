@@ -1,51 +1,295 @@
 import json
 import os
 import tempfile
-from typing import Dict, Any, Iterator, Optional, Union, List, TypeVar, Generic, Type, Tuple
+import gzip
+import lzma
+from typing import Dict, Any, Iterator, Optional, Union, List, TypeVar, Generic, Type, Tuple, Literal, IO
 from io import FileIO
 import heapq
+import threading
 
 from pydantic import BaseModel, Json
 
 T = TypeVar('T', bound=BaseModel)
 
+Compression = Literal['gzip', 'lzma']
+
+# 压缩格式与文件扩展名的对应关系，写入时使用第一个扩展名
+COMPRESSION_SUFFIXES: Dict[str, Tuple[str, ...]] = {
+    'gzip': ('.gz', '.gzip'),
+    'lzma': ('.xz', '.lzma'),
+}
+# 默认使用最快的压缩等级，中间文件以吞吐优先
+DEFAULT_COMPRESSLEVEL = 1
+
+
+def detect_compression(file_path: str) -> Optional[Compression]:
+    """
+    根据扩展名判断文件的压缩格式
+
+    参数:
+        file_path: 文件路径
+
+    返回:
+        'gzip'、'lzma'，不是压缩文件时返回 None
+    """
+    lower_path = str(file_path).lower()
+    for compression, suffixes in COMPRESSION_SUFFIXES.items():
+        if lower_path.endswith(suffixes):
+            return compression
+    return None
+
+
+def with_compression_suffix(file_path: str, compression: Optional[Compression]) -> str:
+    """为文件路径追加压缩扩展名，已经带有该扩展名时原样返回"""
+    if compression is None or detect_compression(file_path) == compression:
+        return file_path
+    return file_path + COMPRESSION_SUFFIXES[compression][0]
+
+
+def strip_jsonl_suffix(file_path: str) -> str:
+    """去掉文件路径末尾的压缩扩展名和 .jsonl 扩展名，例如 'a.jsonl.gz' -> 'a'"""
+    compression = detect_compression(file_path)
+    if compression is not None:
+        file_path = file_path.rsplit('.', 1)[0]
+    return file_path.rsplit('.', 1)[0]
+
+
+def open_jsonl(file_path: str, mode: str = 'r', compresslevel: int = DEFAULT_COMPRESSLEVEL, newline: Optional[str] = None) -> IO[str]:
+    """
+    打开 JSONL 文件，按扩展名透明地读写 gzip / lzma 压缩流
+
+    压缩流不支持同时读写，'r+' 按只读打开，'w+' 按只写打开，'a+' 按追加打开。
+
+    参数:
+        file_path: 文件路径
+        mode: 文件打开模式
+        compresslevel: 压缩等级，gzip 为 1-9，lzma 为 preset 0-9
+        newline: 换行符的转换方式，与 open 相同，csv 文件传入 ''
+
+    返回:
+        文本模式的文件对象
+    """
+    compression = detect_compression(file_path)
+    if compression is None:
+        return open(file_path, mode, newline=newline)
+    text_mode = mode.replace('+', '').replace('t', '').replace('b', '')[0] + 't'
+    if compression == 'gzip':
+        if text_mode == 'rt':
+            return gzip.open(file_path, text_mode, newline=newline)
+        return gzip.open(file_path, text_mode, compresslevel=compresslevel, newline=newline)
+    if text_mode == 'rt':
+        return lzma.open(file_path, text_mode, newline=newline)
+    return lzma.open(file_path, text_mode, preset=compresslevel, newline=newline)
+
+
+# 游标每次按位置读取的字节数
+CURSOR_BLOCK_SIZE = 1 << 20
+
+
+class JsonlCursor(Generic[T]):
+    """JsonlIO 文件上独立的读取游标
+
+    未压缩文件按位置读取（os.pread），不移动任何共享的文件指针，多个游标可以嵌套迭代或在不同线程中
+    同时读取同一文件。游标读取起始字节位于 [start, end) 中的行，start 不在行首时从下一行开始，
+    所以把文件切分为任意不相交的字节范围，每一行恰好属于其中一个范围。
+    压缩文件不能按位置读取，游标打开独立的解压流，只能读取整个文件。
+    """
+
+    def __init__(self, jsonl: 'JsonlIO[T]', start: int = 0, end: Optional[int] = None, block_size: int = CURSOR_BLOCK_SIZE):
+        """
+        参数:
+            jsonl: 读取的 JsonlIO
+            start: 起始字节位置
+            end: 结束字节位置（不包含），默认为读取时的文件末尾
+            block_size: 每次读取的字节数
+        """
+        if jsonl.compression is not None and (start != 0 or end is not None):
+            raise ValueError(f'"{jsonl.file_path}" is compressed, its cursors can only read the whole file.')
+        self.jsonl = jsonl
+        self.start = start
+        self.end = end
+        self.block_size = block_size
+
+    def lines(self) -> Iterator[Tuple[int, str]]:
+        """
+        逐行读取游标范围内的行
+
+        返回:
+            (行的字节偏移, 行) 迭代器，压缩文件的偏移为 -1
+        """
+        if self.jsonl.compression is not None:
+            # 结束当前压缩段，之前写入的行才能被完整读取
+            self.jsonl.flush()
+            with open_jsonl(self.jsonl.file_path, 'r') as file:
+                for line in file:
+                    yield -1, line
+            return
+        offset = self.start
+        if offset > 0 and self.jsonl._pread(1, offset - 1) != b'\n':
+            # 前一个范围读取跨过 start 的行，从下一行开始
+            offset = self._next_line_start(offset)
+        end = self.end if self.end is not None else float('inf')
+        # pending 是从 offset 开始还没有读到换行符的字节块，很长的行（例如整条序列）不会被反复拼接
+        pending, read_offset = [], offset
+        while offset < end:
+            block = self.jsonl._pread(self.block_size, read_offset)
+            if not block:
+                if pending:
+                    yield offset, b''.join(pending).decode('utf-8')
+                return
+            read_offset += len(block)
+            pending.append(block)
+            if b'\n' not in block:
+                continue
+            lines = b''.join(pending).split(b'\n')
+            rest = lines.pop()
+            pending = [rest] if rest else []
+            for line in lines:
+                if offset >= end:
+                    return
+                yield offset, line.decode('utf-8') + '\n'
+                offset += len(line) + 1
+
+    def _next_line_start(self, offset: int) -> int:
+        """offset 之后第一个换行符的下一个位置"""
+        while True:
+            block = self.jsonl._pread(self.block_size, offset)
+            if not block:
+                return offset
+            newline = block.find(b'\n')
+            if newline >= 0:
+                return offset + newline + 1
+            offset += len(block)
+
+    def __iter__(self) -> Iterator[T]:
+        for _, line in self.lines():
+            if line.strip():
+                yield self.jsonl.model_cls(**json.loads(line))
+
+
 class JsonlIO(Generic[T]):
-    """JSONL 文件读写操作类，支持增加行、读取行、迭代遍历等功能"""
+    """JSONL 文件读写操作类，支持增加行、读取行、迭代遍历等功能
+
+    文件扩展名为 .gz / .xz 时按 gzip / lzma 流透明读写。压缩流在读写之间切换时会重新打开文件，
+    每次切换到写入都会追加一个新的压缩段，标准库可以连续读取多段压缩流。
+
+    迭代使用独立的 JsonlCursor，嵌套迭代和多线程读取互不影响，追加写入由锁保护，可以在多个线程中进行。
+    split 把未压缩文件按字节范围切分为多个游标，供多个线程并行读取。
+    """
     
-    def __init__(self, model_cls: Type[T]=BaseModel, file_path: Optional[str] = None, mode: str = "a+"):
+    def __init__(
+        self, 
+        model_cls: Type[T]=BaseModel, 
+        file_path: Optional[str] = None, 
+        mode: str = "a+", 
+        compression: Optional[Compression] = None,
+        compresslevel: int = DEFAULT_COMPRESSLEVEL
+    ):
         """
         初始化 JsonlIO 对象
         
         参数:
             file_path: JSONL 文件路径，如果不提供则创建临时文件
             mode: 文件打开模式，默认为 'a+'（读写模式）
+            compression: 临时文件使用的压缩格式，指定文件路径时由扩展名决定
+            compresslevel: 压缩等级，默认为最快的 1
         """
         self.model_cls = model_cls
+        self.mode = mode
+        self.compresslevel = compresslevel
         self.is_temp = file_path is None
         if self.is_temp:
             # 创建临时文件
-            self.temp_file = tempfile.NamedTemporaryFile(mode=mode, suffix='.jsonl', delete=False)
+            suffix = with_compression_suffix('.jsonl', compression)
+            self.temp_file = tempfile.NamedTemporaryFile(mode=mode, suffix=suffix, delete=False)
+            self.temp_file.close()
             self.file_path = self.temp_file.name
         else:
             self.file_path = file_path
         
-        self.file:FileIO = open(self.file_path, mode)
+        self.compression = detect_compression(self.file_path)
+        self.lock = threading.RLock()
+        # 游标按位置读取共用的只读文件描述符，第一次读取时打开
+        self._read_fd: Optional[int] = None
+        self.file:FileIO = self._open(mode)
     
+    def _open(self, mode: str) -> IO[str]:
+        """按文件的压缩格式打开文件，并记录压缩流当前是否处于写入状态"""
+        self._writing = ('r' not in mode)
+        return open_jsonl(self.file_path, mode, self.compresslevel)
+
+    def _switch(self, writing: bool) -> IO[str]:
+        """压缩流不能同时读写，需要时关闭当前流并以读取或追加模式重新打开"""
+        if self.compression is not None and (writing != self._writing or self.file.closed):
+            self.file.close()
+            self.file = self._open('a' if writing else 'r')
+        return self.file
+    
+    def _pread(self, size: int, offset: int) -> bytes:
+        """从 offset 读取至多 size 个字节，不移动共享的文件指针"""
+        with self.lock:
+            if self._read_fd is None:
+                self._read_fd = os.open(self.file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            read_fd = self._read_fd
+            if not hasattr(os, 'pread'):
+                os.lseek(read_fd, offset, os.SEEK_SET)
+                return os.read(read_fd, size)
+        return os.pread(read_fd, size, offset)
+
+    def _close_read_fd(self) -> None:
+        """文件被替换后，游标需要重新打开文件"""
+        with self.lock:
+            if self._read_fd is not None:
+                os.close(self._read_fd)
+                self._read_fd = None
+
+    def cursor(self, start: int = 0, end: Optional[int] = None) -> JsonlCursor[T]:
+        """
+        创建独立的读取游标
+
+        参数:
+            start: 起始字节位置
+            end: 结束字节位置（不包含），默认为读取时的文件末尾
+
+        返回:
+            读取起始字节位于 [start, end) 中的行的 JsonlCursor
+        """
+        return JsonlCursor(self, start, end)
+
+    def split(self, parts: int) -> List[JsonlCursor[T]]:
+        """
+        把文件按字节范围切分为若干个不相交的游标，每一行恰好属于其中一个，可以在多个线程中并行读取
+
+        参数:
+            parts: 游标数量，压缩文件只返回一个读取整个文件的游标
+
+        返回:
+            按文件顺序排列的 JsonlCursor 列表
+        """
+        if self.compression is not None:
+            return [self.cursor()]
+        self.flush()
+        size = os.path.getsize(self.file_path)
+        bounds = [size * i // parts for i in range(parts + 1)]
+        return [self.cursor(start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+
     def empty(self) -> None:
         """清空文件内容"""
-        mode = self.file.mode
-        self.file.close()
-        self.file = open(self.file_path, 'w')
-        self.file.close()
-        self.file = open(self.file_path, mode)
+        with self.lock:
+            self.file.close()
+            self.file = self._open('w')
+            self.file.close()
+            self.file = self._open(self.mode)
     
     def _calculate_length(self) -> None:
         """计算文件中的行数"""
-        current_pos = self.file.tell()
-        self.file.seek(0)
-        length = sum(1 for _ in self.file)
-        self.file.seek(current_pos)
-        return length
+        if self.compression is not None:
+            with self.lock:
+                file = self._switch(False)
+                file.seek(0)
+                return sum(1 for _ in file)
+        return sum(1 for _ in self.cursor().lines())
 
     def add_line(self, data: Dict[str, Any]|T) -> None:
         """
@@ -61,12 +305,25 @@ class JsonlIO(Generic[T]):
         else:
             raise TypeError(f"数据必须是字典或 {self.model_cls.__name__} 的实例")
         
-        # 确保文件指针在末尾
-        self.file.seek(0, os.SEEK_END)
         json_str = model_instance.model_dump_json()
-        self.file.write(json_str + '\n')
-        self.file.flush()
+        with self.lock:
+            if self.compression is not None:
+                # 压缩流逐行 flush 会破坏压缩率，在切换到读取或关闭时统一写出
+                self._switch(True).write(json_str + '\n')
+                return
+            # 确保文件指针在末尾
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(json_str + '\n')
+            self.file.flush()
     
+    def flush(self) -> None:
+        """将已写入的数据落盘，压缩流会结束当前压缩段，使其它读取者可以完整读取"""
+        with self.lock:
+            if self.compression is not None:
+                self._switch(False)
+            else:
+                self.file.flush()
+
     def read_line(self)->T:
         """
         读取当前行的 JSON 对象
@@ -74,21 +331,19 @@ class JsonlIO(Generic[T]):
         返回:
             当前行的 JSON 对象
         """
-        line = self.file.readline()
+        with self.lock:
+            line = self._switch(False).readline()
         data = json.loads(line)
         return self.model_cls(**data)
     
     def __iter__(self) -> Iterator[T]:
-        """实现迭代器接口，允许使用 for in 循环遍历文件中的所有 JSON 对象"""
-        self.file.seek(0)
-        for line in self.file:
-            if line.strip():  # 忽略空行
-                data = json.loads(line)
-                yield self.model_cls(**data)
+        """实现迭代器接口，允许使用 for in 循环遍历文件中的所有 JSON 对象，每次迭代使用独立的游标"""
+        return iter(self.cursor())
     
     def close(self) -> None:
         """关闭文件，如果是临时文件则删除"""
         self.file.close()
+        self._close_read_fd()
         if self.is_temp and hasattr(self, 'temp_file'):
             try:
                 os.unlink(self.file_path)
@@ -123,7 +378,7 @@ class JsonlIO(Generic[T]):
         temp_files = []
         
         # 读取并分块排序
-        with open(self.file_path, 'r') as input_file:
+        with open_jsonl(self.file_path, 'r') as input_file:
             while True:
                 # 读取一个块的数据
                 chunk = []
@@ -145,21 +400,22 @@ class JsonlIO(Generic[T]):
                 
                 chunk.sort(key=sort_key, reverse=reverse)
                 
-                # 将排序后的块写入临时文件
-                temp_fd, temp_path = tempfile.mkstemp(suffix='.jsonl')
-                with os.fdopen(temp_fd, 'w') as temp_file:
+                # 将排序后的块写入临时文件，压缩文件的排序块使用相同的压缩格式
+                temp_fd, temp_path = tempfile.mkstemp(suffix=with_compression_suffix('.jsonl', self.compression))
+                os.close(temp_fd)
+                with open_jsonl(temp_path, 'w', self.compresslevel) as temp_file:
                     for _, line in chunk:
                         temp_file.write(line)
                 temp_files.append(temp_path)
         
         # 合并排序后的块
-        with open(self.file_path, 'w') as output_file:
+        with open_jsonl(self.file_path, 'w', self.compresslevel) as output_file:
             file_handles = []
             entries = []
             
             # 打开所有临时文件
             for temp_path in temp_files:
-                file_handle:FileIO = open(temp_path, 'r')
+                file_handle:FileIO = open_jsonl(temp_path, 'r')
                 file_handles.append(file_handle)
                 line = file_handle.readline()
                 if line.strip():
@@ -185,8 +441,8 @@ class JsonlIO(Generic[T]):
                         data = json.loads(next_line)
                         obj = self.model_cls(**data)
                         sort_value = tuple(getattr(obj, field) for field in fields)
-                        # 为了维持稳定排序，使用当前堆的大小作为次级比较键
-                        heapq.heappush(entries_heap, (sort_value, len(entries_heap), next_line, file_idx))
+                        # 为了维持稳定排序，使用块的序号作为次级比较键，相同的键按块的先后输出，结果与块大小无关
+                        heapq.heappush(entries_heap, (sort_value, file_idx, next_line, file_idx))
             
             # 关闭并删除所有临时文件
             for file_handle in file_handles:
@@ -198,7 +454,7 @@ class JsonlIO(Generic[T]):
                     pass
         
         # 重新打开文件
-        self.file = open(self.file_path, self.file.mode)
+        self.file = self._open(self.mode)
     def head(self, length: int = 10) -> None:
         """
         保留文件的前 n 行数据，并覆盖当前文件
@@ -210,10 +466,11 @@ class JsonlIO(Generic[T]):
         self.file.close()
         
         # 创建临时文件
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.jsonl')
-        with os.fdopen(temp_fd, 'w') as temp_file:
+        temp_fd, temp_path = tempfile.mkstemp(suffix=with_compression_suffix('.jsonl', self.compression))
+        os.close(temp_fd)
+        with open_jsonl(temp_path, 'w', self.compresslevel) as temp_file:
             # 读取原文件前 n 行
-            with open(self.file_path, 'r') as input_file:
+            with open_jsonl(self.file_path, 'r') as input_file:
                 for i in range(length):
                     line = input_file.readline()
                     if not line:  # 文件结束
@@ -222,9 +479,10 @@ class JsonlIO(Generic[T]):
         
         # 用临时文件替换原文件
         os.replace(temp_path, self.file_path)
+        self._close_read_fd()
         
         # 重新打开文件
-        self.file = open(self.file_path, self.file.mode)
+        self.file = self._open(self.mode)
 
 
 # 使用示例
@@ -0,0 +1,225 @@
+import json
+import zipfile
+from typing import Dict, Any, Iterator, Optional, List, TypeVar, Generic, Type, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+T = TypeVar('T', bound=BaseModel)
+
+# 字段类型与列数据类型的对应关系
+COLUMN_DTYPES = {int: np.int64, float: np.float64, bool: np.bool_}
+
+
+class NpzResultIO(Generic[T]):
+    """selectedWindow 结果的列式存储，使用 .npz（zip 中的多个 .npy）保存
+
+    文件内容:
+        records_{n}.npy: 第 n 个块的结构化数组，数值字段直接保存，
+            字符串表字段（默认 seq_id）保存为字符串表中的下标，
+            大文本字段（默认 seq）保存为该块字节数据中的 (偏移, 长度)，长度为 -1 表示 None
+        blob_{n}.npy: 第 n 个块中所有大文本字段拼接后的 uint8 数组
+        strings.npy: 字符串表
+        meta.npy: 字段信息（JSON 字符串）
+
+    写入时每个块直接流式写入 zip，内存占用只与块大小有关。
+    """
+
+    def __init__(
+        self,
+        model_cls: Type[T],
+        file_path: str,
+        mode: str = 'r',
+        chunk_size: int = 100_000,
+        table_fields: Tuple[str, ...] = ('seq_id',),
+    ):
+        """
+        初始化 NpzResultIO 对象
+
+        参数:
+            model_cls: 结果的模型类，用于确定列以及迭代时重建对象
+            file_path: .npz 文件路径
+            mode: 'w' 写入，'r' 读取
+            chunk_size: 写入时每个块的行数
+            table_fields: 以字符串表保存的字段，适用于取值重复很多的字段
+        """
+        self.model_cls = model_cls
+        self.file_path = file_path
+        self.mode = mode
+        self.chunk_size = chunk_size
+        if mode == 'w':
+            self.columns = self._columns_of(model_cls, table_fields)
+            self.zip_file = zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+            self.strings: Dict[str, int] = {}
+            self.buffer: List[BaseModel] = []
+            self.chunk_num = 0
+            self.length = 0
+        else:
+            self.zip_file = None
+            self._load()
+
+    @staticmethod
+    def _columns_of(model_cls: Type[BaseModel], table_fields: Tuple[str, ...]) -> List[Tuple[str, str]]:
+        """根据模型字段确定每一列的保存方式: 'table'、'blob' 或数值类型名"""
+        columns = []
+        for name, field in model_cls.model_fields.items():
+            if field.annotation in COLUMN_DTYPES:
+                columns.append((name, np.dtype(COLUMN_DTYPES[field.annotation]).str))
+            elif name in table_fields:
+                columns.append((name, 'table'))
+            else:
+                columns.append((name, 'blob'))
+        return columns
+
+    def _record_dtype(self) -> np.dtype:
+        fields = []
+        for name, kind in self.columns:
+            if kind == 'table':
+                fields.append((name, np.uint32))
+            elif kind == 'blob':
+                fields.extend([(f'{name}_offset', np.int64), (f'{name}_length', np.int64)])
+            else:
+                fields.append((name, np.dtype(kind)))
+        return np.dtype(fields)
+
+    def _write_array(self, name: str, arr: np.ndarray) -> None:
+        with self.zip_file.open(f'{name}.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
+
+    def add_line(self, data: Dict[str, Any]|T) -> None:
+        """
+        添加一行结果
+
+        参数:
+            data: 结果对象（字典格式或模型实例）
+        """
+        if isinstance(data, dict):
+            data = self.model_cls(**data)
+        self.buffer.append(data)
+        if len(self.buffer) >= self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self) -> None:
+        """将缓冲区中的行转换为结构化数组并写入 zip"""
+        if not self.buffer:
+            return
+        records = np.zeros(len(self.buffer), dtype=self._record_dtype())
+        blobs: List[bytes] = []
+        blob_offset = 0
+        for name, kind in self.columns:
+            values = [getattr(item, name) for item in self.buffer]
+            if kind == 'table':
+                records[name] = [self.strings.setdefault(v, len(self.strings)) for v in values]
+            elif kind == 'blob':
+                lengths = np.full(len(values), -1, dtype=np.int64)
+                offsets = np.zeros(len(values), dtype=np.int64)
+                for i, v in enumerate(values):
+                    if v is None:
+                        continue
+                    encoded = v.encode('utf-8')
+                    offsets[i] = blob_offset
+                    lengths[i] = len(encoded)
+                    blob_offset += len(encoded)
+                    blobs.append(encoded)
+                records[f'{name}_offset'] = offsets
+                records[f'{name}_length'] = lengths
+            else:
+                records[name] = values
+        self._write_array(f'records_{self.chunk_num}', records)
+        self._write_array(f'blob_{self.chunk_num}', np.frombuffer(b''.join(blobs), dtype=np.uint8))
+        self.length += len(self.buffer)
+        self.chunk_num += 1
+        self.buffer = []
+
+    def close(self) -> None:
+        """写入模式下写出剩余的块、字符串表以及字段信息，读取模式下关闭文件"""
+        if self.zip_file is None:
+            if self.mode != 'w':
+                self.npz.close()
+            return
+        self._flush_chunk()
+        strings = list(self.strings.keys())
+        self._write_array('strings', np.array(strings, dtype=str) if strings else np.zeros(0, dtype='<U1'))
+        meta = json.dumps({'columns': self.columns, 'chunk_num': self.chunk_num, 'length': self.length})
+        self._write_array('meta', np.array(meta))
+        self.zip_file.close()
+        self.zip_file = None
+
+    def _load(self) -> None:
+        """读取模式下加载字段信息和字符串表，各个块在使用时才读取"""
+        self.npz = np.load(self.file_path, allow_pickle=False)
+        meta = json.loads(str(self.npz['meta']))
+        self.columns = [tuple(i) for i in meta['columns']]
+        self.chunk_num = meta['chunk_num']
+        self.length = meta['length']
+        self.strings = self.npz['strings']
+
+    def iter_chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """逐块返回 (结构化数组, 字节数据)"""
+        for i in range(self.chunk_num):
+            yield self.npz[f'records_{i}'], self.npz[f'blob_{i}']
+
+    def to_columns(self, table_codes: bool = False) -> Dict[str, np.ndarray]:
+        """
+        将所有块合并为按列组织的数组
+
+        参数:
+            table_codes: 字符串表字段是否直接返回字符串表中的下标
+
+        返回:
+            字典，键为字段名。字符串表字段和大文本字段解码为 object 数组
+        """
+        chunks = list(self.iter_chunks())
+        records = np.concatenate([r for r, _ in chunks]) if chunks else np.zeros(0, dtype=self._record_dtype())
+        columns = {}
+        for name, kind in self.columns:
+            if kind == 'table' and table_codes:
+                columns[name] = records[name]
+            elif kind == 'table':
+                columns[name] = self.strings.astype(object)[records[name]]
+            elif kind == 'blob':
+                values = []
+                for chunk_records, blob in chunks:
+                    data = blob.tobytes()
+                    for offset, length in zip(chunk_records[f'{name}_offset'], chunk_records[f'{name}_length']):
+                        values.append(None if length < 0 else data[offset:offset+length].decode('utf-8'))
+                columns[name] = np.array(values, dtype=object)
+            else:
+                columns[name] = records[name]
+        return columns
+
+    def to_dataframe(self):
+        """加载为 pandas.DataFrame，字符串表字段转换为 category 类型"""
+        import pandas as pd
+        columns = self.to_columns(table_codes=True)
+        for name, kind in self.columns:
+            if kind == 'table':
+                columns[name] = pd.Categorical.from_codes(columns[name].astype(np.int64), categories=self.strings)
+        return pd.DataFrame(columns)
+
+    def __iter__(self) -> Iterator[T]:
+        """逐行返回模型实例"""
+        for records, blob in self.iter_chunks():
+            data = blob.tobytes()
+            for record in records:
+                item = {}
+                for name, kind in self.columns:
+                    if kind == 'table':
+                        item[name] = str(self.strings[record[name]])
+                    elif kind == 'blob':
+                        offset, length = record[f'{name}_offset'], record[f'{name}_length']
+                        # None 值不传入，使用模型的默认值
+                        if length >= 0:
+                            item[name] = data[offset:offset+length].decode('utf-8')
+                    else:
+                        item[name] = record[name].item()
+                yield self.model_cls(**item)
+
+    def __len__(self) -> int:
+        return self.length + (len(self.buffer) if self.zip_file is not None else 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
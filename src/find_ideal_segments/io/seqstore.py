@@ -0,0 +1,119 @@
+import os
+import pathlib
+from typing import Iterator, Iterable, Tuple, Dict, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from .atomic import atomic_path
+from .jsonl import JsonlIO
+
+class seqIndexItem(BaseModel):
+    id: str
+    offset: int
+    length: int
+
+class SequenceStore:
+    """将序列的原始字节连续保存在一个文件中，通过内存映射按需读取
+
+    文件内容:
+        <path>: 所有序列的 uint8 字节依次拼接
+        <path>.jsonl: 每条序列的 id、在文件中的偏移以及长度
+    """
+
+    def __init__(self, path: str):
+        """
+        打开已经生成的序列文件
+
+        参数:
+            path: 序列文件路径
+        """
+        self.path = path
+        self.index_path = self.index_path_of(path)
+        with JsonlIO(seqIndexItem, file_path=self.index_path, mode='r') as index:
+            self.index: Dict[str, seqIndexItem] = {item.id: item for item in index}
+        # 空文件无法建立内存映射
+        self.bases = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+    @staticmethod
+    def index_path_of(path: str) -> str:
+        return path + '.jsonl'
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return pathlib.Path(path).exists() and pathlib.Path(cls.index_path_of(path)).exists()
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, np.ndarray]], path: str) -> 'SequenceStore':
+        """
+        将 (序列 id, uint8 序列) 流式写入序列文件
+
+        参数:
+            records: 序列迭代器，例如 FastaReader，序列 id 不能重复
+            path: 序列文件路径
+
+        返回:
+            打开的 SequenceStore
+        """
+        offset = 0
+        seq_ids = set()
+        index_path = cls.index_path_of(path)
+        # 先替换序列文件再替换索引，中断时 exists 为 False，不会读取不完整的文件
+        pathlib.Path(index_path).unlink(missing_ok=True)
+        with atomic_path(index_path, suffix='.jsonl') as tmp_index_path, atomic_path(path) as tmp_path:
+            with open(tmp_path, 'wb') as f, JsonlIO(seqIndexItem, file_path=tmp_index_path, mode='w') as index:
+                index.empty()
+                for seq_id, arr in records:
+                    if seq_id in seq_ids:
+                        raise ValueError(f'Duplicate sequence id "{seq_id}".')
+                    seq_ids.add(seq_id)
+                    arr.tofile(f)
+                    index.add_line(seqIndexItem(id=seq_id, offset=offset, length=len(arr)))
+                    offset += len(arr)
+        return cls(path)
+
+    def records(self) -> Iterator[Tuple[str, int]]:
+        """按写入顺序返回 (序列 id, 序列长度)"""
+        for item in self.index.values():
+            yield item.id, item.length
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, seq_id: str) -> bool:
+        return seq_id in self.index
+
+    def read(self, seq_id: str, start: int = 0, end: Optional[int] = None, lookup_table: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        读取序列 [start, end) 区间
+
+        参数:
+            seq_id: 序列 id
+            start: 起始位置
+            end: 结束位置，默认为序列末尾
+            lookup_table: 指定时返回查找表编码后的数组
+
+        返回:
+            uint8 视图（或编码后的数组）
+        """
+        view = self[seq_id][start:end]
+        return view if lookup_table is None else lookup_table[view]
+
+    def __getitem__(self, seq_id: str) -> np.ndarray:
+        """返回序列的 uint8 视图，不拷贝数据"""
+        item = self.index[seq_id]
+        return self.bases[item.offset:item.offset+item.length]
+
+    def fetch(self, seq_id: str, start: int, end: int) -> str:
+        """返回序列 [start, end) 区间的字符串"""
+        return self[seq_id][start:end].tobytes().decode()
+
+    def close(self) -> None:
+        """释放内存映射，仍被引用的视图在释放之前保持可用"""
+        self.bases = np.zeros(0, dtype=np.uint8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,175 @@
+import csv
+from typing import Dict, Any, List, TypeVar, Generic, Type, Optional
+
+from pydantic import BaseModel
+
+from .jsonl import open_jsonl, detect_compression
+from .npz import NpzResultIO
+
+T = TypeVar('T', bound=BaseModel)
+
+
+class ResultSink(Generic[T]):
+    """结果写出接口，按批缓存结果行并一次性格式化写出
+
+    子类只需要实现 `_open`、`write_batch` 和 `_close`，即可作为查找结果的输出格式。
+    """
+
+    def __init__(self, model_cls: Type[T], file_path: Optional[str] = None, batch_size: int = 10_000):
+        """
+        初始化结果写出对象
+
+        参数:
+            model_cls: 结果的模型类
+            file_path: 输出文件路径
+            batch_size: 每批写出的行数
+        """
+        self.model_cls = model_cls
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.buffer: List[T] = []
+        self.length = 0
+        self._open()
+
+    def _open(self) -> None:
+        raise NotImplementedError
+
+    def write_batch(self, items: List[T]) -> None:
+        """格式化并写出一批结果"""
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+    def add_line(self, data: Dict[str, Any]|T) -> None:
+        """
+        添加一行结果
+
+        参数:
+            data: 结果对象（字典格式或模型实例）
+        """
+        if isinstance(data, dict):
+            data = self.model_cls(**data)
+        self.buffer.append(data)
+        self.length += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """写出缓冲区中的结果"""
+        if self.buffer:
+            self.write_batch(self.buffer)
+            self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self._close()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlSink(ResultSink[T]):
+    """JSONL 格式输出，扩展名为 .gz / .xz 时写出压缩流"""
+
+    def _open(self) -> None:
+        self.file = open_jsonl(self.file_path, 'w')
+
+    def write_batch(self, items: List[T]) -> None:
+        self.file.write(''.join(item.model_dump_json() + '\n' for item in items))
+
+    def _close(self) -> None:
+        self.file.close()
+
+
+class DelimitedSink(ResultSink[T]):
+    """CSV / TSV 格式输出，打开时写入表头，没有结果时也是只有表头的表格，扩展名为 .gz / .xz 时写出压缩流"""
+
+    delimiter = ','
+
+    def _open(self) -> None:
+        self.fields = list(self.model_cls.model_fields.keys())
+        self.file = open_jsonl(self.file_path, 'w', newline='')
+        self.writer = csv.writer(self.file, delimiter=self.delimiter)
+        self.writer.writerow(self.fields)
+
+    def write_batch(self, items: List[T]) -> None:
+        self.writer.writerows([getattr(item, field) for field in self.fields] for item in items)
+
+    def _close(self) -> None:
+        self.file.close()
+
+
+class CsvSink(DelimitedSink[T]):
+    delimiter = ','
+
+
+class TsvSink(DelimitedSink[T]):
+    delimiter = '\t'
+
+
+class NpzSink(ResultSink[T]):
+    """列式 .npz 格式输出，见 NpzResultIO"""
+
+    def _open(self) -> None:
+        # npz 文件本身已经压缩，再加压缩扩展名时既不会压缩也无法按 npz 读取
+        if detect_compression(self.file_path) is not None:
+            raise ValueError(f'"{self.file_path}": npz results can not be compressed further, use a ".npz" output file.')
+        self.npz = NpzResultIO(self.model_cls, self.file_path, mode='w', chunk_size=self.batch_size)
+
+    def write_batch(self, items: List[T]) -> None:
+        for item in items:
+            self.npz.add_line(item)
+
+    def _close(self) -> None:
+        self.npz.close()
+
+
+class MemorySink(ResultSink[T]):
+    """将结果保存在内存列表 items 中，不写出文件"""
+
+    def _open(self) -> None:
+        self.items: List[T] = []
+
+    def write_batch(self, items: List[T]) -> None:
+        self.items.extend(items)
+
+    def _close(self) -> None:
+        pass
+
+
+# 扩展名与输出格式的对应关系
+RESULT_SINKS: Dict[str, Type[ResultSink]] = {
+    'jsonl': JsonlSink,
+    'csv': CsvSink,
+    'tsv': TsvSink,
+    'npz': NpzSink,
+}
+
+
+def result_file_type(file_path: Optional[str]) -> str:
+    """根据扩展名判断输出格式，忽略压缩扩展名，无法识别时视为 jsonl"""
+    if file_path is None:
+        return 'jsonl'
+    if detect_compression(file_path) is not None:
+        file_path = file_path.rsplit('.', 1)[0]
+    file_type = file_path.rsplit('.', 1)[-1].lower()
+    return file_type if file_type in RESULT_SINKS else 'jsonl'
+
+
+def open_result_sink(model_cls: Type[T], file_path: str, batch_size: int = 10_000) -> ResultSink[T]:
+    """
+    按扩展名创建结果写出对象
+
+    参数:
+        model_cls: 结果的模型类
+        file_path: 输出文件路径
+        batch_size: 每批写出的行数
+    """
+    return RESULT_SINKS[result_file_type(file_path)](model_cls, file_path, batch_size=batch_size)
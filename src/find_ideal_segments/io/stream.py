@@ -0,0 +1,101 @@
+from typing import Iterator, Optional, Protocol, Tuple
+
+import numpy as np
+
+from ..encoding import KmerLookupTable, kmer_size_of
+
+# 逐块读取时每块的碱基数
+STREAM_CHUNK_SIZE = 1 << 24
+
+
+class SequenceSource(Protocol):
+    """可以按区间读取序列的文件，例如 IndexedFasta 和 SequenceStore"""
+
+    def read(self, seq_id: str, start: int = 0, end: Optional[int] = None, lookup_table: Optional[np.ndarray] = None) -> np.ndarray:
+        ...
+
+
+class StreamedSequence:
+    """按需读取并编码的序列，不把整条序列读入内存
+
+    切片得到的仍然是 StreamedSequence，只记录区间；astype、np.asarray 或 chunks 时才读取并编码对应的碱基。
+    k-mer 查找表会多读取区间之后的 k-1 个碱基，编码结果与先编码整条序列再切片相同。
+    """
+
+    def __init__(
+        self,
+        source: SequenceSource,
+        seq_id: str,
+        length: int,
+        lookup_table: Optional[np.ndarray|KmerLookupTable] = None,
+        start: int = 0,
+        end: Optional[int] = None
+    ):
+        """
+        Args:
+            source: 序列文件
+            seq_id: 序列 id
+            length: 整条序列的长度
+            lookup_table: 编码使用的查找表，None 表示返回 uint8 碱基
+            start: 视图在序列中的起始位置
+            end: 视图在序列中的结束位置，默认为序列末尾
+        """
+        self.source = source
+        self.seq_id = seq_id
+        self.seq_length = length
+        self.lookup_table = lookup_table
+        self.start = start
+        self.end = length if end is None else end
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.uint8) if self.lookup_table is None else self.lookup_table.dtype
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, key: slice) -> 'StreamedSequence':
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError(f'StreamedSequence only supports slices with step 1, got {key!r}.')
+        start, end, _ = key.indices(len(self))
+        return StreamedSequence(self.source, self.seq_id, self.seq_length, self.lookup_table, self.start + start, self.start + max(start, end))
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """
+        读取并编码视图中的 [start, end) 区间
+
+        Args:
+            start: 相对视图的起始位置
+            end: 相对视图的结束位置，默认为视图末尾
+
+        Returns:
+            编码后的数组
+        """
+        start = self.start + start
+        end = self.end if end is None else self.start + end
+        if self.lookup_table is None or isinstance(self.lookup_table, np.ndarray):
+            return self.source.read(self.seq_id, start, end, lookup_table=self.lookup_table)
+        # 区间末尾的 k-mer 需要之后的碱基
+        bases = self.source.read(self.seq_id, start, min(end + kmer_size_of(self.lookup_table) - 1, self.seq_length))
+        return self.lookup_table[bases][:end - start]
+
+    def chunks(self, chunk_size: int = STREAM_CHUNK_SIZE, overlap: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        逐块读取视图，相邻的块重叠 overlap 个元素，例如窗口大小减一
+
+        Args:
+            chunk_size: 每块不重叠部分的元素数
+            overlap: 每块在末尾多读取的元素数
+
+        Returns:
+            (块在视图中的起始位置, 编码后的数组) 迭代器
+        """
+        for start in range(0, len(self), chunk_size):
+            yield start, self.read(start, min(start + chunk_size + overlap, len(self)))
+
+    def astype(self, dtype) -> np.ndarray:
+        return self.read().astype(dtype)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        arr = self.read()
+        return arr if dtype is None else arr.astype(dtype)
@@ -1,36 +1,107 @@
 import numpy as np
-from typing import List, Tuple, Literal
+from typing import List, Tuple, Literal, Optional, Callable
 from .core import SequenceNumRotateCalculation
+from .pyramid import WindowValuePyramid, diff_bounds, load_window_value_pyramid
+from .io.stream import StreamedSequence
+from .io.atomic import atomic_path
 import logging
 import uuid
 import pathlib
 logger = logging.getLogger(__name__)
 
+ROTATE_WINDOW_CACHE_DIR = '.rotate_windows'
+
+def rotate_window_cache_file(cache_id: str, window: int, window_apply_method: Literal['sum', 'mean']) -> str:
+    return f'{ROTATE_WINDOW_CACHE_DIR}/{cache_id}_{window}_{window_apply_method}.npy'
+
+def remove_empty_window_cache_dir() -> None:
+    """删除空的窗口值缓存目录，目录不存在或者还有其它缓存时保留"""
+    try:
+        pathlib.Path(ROTATE_WINDOW_CACHE_DIR).rmdir()
+    except OSError:
+        pass
+
+def load_cached_window_values(
+    cache_file: str,
+    length: int,
+    fill: Callable[[np.ndarray], object],
+    max_resident_bytes: Optional[int] = None
+) -> np.ndarray:
+    """
+    读取缓存的整条序列的窗口值，缓存文件不存在时计算并写入
+
+    Args:
+        cache_file: 缓存文件路径
+        length: 窗口值的个数
+        fill: 将窗口值写入给定 float64 数组的函数
+        max_resident_bytes: 窗口值超过该字节数时，直接写入内存映射的缓存文件并以内存映射方式读取，None 表示不限制
+
+    Returns:
+        窗口值数组
+    """
+    pathlib.Path(cache_file).parent.mkdir(exist_ok=True)
+    values_bytes = max(length, 0) * np.dtype(np.float64).itemsize
+    resident = max_resident_bytes is None or values_bytes <= max_resident_bytes
+    if not pathlib.Path(cache_file).exists():
+        logger.info(f'Caching rotate window values - "{cache_file}"...')
+        # 先写入临时文件再替换，多个进程同时缓存同一条序列时不会读到不完整的文件
+        with atomic_path(cache_file) as tmp_file:
+            if resident:
+                values = np.zeros(length, dtype=np.float64)
+                fill(values)
+                with open(tmp_file, 'wb') as f:
+                    np.save(f, values)
+            else:
+                # 超过内存预算的窗口值直接分块写入内存映射的缓存文件
+                out = np.lib.format.open_memmap(tmp_file, mode='w+', dtype=np.float64, shape=(length,))
+                fill(out)
+                out.flush()
+                del out
+        if resident:
+            return values
+    return np.load(cache_file, mmap_mode=None if resident else 'r')
+
 class IterableSequenceNumRotateCalculation:
     def __init__(
         self, 
         window: int, 
         arr: np.ndarray,
         excluding_window_list: List[List[Tuple[int, int]]]=[],
-        cache_id: str= None
+        cache_id: str= None,
+        rotate_window_values: np.ndarray = None,
+        chunk_size: int = 10**6,
+        max_resident_bytes: Optional[int] = None,
+        skipped_regions: Optional[np.ndarray|List[Tuple[int, int]]] = None,
+        pyramid: Optional[WindowValuePyramid] = None
     ):
         """
         初始化滑动窗口计算类
         
         Args:
             window: 窗口大小
-            arr: 输入数组，可以是numpy数组或可迭代对象
+            arr: 输入数组，可以是numpy数组、StreamedSequence（按块读取，不整条读入内存）或可迭代对象
             exculding_region_list: 排除区域列表，每个元素为每一轮挑选到的靠近理想值的区域列表(起始索引, 连续窗口数量)
+            cache_id: 窗口值缓存文件的 id
+            rotate_window_values: 已经计算好的整条序列的窗口值，指定时不再读取或写入缓存文件
+            chunk_size: 分块计算窗口值和查找理想窗口时每块大小
+            max_resident_bytes: 整条序列的窗口值超过该字节数时，直接写入缓存文件并以内存映射方式读取，None 表示不限制
+            skipped_regions: 不扫描的区域列表，每个元素为 [起始, 结束)，例如 GapIndex 中的 N 区域，与这些区域重叠的窗口不会被选中
+            pyramid: rotate_window_values 的金字塔，调用者在多轮之间保留，默认读取缓存文件旁边的金字塔或在内存中生成
         """
         self.window = window
         # 使用弱引用存储原始数组，避免复制大数组
-        self.arr = arr if isinstance(arr, np.ndarray) else np.array(arr)
+        self.arr = arr if isinstance(arr, (np.ndarray, StreamedSequence)) else np.array(arr)
         self.length = len(arr)
         # assert window <= self.length, 'window must be less than or equal to the length of the array'
         if window > self.length:
             logging.warning(f'Sequence length {self.length} is smaller than window size {window}.')
         self.excluding_window_list = excluding_window_list
         self.cache_id = cache_id if cache_id is not None else str(uuid.uuid4())
+        self.rotate_window_values = rotate_window_values
+        self.chunk_size = chunk_size
+        self.max_resident_bytes = max_resident_bytes
+        self.skipped_regions = skipped_regions if skipped_regions is not None else []
+        self.pyramid = pyramid
     
     def get_sub_arrs(self, arr:np.ndarray, excluding_window_list:List[List[Tuple[int, int]]]):
         """
@@ -43,28 +114,42 @@ class IterableSequenceNumRotateCalculation:
         Returns:
             List[int, np.ndarray]列表，每个元素为子序列在原序列的起始位置以及子序列
         """
-        all_windows = sorted([i for x in excluding_window_list for i in x], key=lambda i: i[0])
+        # 窗口 (起始索引, 连续窗口数量) 覆盖 [起始索引, 起始索引 + 连续窗口数量 + 窗口大小 - 1)
+        all_regions = [(start, start + length + self.window - 1) for x in excluding_window_list for start, length in x]
+        all_regions.extend((int(start), int(end)) for start, end in self.skipped_regions)
+        all_regions.sort(key=lambda i: i[0])
         sub_arrs = []
         last_end = 0
-        for start, length in all_windows:
+        for start, end in all_regions:
             if start > last_end:
                 sub_arr = arr[last_end:start]
                 if len(sub_arr)>=self.window:
                     sub_arrs.append((last_end, sub_arr))
-            last_end = start + length + self.window -1
+            last_end = max(last_end, end)
         if last_end < len(arr):
             sub_arr = arr[last_end:]
             if len(sub_arr)>=self.window:
                 sub_arrs.append((last_end, sub_arr))
         return sub_arrs
     
-    def rotate_on_whole_sequence_(self, window_apply_method: Literal['sum', 'mean'] = 'mean', chunk_size: int = 10**6):
+    def rotate_on_whole_sequence_(
+        self,
+        window_apply_method: Literal['sum', 'mean'] = 'mean',
+        chunk_size: Optional[int] = None,
+        out: Optional[np.ndarray] = None
+    ):
         """计算原始序列上的完整窗口值，并缓存到本地
+
+        Args:
+            window_apply_method: 窗口计算方法
+            chunk_size: 每块大小，默认使用 self.chunk_size
+            out: 写入窗口值的数组，例如内存映射的缓存文件，默认新建数组
         """
         arr = self.arr
-        chunk_size = max(chunk_size, self.window)
+        chunk_size = max(chunk_size or self.chunk_size, self.window)
         total_chunks = (self.length - self.window + chunk_size) // chunk_size
-        rotate_window_values = np.zeros(self.length-self.window + 1, dtype=np.float64) - 1
+        rotate_window_values = out if out is not None else np.zeros(self.length-self.window + 1, dtype=np.float64)
+        rotate_window_values[:] = -1
         for chunk_idx in range(total_chunks):
             start_idx = chunk_idx * chunk_size
             end_idx = min(start_idx + chunk_size +self.window -1, self.length)
@@ -75,16 +160,12 @@ class IterableSequenceNumRotateCalculation:
         return rotate_window_values
     
     def load_whole_sequence_rotate_window_values(self, window_apply_method: Literal['sum','mean'] ='mean'):
-        cache_dir = '.rotate_windows'
-        pathlib.Path(cache_dir).mkdir(exist_ok=True)
-        cache_file = f'.rotate_windows/{self.cache_id}_{window_apply_method}.npy'
-        if not pathlib.Path(cache_file).exists():
-            logger.info(f'Caching rotate window values - "{cache_file}"...')
-            rotate_window_values = self.rotate_on_whole_sequence_(window_apply_method=window_apply_method)
-            np.save(cache_file, rotate_window_values)
-        else:
-            rotate_window_values = np.load(cache_file)
-        return rotate_window_values
+        return load_cached_window_values(
+            rotate_window_cache_file(self.cache_id, self.window, window_apply_method),
+            max(self.length - self.window + 1, 0),
+            lambda out: self.rotate_on_whole_sequence_(window_apply_method=window_apply_method, out=out),
+            max_resident_bytes=self.max_resident_bytes
+        )
     
     def find_next_ideal_windows(
         self,
@@ -103,21 +184,45 @@ class IterableSequenceNumRotateCalculation:
         Returns:
             列表，每个元素为(起始索引, 连续窗口数量)
         """
-        whole_sequence_rotate_window_values = self.load_whole_sequence_rotate_window_values(window_apply_method=window_apply_method)
+        whole_sequence_rotate_window_values = self.rotate_window_values if self.rotate_window_values is not None \
+            else self.load_whole_sequence_rotate_window_values(window_apply_method=window_apply_method)
+        # 窗口值缓存旁边的块最小值和最大值，没有缓存文件时在内存中生成
+        pyramid = self.pyramid if self.pyramid is not None else load_window_value_pyramid(
+            rotate_window_cache_file(self.cache_id, self.window, window_apply_method), whole_sequence_rotate_window_values
+        )
         sub_arrs = self.get_sub_arrs(self.arr, self.excluding_window_list)
-        sub_arrs = [(start, SequenceNumRotateCalculation(self.window, arr)) for start, arr in sub_arrs]
+        # 每个子序列窗口值的范围给出最小差异的下界；范围的端点是实际的窗口值，其中最近的一个给出全局最小差异的上界
+        sub_ranges = [
+            pyramid.min_max(whole_sequence_rotate_window_values, start, start + len(arr) - self.window + 1) for start, arr in sub_arrs
+        ]
+        sub_bounds = [diff_bounds(low, high, ideal_value) for low, high in sub_ranges]
+        max_diff = min((upper for _, upper in sub_bounds), default=float('inf'))
         result = []
         closest_score = None
         min_diff = float('inf')
-        for start, arr_rotator in sub_arrs:
+        for (start, arr), (low, high), (lower, _) in zip(sub_arrs, sub_ranges, sub_bounds):
+            if lower > min(min_diff, max_diff):
+                continue
+            arr_rotator = SequenceNumRotateCalculation(self.window, arr)
             cached_rotate_window_values_length = len(arr_rotator.arr) - self.window + 1
             cached_rotate_window_values = whole_sequence_rotate_window_values[start:start+cached_rotate_window_values_length]
-            sub_score, sub_windows = arr_rotator.find_ideal_consecutive_windows(
+            chunk_starts = range(start, start + cached_rotate_window_values_length, max(self.chunk_size, 1))
+            chunk_value_ranges = np.array([(low, high)] if len(chunk_starts) == 1 else [
+                pyramid.min_max(whole_sequence_rotate_window_values, i, min(i + self.chunk_size, start + cached_rotate_window_values_length))
+                for i in chunk_starts
+            ])
+            sub_result = arr_rotator.find_ideal_consecutive_windows(
                 ideal_value=ideal_value,
                 window_apply_method=window_apply_method,
                 filter_out_partial_overlapped_result=filter_out_partial_overlapped_result,
-                cached_rotate_window_values=cached_rotate_window_values
+                cached_rotate_window_values=cached_rotate_window_values,
+                chunk_size=self.chunk_size,
+                chunk_value_ranges=chunk_value_ranges,
+                max_diff=min(min_diff, max_diff)
             )
+            if not sub_result:
+                continue
+            sub_score, sub_windows = sub_result
             sub_diff = abs(sub_score - ideal_value)
             if sub_diff < min_diff:
                 closest_score = sub_score
@@ -0,0 +1,138 @@
+import re
+import tracemalloc
+from typing import Type
+
+from pydantic import BaseModel
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+# 解释器和已导入模块占用的内存，不计入可分配的预算（导入 gccontent 之后的常驻内存约 44M）
+BASE_OVERHEAD = 48 << 20
+# 分块扫描时每个元素占用的字节数: float64 的子序列、窗口值、与理想值的差值以及比较结果
+SCAN_BYTES_PER_ELEMENT = 8 * 3 + 8
+# 窗口值（float64）的字节数
+WINDOW_VALUE_BYTES = 8
+# 可变窗口查找时每个碱基的前缀和（float64）的字节数
+PREFIX_SUM_BYTES = 8
+# 可变窗口查找时每个小格的上下界（12 字节）和排序后的序号（int64）
+VARIABLE_CELL_BYTES = 12 + 8
+MIN_SCAN_CHUNK_SIZE = 1 << 12
+MAX_SCAN_CHUNK_SIZE = 1 << 26
+MIN_SORT_CHUNK_SIZE = 1000
+
+
+class memoryPlan(BaseModel):
+    memory_limit: int
+    scan_chunk_size: int
+    sort_chunk_size: int
+    window_cache_resident_bytes: int
+
+
+def parse_memory_size(size: str|int) -> int:
+    """
+    解析内存大小，例如 "512M"、"1.5G"、"8GB" 或字节数
+
+    Args:
+        size: 内存大小
+
+    Returns:
+        字节数
+    """
+    if isinstance(size, int):
+        return size
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*', size.upper())
+    if match is None:
+        raise ValueError(f'Invalid memory size "{size}", use a number of bytes or a number with K/M/G/T.')
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def measure_sort_line_bytes(model_cls: Type[BaseModel], sample: BaseModel, n: int = 1000) -> int:
+    """
+    测量外部排序时每行数据占用的内存: 模型对象和原始行字符串
+
+    Args:
+        model_cls: 行的模型类
+        sample: 一行示例数据
+        n: 测量时创建的行数
+
+    Returns:
+        每行的字节数
+    """
+    line = sample.model_dump_json() + '\n'
+    data = sample.model_dump()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        chunk = [(model_cls(**data), line[:-1] + '\n') for _ in range(n)]
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    del chunk
+    return max(used // n, len(line))
+
+
+def plan_memory(
+    memory_limit: int,
+    max_record_length: int,
+    record_itemsize: int,
+    window: int,
+    sort_line_bytes: int,
+    processes: int = 1,
+    shared_bytes: int = 0,
+    streamed_records: bool = False,
+    search_bytes: int = 0
+) -> memoryPlan:
+    """
+    根据内存预算和序列大小计算分块大小
+
+    每个进程同一时间只处理一条序列: 序列本身、整条序列的窗口值以及分块扫描的中间数组。
+    序列逐块读取时（见 StreamedSequence）不计整条序列，只在每个扫描元素上加上编码后序列的字节数。
+    查找本身不能分块的内存（search_bytes）与整条序列一样从每个进程的预算中扣除。
+    窗口值能放入一半的剩余预算时常驻内存，否则写入和读取都使用内存映射；
+    剩余的预算平分给扫描分块和外部排序分块。预算放不下最小的扫描分块和排序分块时报错，
+    错误信息给出能够满足的最小预算。
+
+    Args:
+        memory_limit: 内存预算（字节）
+        max_record_length: 最长序列的长度
+        record_itemsize: 编码后序列每个元素的字节数
+        window: 窗口大小
+        sort_line_bytes: 外部排序时每行占用的字节数，见 measure_sort_line_bytes
+        processes: 同时处理序列的进程数
+        shared_bytes: 所有进程共用的内存，例如共享内存中的序列
+        streamed_records: 序列是否逐块读取，不整条读入内存
+        search_bytes: 每个进程查找时额外常驻的内存，例如可变窗口查找整段读入的子序列及其前缀和
+
+    Returns:
+        memoryPlan
+
+    Raises:
+        MemoryError: 预算放不下最长的序列和最小的分块
+    """
+    per_process = (memory_limit - shared_bytes) // processes - BASE_OVERHEAD
+    record_bytes = (0 if streamed_records else max_record_length * record_itemsize) + search_bytes
+    available = per_process - record_bytes
+    window_values_bytes = max(max_record_length - window + 1, 0) * WINDOW_VALUE_BYTES
+    scan_bytes_per_element = SCAN_BYTES_PER_ELEMENT + (record_itemsize if streamed_records else 0)
+    # 扫描分块和排序分块各占 rest 的一半，rest 至少为 min_rest 时两者都不小于最小值
+    min_rest = 2 * max(MIN_SCAN_CHUNK_SIZE * scan_bytes_per_element, MIN_SORT_CHUNK_SIZE * sort_line_bytes)
+    # 窗口值常驻时 rest = available - 窗口值，否则 rest 至少为 available 的一半
+    min_available = min(2 * min_rest, max(min_rest + window_values_bytes, 2 * window_values_bytes))
+    if available < min_available:
+        needed = (BASE_OVERHEAD + record_bytes + min_available) * processes + shared_bytes
+        raise MemoryError(
+            f'The memory limit {memory_limit} bytes is too small for the longest sequence ({max_record_length} bases), '
+            f'at least {needed} bytes ({needed / (1 << 20):.1f}M) are needed.'
+        )
+    resident_bytes = available // 2
+    rest = available - min(window_values_bytes, resident_bytes)
+    scan_chunk_size = min(rest // 2 // scan_bytes_per_element, MAX_SCAN_CHUNK_SIZE)
+    sort_chunk_size = rest // 2 // sort_line_bytes
+    return memoryPlan(
+        memory_limit=memory_limit,
+        scan_chunk_size=scan_chunk_size,
+        sort_chunk_size=sort_chunk_size,
+        window_cache_resident_bytes=resident_bytes
+    )
@@ -0,0 +1,158 @@
+import pathlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .io.atomic import atomic_path
+
+# 最底层每块的窗口值数量，以及每一层合并的块数
+PYRAMID_BLOCK_SIZE = 1 << 12
+PYRAMID_FANOUT = 16
+# 建立最底层时每次读取的窗口值数量，内存映射的窗口值不会一次读入内存
+PYRAMID_BUILD_CHUNK_SIZE = PYRAMID_BLOCK_SIZE << 10
+
+
+def pyramid_file_of(cache_file: str) -> str:
+    """窗口值缓存文件对应的金字塔文件，保存在缓存文件旁边"""
+    return f'{cache_file.removesuffix(".npy")}.pyramid.npz'
+
+
+def diff_bounds(low: float, high: float, ideal_value: float) -> Tuple[float, float]:
+    """
+    窗口值范围为 [low, high] 时，与理想值的最小差异的下界和上界
+
+    low 和 high 都是实际的窗口值，上界就是它们中较近的一个的差异；与逐个计算差异的浮点运算相同，不需要留余量
+
+    Args:
+        low: 范围内的最小窗口值
+        high: 范围内的最大窗口值
+        ideal_value: 理想值
+
+    Returns:
+        (下界, 上界)
+    """
+    return max(low - ideal_value, ideal_value - high, 0), min(abs(low - ideal_value), abs(high - ideal_value))
+
+
+class WindowValuePyramid:
+    """整条序列窗口值的多分辨率块最小值和最大值
+
+    第 0 层每 block_size 个窗口值一块，之后每层把 fanout 块合并为一块，直到只剩一块。任意区间的最小值和最大值由
+    区间两端不满一块的窗口值加上每层至多 2 * fanout 块得到。保存为 npz 文件:
+        length: 窗口值数量
+        block_size, fanout: 分块参数
+        min_<i>, max_<i>: 第 i 层每块的最小值和最大值
+    """
+
+    def __init__(self, length: int, levels: List[Tuple[np.ndarray, np.ndarray]], block_size: int = PYRAMID_BLOCK_SIZE, fanout: int = PYRAMID_FANOUT):
+        self.length = length
+        self.levels = levels
+        self.block_size = block_size
+        self.fanout = fanout
+
+    @classmethod
+    def build(cls, values: np.ndarray, block_size: int = PYRAMID_BLOCK_SIZE, fanout: int = PYRAMID_FANOUT) -> 'WindowValuePyramid':
+        """
+        由整条序列的窗口值生成金字塔
+
+        Args:
+            values: 窗口值，可以是内存映射的数组
+            block_size: 最底层每块的窗口值数量
+            fanout: 每层合并的块数
+
+        Returns:
+            WindowValuePyramid
+        """
+        length = len(values)
+        n_blocks = -(-length // block_size)
+        mins = np.empty(n_blocks, dtype=np.float64)
+        maxs = np.empty(n_blocks, dtype=np.float64)
+        chunk_size = max(block_size, PYRAMID_BUILD_CHUNK_SIZE // block_size * block_size)
+        for start in range(0, length, chunk_size):
+            chunk = np.asarray(values[start:start + chunk_size])
+            offsets = np.arange(0, len(chunk), block_size)
+            mins[start // block_size:start // block_size + len(offsets)] = np.minimum.reduceat(chunk, offsets)
+            maxs[start // block_size:start // block_size + len(offsets)] = np.maximum.reduceat(chunk, offsets)
+        levels = [(mins, maxs)]
+        while len(levels[-1][0]) > 1:
+            mins, maxs = levels[-1]
+            offsets = np.arange(0, len(mins), fanout)
+            levels.append((np.minimum.reduceat(mins, offsets), np.maximum.reduceat(maxs, offsets)))
+        return cls(length, levels, block_size, fanout)
+
+    @classmethod
+    def load(cls, path: str) -> 'WindowValuePyramid':
+        with np.load(path) as data:
+            n_levels = sum(1 for key in data.files if key.startswith('min_'))
+            levels = [(data[f'min_{i}'], data[f'max_{i}']) for i in range(n_levels)]
+            return cls(int(data['length']), levels, int(data['block_size']), int(data['fanout']))
+
+    def save(self, path: str) -> None:
+        """先写入临时文件再替换，其他进程不会读到不完整的金字塔"""
+        arrays = {f'{kind}_{i}': level[j] for i, level in enumerate(self.levels) for j, kind in enumerate(['min', 'max'])}
+        with atomic_path(path) as tmp_path, open(tmp_path, 'wb') as f:
+            np.savez(f, length=self.length, block_size=self.block_size, fanout=self.fanout, **arrays)
+
+    @staticmethod
+    def is_fresh(path: str, cache_file: str) -> bool:
+        """金字塔存在且不早于窗口值缓存文件"""
+        return pathlib.Path(path).exists() and pathlib.Path(path).stat().st_mtime >= pathlib.Path(cache_file).stat().st_mtime
+
+    def min_max(self, values: np.ndarray, start: int, end: int) -> Tuple[float, float]:
+        """
+        窗口值 [start, end) 区间内的最小值和最大值
+
+        Args:
+            values: 生成金字塔的窗口值，只读取区间两端不满一块的部分
+            start: 起始位置
+            end: 结束位置
+
+        Returns:
+            (最小值, 最大值)，区间为空时为 (inf, -inf)
+        """
+        low, high = np.inf, -np.inf
+        first, last = -(-start // self.block_size), end // self.block_size
+        if first >= last:
+            parts = [values[start:end]]
+        else:
+            parts = [values[start:first * self.block_size], values[last * self.block_size:end]]
+        for part in parts:
+            if len(part):
+                low, high = min(low, float(part.min())), max(high, float(part.max()))
+        # 第 level 层的 [first, last) 块，两端不满一组的块在本层取值，其余交给上一层
+        for level, (mins, maxs) in enumerate(self.levels):
+            if first >= last:
+                break
+            upper_first, upper_last = -(-first // self.fanout), last // self.fanout
+            if level + 1 == len(self.levels) or upper_first >= upper_last:
+                ranges = [(first, last)]
+            else:
+                ranges = [(first, upper_first * self.fanout), (upper_last * self.fanout, last)]
+            for lo, hi in ranges:
+                if lo < hi:
+                    low, high = min(low, float(mins[lo:hi].min())), max(high, float(maxs[lo:hi].max()))
+            first, last = upper_first, upper_last
+        return low, high
+
+
+def load_window_value_pyramid(cache_file: Optional[str], values: np.ndarray) -> WindowValuePyramid:
+    """
+    读取窗口值缓存文件旁边的金字塔，不存在或早于缓存文件时由窗口值生成并保存
+
+    Args:
+        cache_file: 窗口值缓存文件，None 表示窗口值没有缓存，只在内存中生成金字塔
+        values: 整条序列的窗口值
+
+    Returns:
+        WindowValuePyramid
+    """
+    if cache_file is None or not pathlib.Path(cache_file).exists():
+        return WindowValuePyramid.build(values)
+    path = pyramid_file_of(cache_file)
+    if WindowValuePyramid.is_fresh(path, cache_file):
+        pyramid = WindowValuePyramid.load(path)
+        if pyramid.length == len(values):
+            return pyramid
+    pyramid = WindowValuePyramid.build(values)
+    pyramid.save(path)
+    return pyramid
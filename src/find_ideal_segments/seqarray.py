@@ -0,0 +1,84 @@
+import base64
+import mmap
+from typing import Annotated, Any, Dict, Iterable, Optional
+
+import numpy as np
+from pydantic import PlainSerializer, PlainValidator
+
+
+def to_numeric_array(value: Any) -> np.ndarray:
+    """
+    把输入转换为一维数值数组
+
+    numpy 数组（包括内存映射的数组）直接使用，不复制；列表（旧格式的 jsonl）转换为数组；
+    字典为 numeric_array_to_json 的输出，data 为 base64 编码的字节，file 为外部 .npy 等文件的引用。
+
+    Args:
+        value: numpy 数组、数值列表或序列化后的字典
+
+    Returns:
+        一维数值数组
+    """
+    if isinstance(value, dict):
+        dtype = np.dtype(value['dtype'])
+        if 'file' in value:
+            return np.memmap(value['file'], dtype=dtype, mode='r', offset=value['offset'], shape=(value['length'],))
+        return np.frombuffer(base64.b64decode(value['data']), dtype=dtype)
+    arr = value if isinstance(value, np.ndarray) else np.asarray(value)
+    if arr.ndim != 1:
+        raise ValueError(f'The numeric sequence must be one dimensional, got shape {arr.shape}.')
+    if arr.dtype.kind not in 'biuf':
+        raise ValueError(f'The numeric sequence must be numbers, got dtype {arr.dtype}.')
+    return arr
+
+
+def numeric_dtype_of(values: Iterable[float|int]) -> np.dtype:
+    """
+    能保存这些数值的最小数据类型: 全部为整数时使用最小的整数类型，例如 0 和 1 使用 uint8，否则使用 float64
+
+    Args:
+        values: 编码使用的所有数值，例如 word_dict 的值和 beyond_word_dict_value
+
+    Returns:
+        数据类型
+    """
+    values = list(values)
+    if all(isinstance(i, (int, np.integer)) for i in values):
+        return np.result_type(np.uint8, *(np.min_scalar_type(i) for i in values))
+    return np.dtype(np.float64)
+
+
+def _base_memmap(arr: np.ndarray) -> Optional[np.memmap]:
+    # 切片的 base 链最终指向直接映射文件的 memmap，运算得到的 memmap 不映射文件
+    while isinstance(arr.base, np.memmap):
+        arr = arr.base
+    return arr if isinstance(arr, np.memmap) and isinstance(arr.base, mmap.mmap) else None
+
+
+def _memmap_offset(arr: np.memmap, base: np.memmap) -> int:
+    # 切片的 offset 属性仍是原数组的偏移，由数据地址之差计算切片在文件中的位置
+    return base.offset + arr.ctypes.data - base.ctypes.data
+
+
+def numeric_array_to_json(arr: np.ndarray) -> Dict[str, Any]:
+    """
+    序列化数值数组: 只读的内存映射数组保存为文件引用，其它数组保存为 base64 编码的原始字节
+
+    Args:
+        arr: 一维数值数组
+
+    Returns:
+        dtype 和 data，或 dtype、file、offset 和 length 组成的字典
+    """
+    base = _base_memmap(arr) if isinstance(arr, np.memmap) else None
+    if base is not None and base.filename is not None and arr.flags.c_contiguous and base.mode == 'r':
+        return {'dtype': arr.dtype.str, 'file': base.filename, 'offset': _memmap_offset(arr, base), 'length': len(arr)}
+    return {'dtype': arr.dtype.str, 'data': base64.b64encode(np.ascontiguousarray(arr)).decode('ascii')}
+
+
+# seqItem.seq 的类型，Python 中为 numpy 数组，jsonl 中为 numeric_array_to_json 的字典
+NumericArray = Annotated[
+    np.ndarray,
+    PlainValidator(to_numeric_array),
+    PlainSerializer(numeric_array_to_json, when_used='json')
+]
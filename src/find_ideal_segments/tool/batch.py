@@ -0,0 +1,38 @@
+import click
+import pathlib
+import logging
+logger = logging.getLogger(__name__)
+
+# 任务的模型和运行函数在 jobs 中，numpy、pydantic 和查找器只在真正运行时导入，`gccontent-batch --help` 不需要加载它们
+
+@click.command()
+@click.option('-j', '--jobs', 'job_file', required=True, help='The YAML or JSON job file. It has the keys "input", "output_dir", "defaults" and "jobs", every job takes the long options of gccontent: window, value, top, dict, method, filter, beyond, human_readable, sort_chunk_size, precision, compression, memory_limit, skip_gaps, skip_soft_masked, include_bed, exclude_bed, output, and an optional name.')
+@click.option('-i', '--input', 'input_file', required=False, default=None, help='The input DNA fasta file, it overrides "input" of the job file.')
+@click.option('-o', '--output-dir', 'output_dir', required=False, default=None, help='The directory of the job outputs and the summary, it overrides "output_dir" of the job file, default="."')
+@click.option('-s', '--summary', 'summary_file', required=False, default=None, help='The summary jsonl file, default="<output dir>/summary.jsonl"')
+@click.option('-n', '--workers', 'workers', required=False, default=1, type=int, help='The number of jobs to run at the same time, default=1')
+@click.option('--threads', 'threads', required=False, default=None, type=int, help='The number of threads to decompress a gzip/bgzip fasta, default is the number of CPUs')
+@click.option('-c', '--cache', 'cache', required=False, default=True, type=click.BOOL, help='Whether to keep the fasta index (.fai/.gzi) or the decompressed bases of a gzip fasta built by this batch, the record manifest, the per-round results and the window value caches for later runs, default=True')
+def run_batch(job_file, input_file, output_dir, summary_file, workers, threads, cache):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    from ..io.jsonl import JsonlIO
+    from .jobs import batchJobSummary, load_batch_file, resolve_jobs, run_batch_jobs
+    batch = load_batch_file(job_file)
+    fasta_file = input_file or batch.input
+    if fasta_file is None:
+        raise click.UsageError('The input fasta file is given neither by --input nor by the job file.')
+    output_dir = output_dir or batch.output_dir or '.'
+    jobs = resolve_jobs(batch, output_dir)
+    summaries = run_batch_jobs(fasta_file, jobs, output_dir=output_dir, workers=workers, threads=threads, cache=cache)
+    summary_file = summary_file or str(pathlib.Path(output_dir) / 'summary.jsonl')
+    with JsonlIO(batchJobSummary, file_path=summary_file, mode='w') as summary:
+        summary.empty()
+        for item in summaries:
+            summary.add_line(item)
+    failed = [i.name for i in summaries if i.error is not None]
+    logger.info(f'{len(summaries) - len(failed)} of {len(summaries)} jobs finished, summary saved in "{summary_file}".')
+    if failed:
+        raise click.ClickException(f'{len(failed)} jobs failed: {", ".join(failed)}')
+
+if __name__ == '__main__':
+    run_batch()
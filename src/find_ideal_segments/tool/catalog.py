@@ -0,0 +1,46 @@
+import click
+import logging
+from .gccontent import TRACK_NAMES
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+@click.command()
+@click.option('-i', '--input', 'input_file', required=True, help='The input DNA fasta file, it can be compressed by gzip or bgzip.')
+@click.option('-w', '--window', 'window', required=True, type=int, help='The sliding window size.')
+@click.option('-o', '--output', 'output_file', required=False, default='-', help='The output tsv file, default is the standard output')
+@click.option('-d', '--dict', 'dict_mode', required=False, default='GC', type=click.Choice(TRACK_NAMES), help=f'The dictionary mode (track). It can be {", ".join(TRACK_NAMES)}, default="GC".')
+@click.option('-m', '--method', 'window_apply_method', required=False, default='mean', type=click.Choice(['mean', 'sum']), help='The method to apply the sliding window. It can be "sum" or "mean", default="mean".')
+@click.option('-b', '--beyond', 'beyond_word_dict_value', required=False, default=0, type=float, help='The value of the beyond word dict, default=0')
+@click.option('-q', '--quantile', 'quantiles', required=False, multiple=True, type=click.FloatRange(0, 1), default=DEFAULT_QUANTILES, help='The quantiles to report, estimated from the histogram of the catalog, can be given more than once, default=0.05, 0.25, 0.5, 0.75 and 0.95')
+@click.option('-j', '--threads', 'threads', required=False, default=None, type=int, help='The number of threads to decompress a gzip/bgzip fasta, default is the number of CPUs')
+def run_catalog(input_file, window, output_file, dict_mode, window_apply_method, beyond_word_dict_value, quantiles, threads):
+    '''Report the distribution of the window values of every sequence from the catalog next to the `.rotate_windows`
+    cache, the sequences whose window values are not cached yet are computed and cached first, later `gccontent`
+    runs with the same window, dict and method reuse them.
+    '''
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    from ..finder.file.gccontent import findIdealGCContentSegmentsonFasta
+    # 目录只需要窗口值，top 和理想值不会用到
+    finder = findIdealGCContentSegmentsonFasta(
+        fasta_file=input_file,
+        window=window,
+        top=1,
+        ideal_value=0,
+        dict_mode=dict_mode,
+        beyond_word_dict_value=beyond_word_dict_value,
+        window_apply_method=window_apply_method,
+        threads=threads
+    )
+    with click.open_file(output_file, 'w') as f:
+        f.write('\t'.join(['seq_id', 'windows', 'min', *(f'q{q:g}' for q in quantiles), 'max', 'mean']) + '\n')
+        for seq_id, summary in finder.catalog():
+            values = [summary.min, *(summary.quantile(q) for q in quantiles), summary.max, summary.mean] if summary.count else [float('nan')] * (len(quantiles) + 3)
+            f.write('\t'.join([seq_id, str(summary.count), *(f'{i:.{finder.precision}f}' for i in values)]) + '\n')
+
+if __name__ == '__main__':
+    run_catalog()
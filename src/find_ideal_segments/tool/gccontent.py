@@ -1,120 +1,104 @@
-from ..io.jsonl import JsonlIO
-from ..io.utils.jsonl2csv import jsonl2csv
-from ..finder.file.wordratio import findIdealWordRatioInSlidingWindow, wordSeqItem
-from Bio import SeqIO
-from Bio.SeqRecord import SeqRecord
 import click
-import json
-from typing import Literal, Iterator
-import pathlib
 import logging
 logger = logging.getLogger(__name__)
-# 创建一个基本的日志格式
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 
-class findIdealGCContentSegmentsonFasta(findIdealWordRatioInSlidingWindow):
-    def __init__(
-        self, 
-        fasta_file: str, 
-        window: int, 
-        top:int,
-        ideal_value: float,
-        beyond_word_dict_value: float|int = 0,
-        dict_mode: Literal['GC', 'AT']|dict = 'GC',
-        window_apply_method: Literal['sum', 'mean'] = 'mean',
-        filter_out_partial_overlapped_result: bool = True,
-        cache: bool = True,
-        sort_chunk_size: int = 10_000_000,
-        precision:int = 4
-    ):
-        # generate class annotation below
-        '''Find the ideal GC content segments in the DNA fasta file.
-        '''
-        if isinstance(dict_mode, dict):
-            word_dict = dict_mode
-        elif dict_mode == 'GC':
-            word_dict = {'G': 1, 'C': 1, 'g':1, 'c':1}
-        else:
-            word_dict = {'A': 1, 'T': 1, 'a':1, 't':1}
+# numpy、pydantic 等依赖只在真正运行时导入，`gccontent --help` 不需要加载它们
+def __getattr__(name: str):
+    if name == 'findIdealGCContentSegmentsonFasta':
+        from ..finder.file.gccontent import findIdealGCContentSegmentsonFasta
+        return findIdealGCContentSegmentsonFasta
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-        self.cache = cache
-        self.cache_jsonl_file = fasta_file.rsplit('.',1)[0] + '.jsonl'
-        if cache or (not pathlib.Path(self.cache_jsonl_file).exists()):
-            self.fasta2jsonl(fasta_file, jsonl_file=self.cache_jsonl_file)
-
-        super().__init__(
-            word_file=self.cache_jsonl_file,
-            word_dict=word_dict,
-            window=window,
-            top=top,
-            ideal_value=ideal_value,
-            window_apply_method=window_apply_method,
-            filter_out_partial_overlapped_result=filter_out_partial_overlapped_result,
-            beyond_word_dict_value=beyond_word_dict_value,
-            cache_numeric_file=cache,
-            sort_chunk_size=sort_chunk_size,
-            precision=precision
-        )
-    
-    @classmethod
-    def fasta2jsonl(cls, fasta_file: str, jsonl_file:str):
-        '''Convert the DNA fasta file to jsonl file.
-        '''
-        logger.info(f'Converting "{fasta_file}" to "{jsonl_file}"...')
-        with JsonlIO(wordSeqItem, file_path=jsonl_file, mode='w') as jio:
-            jio.empty()
-            parser: Iterator[SeqRecord] = SeqIO.parse(fasta_file, 'fasta')
-            for seq in parser:
-                jio.add_line(wordSeqItem(id=seq.id, seq=str(seq.seq)))
-    
-
-    def find(self, save_path:str = None, human_readable_idx: bool = True):
-        save_file_type = 'jsonl' if save_path is None else save_path.rsplit('.',1)[-1]
-        save_file_type = 'jsonl' if save_file_type not in ['jsonl', 'csv'] else save_file_type
-        saved_jsonl_file = f'{save_path.rsplit('.',1)[0]}.jsonl'
-        result = super().find(save_path=saved_jsonl_file, human_readable_idx=human_readable_idx)
-        result_length = len(result)
-        if save_file_type == 'csv':
-            jsonl2csv(saved_jsonl_file, save_path)
-            result.close()
-            pathlib.Path(saved_jsonl_file).unlink()
-        if not self.cache:
-            pathlib.Path(self.cache_jsonl_file).unlink()
-        return save_path, result_length
+# 与 encoding.TRACKS 相同，命令行不导入 numpy
+TRACK_NAMES = ['GC', 'AT', 'purine', 'pyrimidine', 'keto', 'amino', 'CpG']
 
 @click.command()
-@click.option('-i', '--input', 'input_file', required=True, help='The input DNA fasta file.')
-@click.option('-w', '--window', 'window', required=True, type=int, help='The sliding window size.')
+@click.option('-i', '--input', 'input_file', required=True, help='The input DNA fasta file, it can be compressed by gzip or bgzip.')
+@click.option('-w', '--window', 'window', required=True, type=int, help='The sliding window size, the smallest window size when --max-window is given.')
+@click.option('-W', '--max-window', 'max_window', required=False, default=None, type=int, help='Search all window sizes from --window to --max-window in one pass, the result segments have different lengths and --workers is ignored, default is only --window')
+@click.option('-S', '--window-step', 'window_step', required=False, default=1, type=int, help='The step of the window sizes searched with --max-window, default=1')
 @click.option('-t', '--top', 'top', required=False, type=int, default=10, help='The top number of the ideal segments.default=10')
-@click.option('-v', '--value', 'ideal_value', required=True, type=float, help='The ideal value of the sliding window.')
-@click.option('-o', '--output', 'output_file', required=True, help='The output file.')
-@click.option('-d', '--dict', 'dict_mode', required=False, default='GC',type=click.Choice(['GC', 'AT']), help='The dictionary mode. It can be "GC" or "AT", default="GC".')
+@click.option('-v', '--value', 'ideal_value', required=False, default=None, type=float, help='The ideal value of the sliding window, required unless --target is given.')
+@click.option('-o', '--output', 'output_file', required=True, help='The output file, the format is decided by the extension: ".jsonl", ".csv", ".tsv" (optionally ".gz" or ".xz" compressed) or ".npz" (columnar numpy arrays).')
+@click.option('-d', '--dict', 'dict_mode', required=False, default='GC',type=click.Choice(TRACK_NAMES), help=f'The dictionary mode (track). It can be {", ".join(TRACK_NAMES)}, default="GC".')
 @click.option('-m', '--method', 'window_apply_method', required=False, default='mean',type=click.Choice(['mean', 'sum']), help='The method to apply the sliding window. It can be "sum" or "mean", default="mean".')
 @click.option('-f', '--filter', 'filter_out_partial_overlapped_result', required=False, default=True,type=click.BOOL, help='Whether to filter out the partial overlapped result, default=True')
 @click.option('-b', '--beyond', 'beyond_word_dict_value', required=False, default=0, type=float, help='The value of the beyond word dict, default=0')
-@click.option('-c', '--cache', 'cache', required=False, default=True, type=click.BOOL, help='Whether to cache the jsonl file, default=True')
+@click.option('-c', '--cache', 'cache', required=False, default=True, type=click.BOOL, help='Whether to keep the fasta index (.fai/.gzi) or the decompressed bases of a gzip fasta built by this run, the record manifest, the per-round results and the window value caches in .rotate_windows for later runs, default=True')
 @click.option('-r', '--human-readable', 'human_readable_idx', required=False, default=True, type=click.BOOL, help='Whether to use human readable index, default=True')
 @click.option('-s', '--sort-chunk-size', 'sort_chunk_size', required=False, default=10_000_000, type=int, help='The chunk size of the sorting, bigger means more memory usage but faster to sort your result, default=10_000_000')
 @click.option('-p', '--precision','precision', required=False, default=4, type=int, help='The precision of the calculated score, default=4')
-def run_tool(input_file, window, top, ideal_value, output_file, dict_mode, window_apply_method, filter_out_partial_overlapped_result, beyond_word_dict_value, cache, human_readable_idx, sort_chunk_size, precision):
-    finder = findIdealGCContentSegmentsonFasta(
+@click.option('-z', '--compression', 'compression', required=False, default='none', type=click.Choice(['none', 'gzip', 'lzma']), help='Compress the intermediate jsonl files of each round with gzip or lzma, default="none"')
+@click.option('-j', '--threads', 'threads', required=False, default=None, type=int, help='The number of threads to decompress a gzip/bgzip fasta, default is the number of CPUs')
+@click.option('-n', '--workers', 'workers', required=False, default=1, type=int, help='The number of worker processes to scan the sequences, the sequences are shared with them through shared memory, default=1')
+@click.option('-M', '--memory-limit', 'memory_limit', required=False, default=None, help='The memory budget like "512M" or "8G", the scan and sort chunk sizes are derived from it and the longest sequence, overriding --sort-chunk-size, with --max-window it also counts the longest sequence loaded with its prefix sum, default is no limit')
+@click.option('-g', '--skip-gaps', 'skip_gaps', required=False, default=False, type=click.BOOL, help='Whether to skip the runs of N, no window overlapping them is selected, default=False')
+@click.option('-l', '--skip-soft-masked', 'skip_soft_masked', required=False, default=False, type=click.BOOL, help='Whether to skip the soft-masked (lowercase) runs, default=False')
+@click.option('-k', '--include-bed', 'include_bed', required=False, default=None, help='Only search inside the regions of this BED file (0-based, half-open), e.g. exons or a capture panel, a segment lies entirely inside one region, default is the whole sequences')
+@click.option('-e', '--exclude-bed', 'exclude_bed', required=False, default=None, help='Never select a segment overlapping the regions of this BED file, e.g. a blacklist, default is no region')
+@click.option('-I', '--index', 'index', required=False, default=False, type=click.BOOL, help='Whether to write an interval index of the segments next to the output for overlap and nearest queries by gccontent-index, default=False')
+@click.option('-T', '--target', 'targets', required=False, multiple=True, help='A term of a combined objective over several tracks, "TRACK=VALUE" or "TRACK=VALUE:WEIGHT", can be given more than once. The score is the sum of WEIGHT * |window value of TRACK - VALUE|, --value, --dict, --beyond and --workers are ignored.')
+def run_tool(input_file, window, max_window, window_step, top, ideal_value, output_file, dict_mode, window_apply_method, filter_out_partial_overlapped_result, beyond_word_dict_value, cache, human_readable_idx, sort_chunk_size, precision, compression, threads, workers, memory_limit, skip_gaps, skip_soft_masked, include_bed, exclude_bed, index, targets):
+    if ideal_value is None and not targets:
+        raise click.UsageError('Either --value or --target must be given.')
+    if max_window is not None and targets:
+        raise click.UsageError('--max-window can not be used with --target.')
+    # 创建一个基本的日志格式
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    common = dict(
         fasta_file=input_file,
         window=window,
         top=top,
-        ideal_value=ideal_value,
-        dict_mode=dict_mode,
         window_apply_method=window_apply_method,
         filter_out_partial_overlapped_result=filter_out_partial_overlapped_result,
-        beyond_word_dict_value=beyond_word_dict_value,
         cache=cache,
         sort_chunk_size=sort_chunk_size,
-        precision=precision
+        precision=precision,
+        intermediate_compression=None if compression == 'none' else compression,
+        threads=threads,
+        memory_limit=memory_limit,
+        skip_gaps=skip_gaps,
+        skip_soft_masked=skip_soft_masked,
+        include_bed=include_bed,
+        exclude_bed=exclude_bed
     )
-    save_path, result_length = finder.find(save_path=output_file, human_readable_idx=human_readable_idx)
+    if targets:
+        from ..finder.file.tracks import findIdealMultiTrackSegmentsonFasta, trackTarget
+        try:
+            targets = [trackTarget.parse(i) for i in targets]
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--target')
+        finder = findIdealMultiTrackSegmentsonFasta(targets=targets, **common)
+    elif max_window is not None:
+        from ..finder.file.variable import findIdealVariableSegmentsonFasta
+        try:
+            finder = findIdealVariableSegmentsonFasta(
+                max_window=max_window,
+                window_step=window_step,
+                ideal_value=ideal_value,
+                dict_mode=dict_mode,
+                beyond_word_dict_value=beyond_word_dict_value,
+                **common
+            )
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--max-window')
+    else:
+        from ..finder.file.gccontent import findIdealGCContentSegmentsonFasta
+        finder = findIdealGCContentSegmentsonFasta(
+            ideal_value=ideal_value,
+            dict_mode=dict_mode,
+            beyond_word_dict_value=beyond_word_dict_value,
+            workers=workers,
+            **common
+        )
+    save_path, result_length = finder.find(save_path=output_file, human_readable_idx=human_readable_idx, index=index)
+    if not cache:
+        from ..iterator import remove_empty_window_cache_dir
+        remove_empty_window_cache_dir()
     logger.info(f'Found {result_length} ideal segments, result saved in "{output_file}".')
 
 if __name__ == '__main__':
@@ -0,0 +1,76 @@
+import click
+import json
+import re
+import logging
+from typing import Tuple
+logger = logging.getLogger(__name__)
+
+REGION_PATTERN = re.compile(r'^(.+?)(?::([\d,]+)(?:-([\d,]+))?)?$')
+
+def parse_region(text: str) -> Tuple[str, int, int]:
+    '''"chr1:1,001-2,000" (1-based, inclusive like samtools), "chr1:1500" or "chr1", to a 0-based half-open region.
+    '''
+    match = REGION_PATTERN.match(text)
+    if match is None:
+        raise ValueError(f'Invalid region "{text}".')
+    seq_id, start, end = match.groups()
+    if start is None:
+        return seq_id, 0, 2**62
+    start = int(start.replace(',', ''))
+    end = start if end is None else int(end.replace(',', ''))
+    if start < 1 or end < start:
+        raise ValueError(f'Invalid region "{text}", the start must be at least 1 and not after the end.')
+    return seq_id, start - 1, end
+
+@click.group()
+def cli():
+    '''Index the segments of a gccontent result file and query the segments overlapping or nearest to regions.'''
+
+@cli.command()
+@click.option('-i', '--input', 'result_file', required=True, help='The gccontent result file (.jsonl, .csv, .tsv, optionally compressed, or .npz).')
+@click.option('-r', '--human-readable', 'human_readable', required=False, default=True, type=click.BOOL, help='Whether the result uses the human readable index (gccontent -r), default=True')
+def build(result_file, human_readable):
+    '''Write the interval index next to the result file as <result>.idx.npz.'''
+    from ..io.intervals import IntervalIndex, index_file_of
+    index = IntervalIndex.from_result_file(result_file, one_based=human_readable)
+    index.save(index_file_of(result_file))
+    click.echo(f'{len(index)} segments of {len(index.seq_ids)} sequences indexed into "{index_file_of(result_file)}".', err=True)
+
+@cli.command()
+@click.option('-i', '--input', 'result_file', required=True, help='The indexed gccontent result file.')
+@click.option('-R', '--region', 'regions', required=False, multiple=True, help='A region "SEQ:START-END" (1-based, inclusive), "SEQ:POS" or "SEQ", can be given more than once.')
+@click.option('-b', '--bed', 'bed_file', required=False, default=None, help='A BED file of regions (0-based, half-open).')
+@click.option('-n', '--nearest', 'nearest', required=False, is_flag=True, help='Report the nearest segments of every region instead of the overlapping ones, the distance in bases is added.')
+def query(result_file, regions, bed_file, nearest):
+    '''Print the segments overlapping (or nearest to) every region as jsonl, the region is added as "query".
+    '''
+    from ..io.intervals import IntervalIndex, index_file_of
+    from ..io.bed import iter_bed
+    import pathlib
+    if not pathlib.Path(index_file_of(result_file)).exists():
+        raise click.ClickException(f'"{index_file_of(result_file)}" does not exist, run "gccontent-index build -i {result_file}" first.')
+    try:
+        queries = [(text, *parse_region(text)) for text in regions]
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--region')
+    if bed_file is not None:
+        try:
+            queries += [(f'{seq_id}:{start + 1}-{end}', seq_id, start, end) for seq_id, start, end in iter_bed(bed_file)]
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--bed')
+    if not queries:
+        raise click.UsageError('Either --region or --bed must be given.')
+    index = IntervalIndex.load(index_file_of(result_file))
+    if not index.is_fresh(result_file):
+        raise click.ClickException(f'"{index_file_of(result_file)}" is older than "{result_file}", run "gccontent-index build -i {result_file}" again.')
+    for text, seq_id, start, end in queries:
+        if nearest:
+            distance, rows = index.nearest(seq_id, start, end)
+        else:
+            distance, rows = None, index.overlap(seq_id, start, end)
+        for item in index.read_rows(result_file, rows):
+            extra = {'query': text} if not nearest else {'query': text, 'distance': distance}
+            click.echo(json.dumps({**extra, **item}))
+
+if __name__ == '__main__':
+    cli()
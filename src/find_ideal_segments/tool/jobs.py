@@ -0,0 +1,195 @@
+from ..io.jsonl import JsonlIO
+from ..io.seqstore import SequenceStore
+from ..io.faidx import IndexedFasta
+from ..io.stream import StreamedSequence
+from ..finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from ..finder.file.manifest import runManifest, update_manifest
+from ..iterator import remove_empty_window_cache_dir
+from pydantic import BaseModel, ConfigDict, Field
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal, List, Dict, Any, Optional
+import multiprocessing
+import json
+import pathlib
+import shutil
+import tempfile
+import time
+import logging
+logger = logging.getLogger(__name__)
+
+class findParameters(BaseModel):
+    '''The parameters of one `gccontent` run, the fields are named after the long options of `gccontent`.'''
+    model_config = ConfigDict(populate_by_name=True, extra='forbid')
+
+    window: int
+    value: float
+    top: int = 10
+    dict_mode: str|Dict[str, float|int] = Field('GC', alias='dict')
+    method: Literal['mean', 'sum'] = 'mean'
+    filter: bool = True
+    beyond: float|int = 0
+    human_readable: bool = True
+    sort_chunk_size: int = 10_000_000
+    precision: int = 4
+    compression: Literal['none', 'gzip', 'lzma'] = 'none'
+    memory_limit: Optional[int|str] = None
+    skip_gaps: bool = False
+    skip_soft_masked: bool = False
+    include_bed: Optional[str] = None
+    exclude_bed: Optional[str] = None
+
+class batchJob(findParameters):
+    name: Optional[str] = None
+    output: Optional[str] = None
+
+class batchFile(BaseModel):
+    '''The job file, `defaults` are applied to every job.'''
+    model_config = ConfigDict(extra='forbid')
+
+    input: Optional[str] = None
+    output_dir: Optional[str] = None
+    defaults: Dict[str, Any] = {}
+    jobs: List[Dict[str, Any]]
+
+class batchJobSummary(BaseModel):
+    name: str
+    output: str
+    window: int
+    value: float
+    top: int
+    results: int = 0
+    seconds: float = 0
+    error: Optional[str] = None
+
+def load_batch_file(job_file: str) -> batchFile:
+    '''Load a YAML (`.yaml`/`.yml`) or JSON job file, a bare list is taken as the jobs.
+    '''
+    with open(job_file) as f:
+        if job_file.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('Reading YAML job files requires PyYAML, install it with `pip install find-ideal-segments[yaml]`.')
+            content = yaml.safe_load(f)
+        else:
+            content = json.load(f)
+    if isinstance(content, list):
+        content = {'jobs': content}
+    return batchFile(**content)
+
+def resolve_jobs(batch: batchFile, output_dir: str) -> List[batchJob]:
+    '''Apply the defaults, name the unnamed jobs by their position and place the outputs in `output_dir`.
+    '''
+    jobs = []
+    for i, job in enumerate(batch.jobs):
+        job = batchJob(**{**batch.defaults, **job})
+        job.name = job.name or f'job{i}'
+        job.output = str(pathlib.Path(output_dir) / (job.output or f'{job.name}.jsonl'))
+        jobs.append(job)
+    outputs = [job.output for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError('Every job must have its own output file.')
+    return jobs
+
+class batchJobFinder(findIdealGCContentSegmentsonFasta):
+    def __init__(self, bases_file: Optional[str] = None, **kwargs):
+        '''A GC finder that reads the bases extracted once by the batch from `bases_file` and encodes them by its
+        lookup table, instead of parsing the fasta again in every round. All jobs share the file whatever their dict.
+        '''
+        self.bases_file = bases_file
+        super().__init__(**kwargs)
+
+    def load_numeric_file(self):
+        super().load_numeric_file()
+        if self.bases_file is not None:
+            self.bases = SequenceStore(self.bases_file)
+            self.seq_loader = lambda seq_id: StreamedSequence(self.bases, seq_id, self.lengths[seq_id], self.lookup_table)
+
+def run_job(
+    job: batchJob,
+    fasta_file: str,
+    bases_file: Optional[str] = None,
+    threads: Optional[int] = None,
+    cache: bool = True,
+    manifest: Optional[runManifest] = None
+) -> batchJobSummary:
+    '''Run one job, a failed job is reported in the summary instead of stopping the batch. `manifest` is built once
+    by the batch, the jobs do not hash the records again. Without `cache` the job keeps no per-round results or
+    window value caches.
+    '''
+    summary = batchJobSummary(name=job.name, output=job.output, window=job.window, value=job.value, top=job.top)
+    start = time.time()
+    try:
+        finder = batchJobFinder(
+            bases_file=bases_file,
+            fasta_file=fasta_file,
+            window=job.window,
+            top=job.top,
+            ideal_value=job.value,
+            beyond_word_dict_value=job.beyond,
+            dict_mode=job.dict_mode,
+            window_apply_method=job.method,
+            filter_out_partial_overlapped_result=job.filter,
+            cache=cache,
+            sort_chunk_size=job.sort_chunk_size,
+            precision=job.precision,
+            intermediate_compression=None if job.compression == 'none' else job.compression,
+            threads=threads,
+            memory_limit=job.memory_limit,
+            skip_gaps=job.skip_gaps,
+            skip_soft_masked=job.skip_soft_masked,
+            include_bed=job.include_bed,
+            exclude_bed=job.exclude_bed,
+            manifest=manifest
+        )
+        summary.output, summary.results = finder.find(save_path=job.output, human_readable_idx=job.human_readable)
+    except Exception as e:
+        logger.exception(f'Job "{job.name}" failed.')
+        summary.error = f'{type(e).__name__}: {e}'
+    summary.seconds = round(time.time() - start, 3)
+    logger.info(f'Job "{job.name}" finished in {summary.seconds} seconds, {summary.results} segments saved in "{summary.output}".')
+    return summary
+
+def extract_bases(genome: IndexedFasta, bases_file: str) -> SequenceStore:
+    '''Write the bases of every sequence without line breaks into a bases file.
+    '''
+    return SequenceStore.build(((seq_id, genome.read(seq_id)) for seq_id, _ in genome.records()), bases_file)
+
+def run_batch_jobs(
+    fasta_file: str,
+    jobs: List[batchJob],
+    output_dir: str = '.',
+    workers: int = 1,
+    threads: Optional[int] = None,
+    cache: bool = True
+) -> List[batchJobSummary]:
+    '''Open the genome once and extract its bases once into a memory mapped file, then run the jobs in
+    `workers` processes over the shared file. Every job encodes the bases by the lookup table of its dict
+    when it scans them, so jobs of different dicts do not encode or cache the genome again. With `cache` the records
+    are hashed once into the manifest shared by the jobs, without it nothing is reused and nothing is hashed.
+    '''
+    pathlib.Path(output_dir).mkdir(parents=True, exist_ok=True)
+    genome, built_files = findIdealGCContentSegmentsonFasta.open_fasta(fasta_file, threads=threads)
+    work_dir = tempfile.mkdtemp(prefix='.batch_', dir=output_dir)
+    try:
+        if isinstance(genome, SequenceStore):
+            # gzip 压缩的 fasta 已经解压为 bases 文件
+            bases_file = genome.path
+        else:
+            logger.info(f'Extracting the bases of "{fasta_file}"...')
+            bases_file = f'{work_dir}/genome.bases'
+            extract_bases(genome, bases_file).close()
+        manifest = update_manifest(fasta_file, genome) if cache else None
+
+        if workers <= 1:
+            return [run_job(job, fasta_file, bases_file, threads, cache, manifest) for job in jobs]
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(run_job, job, fasta_file, bases_file, threads, cache, manifest) for job in jobs]
+            return [future.result() for future in futures]
+    finally:
+        genome.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not cache:
+            for file in built_files:
+                pathlib.Path(file).unlink(missing_ok=True)
+            remove_empty_window_cache_dir()
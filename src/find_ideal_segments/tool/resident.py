@@ -0,0 +1,164 @@
+from ..io.seqstore import SequenceStore
+from ..io.faidx import IndexedFasta
+from ..io.sink import MemorySink
+from ..io.atomic import atomic_path
+from ..finder.file.wordratio import findIdealWordRatioInSlidingWindow, selectedWindowExtended
+from ..finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from .jobs import findParameters
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Literal
+import numpy as np
+import pathlib
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+class serverQuery(findParameters):
+    '''A query of the server, `genome` can be left out when the server keeps only one genome.'''
+    genome: Optional[str] = None
+
+class residentGenome:
+    '''A genome kept open by the server.
+
+    For every word dict the genome is encoded once into `<work_dir>/<name>.<digest>.bases` and the prefix sums of
+    the encoded sequences are saved in `<work_dir>/<name>.<digest>.prefix.npy`, both are memory mapped and reused
+    after a restart while they are newer than the fasta. The window values of a query are differences of the prefix
+    sums, the recently used ones are kept in memory up to `cache_bytes`.
+    '''
+    def __init__(self, name: str, fasta_file: str, work_dir: str, threads: Optional[int] = None, cache_bytes: int = 1 << 28):
+        self.name = name
+        self.fasta_file = fasta_file
+        self.work_dir = work_dir
+        self.cache_bytes = cache_bytes
+        pathlib.Path(work_dir).mkdir(parents=True, exist_ok=True)
+        self.fasta, _ = findIdealGCContentSegmentsonFasta.open_fasta(fasta_file, threads=threads)
+        self.lock = threading.Lock()
+        self.encoded: Dict[str, SequenceStore] = {}
+        self.prefix_sums: Dict[str, Tuple[np.ndarray, Dict[str, int]]] = {}
+        self.window_values: OrderedDict[Tuple[str, str, int, str], np.ndarray] = OrderedDict()
+        self.window_values_bytes = 0
+
+    def is_fresh(self, *files: str) -> bool:
+        fasta_mtime = pathlib.Path(self.fasta_file).stat().st_mtime
+        return all(pathlib.Path(f).exists() and pathlib.Path(f).stat().st_mtime >= fasta_mtime for f in files)
+
+    def load(self, lookup_table: np.ndarray, digest: str) -> bool:
+        '''Encode the genome and build the prefix sums for a word dict, only lookup tables that fit in uint8
+        are kept, the others are encoded by the finder when they are scanned.
+        '''
+        if lookup_table.dtype.itemsize != 1:
+            return False
+        with self.lock:
+            if digest in self.encoded:
+                return True
+            encoded_file = f'{self.work_dir}/{self.name}.{digest}.bases'
+            prefix_file = f'{self.work_dir}/{self.name}.{digest}.prefix.npy'
+            if self.is_fresh(encoded_file, SequenceStore.index_path_of(encoded_file), prefix_file):
+                encoded = SequenceStore(encoded_file)
+            else:
+                logger.info(f'Encoding genome "{self.name}" into "{encoded_file}"...')
+                encoded = SequenceStore.build(
+                    ((seq_id, self.fasta.read(seq_id, lookup_table=lookup_table)) for seq_id, _ in self.fasta.records()),
+                    encoded_file
+                )
+                self.build_prefix_sums(encoded, int(lookup_table.max()), prefix_file)
+            prefix = np.load(prefix_file, mmap_mode='r')
+            # 每条序列的前缀和比序列多一个 0，起始位置依次后移
+            starts = {item.id: item.offset + i for i, item in enumerate(encoded.index.values())}
+            self.encoded[digest] = encoded
+            self.prefix_sums[digest] = (prefix, starts)
+            return True
+
+    @staticmethod
+    def build_prefix_sums(encoded: SequenceStore, max_value: int, prefix_file: str) -> None:
+        max_length = max((length for _, length in encoded.records()), default=0)
+        dtype = np.uint32 if max_value * max_length < 2**32 else np.uint64
+        with atomic_path(prefix_file, suffix='.npy') as tmp_file:
+            prefix = np.lib.format.open_memmap(tmp_file, mode='w+', dtype=dtype, shape=(len(encoded.bases) + len(encoded),))
+            for i, item in enumerate(encoded.index.values()):
+                start = item.offset + i
+                prefix[start] = 0
+                np.cumsum(encoded[item.id], dtype=dtype, out=prefix[start+1:start+1+item.length])
+            prefix.flush()
+            del prefix
+
+    def rotate_window_values(self, digest: str, seq_id: str, window: int, window_apply_method: Literal['sum', 'mean']) -> np.ndarray:
+        '''The window values on the whole sequence, the same as `IterableSequenceNumRotateCalculation.rotate_on_whole_sequence_`.
+        '''
+        key = (digest, seq_id, window, window_apply_method)
+        with self.lock:
+            if key in self.window_values:
+                self.window_values.move_to_end(key)
+                return self.window_values[key]
+            prefix, starts = self.prefix_sums[digest]
+        start = starts[seq_id]
+        seq_prefix = prefix[start:start + self.encoded[digest].index[seq_id].length + 1]
+        if len(seq_prefix) - 1 < window:
+            return np.zeros(0, dtype=np.float64)
+        values = (seq_prefix[window:] - seq_prefix[:-window]).astype(np.float64)
+        if window_apply_method == 'mean':
+            values /= window
+        with self.lock:
+            self.window_values[key] = values
+            self.window_values_bytes += values.nbytes
+            while self.window_values_bytes > self.cache_bytes and len(self.window_values) > 1:
+                self.window_values_bytes -= self.window_values.popitem(last=False)[1].nbytes
+        return values
+
+    def close(self) -> None:
+        for encoded in self.encoded.values():
+            encoded.close()
+        self.encoded.clear()
+        self.prefix_sums.clear()
+        self.window_values.clear()
+        self.fasta.close()
+
+class residentGenomeFinder(findIdealGCContentSegmentsonFasta):
+    def __init__(self, genome: residentGenome, **kwargs):
+        '''A GC finder over a genome kept open by the server, the window values come from its prefix sums.
+        '''
+        self.genome = genome
+        super().__init__(fasta_file=genome.fasta_file, **kwargs)
+
+    def open_word_file(self, fasta_file: str) -> IndexedFasta|SequenceStore:
+        return self.genome.fasta
+
+    def close_word_file(self):
+        pass
+
+    def load_numeric_file(self):
+        super().load_numeric_file()
+        self.resident = self.genome.load(self.lookup_table, self.word_dict_digest)
+        if self.resident:
+            self.seq_loader = self.genome.encoded[self.word_dict_digest].__getitem__
+
+    def load_rotate_window_values(self, seq_id: str) -> Optional[np.ndarray]:
+        if not self.resident:
+            return None
+        return self.genome.rotate_window_values(self.word_dict_digest, seq_id, self.window, self.window_apply_method)
+
+    def find_in_memory(self, human_readable_idx: bool = True) -> List[selectedWindowExtended]:
+        with MemorySink(selectedWindowExtended) as sink:
+            findIdealWordRatioInSlidingWindow.find(self, human_readable_idx=human_readable_idx, sink=sink)
+        return sink.items
+
+def run_query(genome: residentGenome, query: serverQuery) -> List[selectedWindowExtended]:
+    finder = residentGenomeFinder(
+        genome=genome,
+        window=query.window,
+        top=query.top,
+        ideal_value=query.value,
+        beyond_word_dict_value=query.beyond,
+        dict_mode=query.dict_mode,
+        window_apply_method=query.method,
+        filter_out_partial_overlapped_result=query.filter,
+        sort_chunk_size=query.sort_chunk_size,
+        precision=query.precision,
+        intermediate_compression=None if query.compression == 'none' else query.compression,
+        memory_limit=query.memory_limit,
+        skip_gaps=query.skip_gaps,
+        skip_soft_masked=query.skip_soft_masked,
+        include_bed=query.include_bed,
+        exclude_bed=query.exclude_bed,
+    )
+    return finder.find_in_memory(human_readable_idx=query.human_readable)
@@ -0,0 +1,184 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Any, Optional
+import urllib.request
+import urllib.error
+import click
+from .gccontent import TRACK_NAMES
+import json
+import pathlib
+import time
+import logging
+logger = logging.getLogger(__name__)
+
+# 客户端只依赖标准库和 click，查找相关的模块在服务端启动时才导入
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+class queryHandler(BaseHTTPRequestHandler):
+    '''`GET /genomes` lists the genomes, `POST /query` runs a query given as a json object with the long options
+    of `gccontent` (window, value, top, dict, method, filter, beyond, precision, human_readable) and `genome`.
+    '''
+    server: 'genomeServer'
+
+    def respond(self, status: int, content: Any) -> None:
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/genomes':
+            self.respond(200, {name: genome.fasta_file for name, genome in self.server.genomes.items()})
+        else:
+            self.respond(404, {'error': f'Unknown path "{self.path}".'})
+
+    def do_POST(self):
+        if self.path != '/query':
+            self.respond(404, {'error': f'Unknown path "{self.path}".'})
+            return
+        try:
+            params = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            start = time.time()
+            results = self.server.query(params)
+            self.respond(200, {'results': [i.model_dump() for i in results], 'seconds': round(time.time() - start, 3)})
+        except KeyError as e:
+            self.respond(404, {'error': str(e.args[0])})
+        except ValueError as e:
+            # json 和 pydantic 的校验错误都是 ValueError
+            self.respond(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception('Query failed.')
+            self.respond(500, {'error': f'{type(e).__name__}: {e}'})
+
+    def log_message(self, format, *args):
+        logger.info(f'{self.address_string()} - {format % args}')
+
+class genomeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, genomes: Dict[str, Any]):
+        super().__init__(address, queryHandler)
+        self.genomes = genomes
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def query(self, params: Dict[str, Any]) -> List[Any]:
+        from .resident import serverQuery, run_query
+        query = serverQuery(**params)
+        name = query.genome
+        if name is None:
+            if len(self.genomes) != 1:
+                raise ValueError(f'The server keeps {len(self.genomes)} genomes, "genome" must be given.')
+            name = next(iter(self.genomes))
+        if name not in self.genomes:
+            raise KeyError(f'Unknown genome "{name}".')
+        return run_query(self.genomes[name], query)
+
+    def server_close(self):
+        super().server_close()
+        for genome in self.genomes.values():
+            genome.close()
+
+def create_server(
+    genomes: Dict[str, str],
+    host: str = '127.0.0.1',
+    port: int = 8765,
+    work_dir: str = '.gccontent_server',
+    threads: Optional[int] = None,
+    preload: List[str] = ()
+) -> genomeServer:
+    '''Open the genomes (name -> fasta file) and encode them for the `preload` dict modes, so the first
+    queries are already warm. Port 0 picks a free port, see `genomeServer.url`.
+    '''
+    from .resident import residentGenome, residentGenomeFinder
+    from ..encoding import build_lookup_table
+    from ..finder.file.wordratio import word_dict_digest
+    resident = {name: residentGenome(name, fasta_file, work_dir, threads=threads) for name, fasta_file in genomes.items()}
+    for genome in resident.values():
+        for dict_mode in preload:
+            word_dict = residentGenomeFinder.word_dict_of(dict_mode)
+            genome.load(build_lookup_table(word_dict), word_dict_digest(word_dict))
+    return genomeServer((host, port), resident)
+
+def request(url: str, path: str, params: Optional[Dict[str, Any]] = None, timeout: float = 3600) -> Any:
+    '''Send a request to the server, a json body makes it a POST request.'''
+    data = None if params is None else json.dumps(params).encode()
+    req = urllib.request.Request(url.rstrip('/') + path, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read()).get('error', str(e)))
+
+def query_server(url: str, params: Dict[str, Any], timeout: float = 3600) -> List[Dict[str, Any]]:
+    return request(url, '/query', params, timeout)['results']
+
+@click.group()
+def cli():
+    '''Keep genomes open in a local server and query them without loading them again.'''
+
+@cli.command()
+@click.option('-g', '--genome', 'genomes', required=True, multiple=True, help='The genome fasta file to keep, "NAME=FASTA" or "FASTA" (named by the file name), can be given more than once.')
+@click.option('-H', '--host', 'host', required=False, default='127.0.0.1', help='The host to listen on, default="127.0.0.1"')
+@click.option('-P', '--port', 'port', required=False, default=8765, type=int, help='The port to listen on, default=8765')
+@click.option('-w', '--work-dir', 'work_dir', required=False, default='.gccontent_server', help='The directory of the encoded genomes and their prefix sums, default=".gccontent_server"')
+@click.option('-d', '--preload', 'preload', required=False, multiple=True, default=['GC'], type=click.Choice(TRACK_NAMES), help='The dict modes to encode when the server starts, default="GC"')
+@click.option('-j', '--threads', 'threads', required=False, default=None, type=int, help='The number of threads to decompress a gzip/bgzip fasta, default is the number of CPUs')
+def serve(genomes, host, port, work_dir, preload, threads):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    named = {}
+    for genome in genomes:
+        name, _, fasta_file = genome.rpartition('=')
+        named[name or pathlib.Path(fasta_file).name] = fasta_file
+    server = create_server(named, host=host, port=port, work_dir=work_dir, threads=threads, preload=preload)
+    logger.info(f'Serving {", ".join(named)} on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+@cli.command()
+@click.option('-u', '--url', 'url', required=False, default=DEFAULT_URL, help=f'The server url, default="{DEFAULT_URL}"')
+@click.option('-g', '--genome', 'genome', required=False, default=None, help='The genome name, can be left out when the server keeps only one genome.')
+@click.option('-w', '--window', 'window', required=True, type=int, help='The sliding window size.')
+@click.option('-t', '--top', 'top', required=False, type=int, default=10, help='The top number of the ideal segments.default=10')
+@click.option('-v', '--value', 'value', required=True, type=float, help='The ideal value of the sliding window.')
+@click.option('-o', '--output', 'output_file', required=False, default=None, help='The output file, the format is decided by the extension like gccontent, default is printing jsonl.')
+@click.option('-d', '--dict', 'dict_mode', required=False, default='GC',type=click.Choice(TRACK_NAMES), help=f'The dictionary mode (track). It can be {", ".join(TRACK_NAMES)}, default="GC".')
+@click.option('-m', '--method', 'method', required=False, default='mean',type=click.Choice(['mean', 'sum']), help='The method to apply the sliding window. It can be "sum" or "mean", default="mean".')
+@click.option('-f', '--filter', 'filter', required=False, default=True,type=click.BOOL, help='Whether to filter out the partial overlapped result, default=True')
+@click.option('-b', '--beyond', 'beyond', required=False, default=0, type=float, help='The value of the beyond word dict, default=0')
+@click.option('-r', '--human-readable', 'human_readable', required=False, default=True, type=click.BOOL, help='Whether to use human readable index, default=True')
+@click.option('-p', '--precision','precision', required=False, default=4, type=int, help='The precision of the calculated score, default=4')
+def query(url, genome, output_file, **params):
+    try:
+        results = query_server(url, {'genome': genome, 'dict': params.pop('dict_mode'), **params})
+    except (RuntimeError, urllib.error.URLError) as e:
+        raise click.ClickException(str(e))
+    if output_file is None:
+        for item in results:
+            click.echo(json.dumps(item))
+        return
+    from ..io.sink import open_result_sink
+    from ..finder.file.wordratio import selectedWindowExtended
+    with open_result_sink(selectedWindowExtended, output_file) as sink:
+        for item in results:
+            sink.add_line(item)
+
+@cli.command()
+@click.option('-u', '--url', 'url', required=False, default=DEFAULT_URL, help=f'The server url, default="{DEFAULT_URL}"')
+def genomes(url):
+    try:
+        for name, fasta_file in request(url, '/genomes').items():
+            click.echo(f'{name}\t{fasta_file}')
+    except (RuntimeError, urllib.error.URLError) as e:
+        raise click.ClickException(str(e))
+
+if __name__ == '__main__':
+    cli()
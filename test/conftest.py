@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+
+@pytest.fixture
+def work_dir(tmp_path, monkeypatch):
+    '''Run the test in its own temporary directory, the `.rotate_windows` caches and the results stay out of the repo.'''
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def create_fasta():
+    '''A factory writing random FASTA files, the sequences of a test are the same on every run.
+
+    `create_fasta(file_path, seq_num, ...)` returns `{seq_id: seq}`:
+        length: `(min, max)` of the random lengths, or a list of lengths to choose from
+        alphabet: the bases to choose from, e.g. with `N` gaps and soft-masked lower case
+        prefix: the sequence ids are `<prefix><i>`, the window caches are keyed by them
+        description: written after the id in the header line
+        width: the line width, or a list of widths to choose one for every sequence
+        newline, trailing_newline: the line ending, and whether the file ends with one
+        make_seq: `make_seq(rand)` builds a sequence from the random generator instead of `length` and `alphabet`
+    '''
+    rand = random.Random(0)
+
+    def create(
+        file_path, seq_num=10, length=(100, 1500), alphabet='ACGTNacgt', prefix='contig', description='',
+        width=60, newline='\n', trailing_newline=True, make_seq=None
+    ):
+        seqs, lines = {}, []
+        for i in range(seq_num):
+            if make_seq is not None:
+                seq = make_seq(rand)
+            else:
+                seq_length = rand.randint(*length) if isinstance(length, tuple) else rand.choice(length)
+                seq = ''.join(rand.choice(alphabet) for _ in range(seq_length))
+            line_width = width if isinstance(width, int) else rand.choice(width)
+            seqs[f'{prefix}{i}'] = seq
+            lines.append(f'>{prefix}{i}{description}')
+            lines.extend(seq[j:j+line_width] for j in range(0, len(seq), line_width))
+        with open(file_path, 'w', newline='') as f:
+            f.write(newline.join(lines) + (newline if trailing_newline else ''))
+        return seqs
+
+    return create
@@ -0,0 +1,86 @@
+import sys
+sys.path.append('.')
+import os
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.tool.batch import run_batch
+from src.find_ideal_segments.tool.jobs import batchJobSummary
+from src.find_ideal_segments.finder.file import manifest
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+JOBS = '''
+input: test.fa
+output_dir: out
+defaults:
+  top: 15
+jobs:
+  - {name: gc30, window: 30, value: 0.6}
+  - {name: gc50, window: 50, value: 0.4, output: gc50.tsv}
+  - {name: at30, window: 30, value: 0.7, dict: AT}
+  - {name: half, window: 30, value: 0.6, dict: {G: 0.5, C: 0.5}}
+'''
+
+def read_result(save_path):
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result]
+
+def test_batch_matches_single_runs(work_dir, create_fasta):
+    create_fasta('test.fa')
+    with open('jobs.yaml', 'w') as f:
+        f.write(JOBS)
+    result = CliRunner().invoke(run_batch, ['-j', 'jobs.yaml', '-n', '2', '-c', 'False'])
+    assert result.exit_code == 0, result.output
+    with JsonlIO(batchJobSummary, 'out/summary.jsonl') as summary:
+        summaries = {i.name: i for i in summary}
+    assert list(summaries) == ['gc30', 'gc50', 'at30', 'half']
+    assert all(i.error is None and i.results > 0 for i in summaries.values())
+    assert summaries['gc50'].output == 'out/gc50.tsv'
+    # -c False 不留下索引、清单、每轮结果和窗口值缓存
+    assert sorted(os.listdir('.')) == ['jobs.yaml', 'out', 'test.fa']
+    assert sorted(os.listdir('out')) == ['at30.jsonl', 'gc30.jsonl', 'gc50.tsv', 'half.jsonl', 'summary.jsonl']
+    # 批量任务之间不会共用不同窗口和字典的缓存，与单独运行的结果一致
+    for name, window, value, dict_mode in [('gc30', 30, 0.6, 'GC'), ('at30', 30, 0.7, 'AT'), ('half', 30, 0.6, {'G': 0.5, 'C': 0.5})]:
+        save_path, _ = findIdealGCContentSegmentsonFasta(
+            fasta_file='test.fa', window=window, top=15, ideal_value=value, dict_mode=dict_mode
+        ).find(save_path=f'{name}.jsonl')
+        assert read_result(save_path) == read_result(summaries[name].output)
+    assert not [i for i in os.listdir('out') if i.startswith('.batch_')]
+
+def test_batch_json_list(work_dir, create_fasta):
+    create_fasta('test.fa', seq_num=3)
+    with open('jobs.json', 'w') as f:
+        json.dump([{'window': 20, 'value': 0.5}, {'window': 20, 'value': 0.5, 'top': 'x'}], f)
+    result = CliRunner().invoke(run_batch, ['-j', 'jobs.json', '-i', 'test.fa', '-c', 'False'])
+    # 任务参数不合法时在运行之前报错
+    assert result.exit_code != 0
+    with open('jobs.json', 'w') as f:
+        json.dump([{'window': 20, 'value': 0.5}, {'window': 20, 'value': 0.5, 'output': 'missing/result.jsonl'}], f)
+    result = CliRunner().invoke(run_batch, ['-j', 'jobs.json', '-i', 'test.fa', '-c', 'False'])
+    # 单个任务失败时其它任务仍然完成，并在汇总中记录错误
+    assert result.exit_code == 1 and 'job1' in result.output
+    with JsonlIO(batchJobSummary, 'summary.jsonl') as summary:
+        summaries = list(summary)
+    assert summaries[0].error is None and summaries[1].error is not None
+    assert not os.path.exists('test.fa.fai')
+
+def test_batch_hashes_once(work_dir, create_fasta, monkeypatch):
+    seqs = create_fasta('test.fa', seq_num=4)
+    record_digest_of = manifest.record_digest_of
+    hashed = []
+    monkeypatch.setattr(manifest, 'record_digest_of', lambda source, seq_id, length: hashed.append(seq_id) or record_digest_of(source, seq_id, length))
+    with open('jobs.yaml', 'w') as f:
+        f.write(JOBS)
+    # 不缓存时没有可以复用的内容，不计算序列摘要
+    assert CliRunner().invoke(run_batch, ['-j', 'jobs.yaml', '-c', 'False']).exit_code == 0
+    assert hashed == [] and not os.path.exists('test.fa.manifest.json')
+    # 缓存时整个批量任务只计算一次摘要
+    assert CliRunner().invoke(run_batch, ['-j', 'jobs.yaml']).exit_code == 0
+    assert hashed == list(seqs) and os.path.exists('test.fa.manifest.json')
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
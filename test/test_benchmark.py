@@ -0,0 +1,57 @@
+import sys
+sys.path.append('.')
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import genomeSpec, synthetic_fasta, write_fasta
+from benchmarks.run import STAGES, benchmarkResult, compare, run_benchmark
+from src.find_ideal_segments.io.faidx import IndexedFasta
+
+SPEC = genomeSpec(size=300_000, contigs=5, gc=0.45, region_length=10_000, n_fraction=0.05, gap_length=2_000, soft_mask_fraction=0.2, seed=1)
+
+def test_synthetic_fasta():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        digests = []
+        for name in ['a.fa', 'b.fa']:
+            with open(write_fasta(SPEC, f'{temp_dir}/{name}'), 'rb') as f:
+                digests.append(hashlib.sha1(f.read()).hexdigest())
+        assert digests[0] == digests[1]
+        fasta_file = synthetic_fasta(SPEC, temp_dir)
+        assert synthetic_fasta(SPEC, temp_dir) == fasta_file
+        fasta = IndexedFasta(fasta_file)
+        records = dict(fasta.records())
+        assert len(records) == SPEC.contigs and sum(records.values()) == SPEC.size
+        bases = np.concatenate([fasta.read(seq_id) for seq_id in records])
+        fasta.close()
+        upper = bases & 0xDF
+        n_fraction = np.mean(upper == ord('N'))
+        assert abs(n_fraction - SPEC.n_fraction) < 0.03
+        acgt = upper[upper != ord('N')]
+        assert abs(np.isin(acgt, np.frombuffer(b'GC', dtype=np.uint8)).mean() - SPEC.gc) < 0.02
+        assert 0.1 < np.mean((bases >= ord('a')) & (bases != ord('N'))) < 0.3
+        with open(write_fasta(genomeSpec(size=1000, seed=2), f'{temp_dir}/c.fa'), 'rb') as f:
+            assert hashlib.sha1(f.read()).hexdigest() != digests[0]
+
+def test_run_benchmark():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = run_benchmark('tiny', SPEC, temp_dir, window=100, top=20)
+        assert os.getcwd() == cwd
+        assert list(result.stages) == STAGES
+        assert all(seconds >= 0 for seconds in result.stages.values())
+
+def test_compare():
+    result = benchmarkResult(profile='1M', spec=SPEC, stages={'index': 1.0, 'encoding': 0.06, 'decypher': 2.0}, environment={})
+    baseline = {'1M': {'index': 0.5, 'encoding': 0.03, 'decypher': 1.9}}
+    # encoding 慢了一倍但只差 0.03 秒，decypher 在容差内
+    regressions = compare(result, baseline, tolerance=0.25, min_seconds=0.05)
+    assert len(regressions) == 1 and regressions[0].startswith('1M/index')
+    assert compare(result, {}) == []
+
+if __name__ == '__main__':
+    test_synthetic_fasta()
+    test_run_benchmark()
+    test_compare()
@@ -0,0 +1,110 @@
+import sys
+sys.path.append('.')
+import os
+import gzip
+import random
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from src.find_ideal_segments.io.bgzf import BgzfArray, is_bgzf, is_gzip, read_gzi
+from src.find_ideal_segments.io.fasta import FastaReader
+from src.find_ideal_segments.io.faidx import IndexedFasta
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+random.seed(0)
+
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+def bgzip(data: bytes, file_path: str, block_size: int = 1000):
+    '''与 bgzip 相同的分块 gzip，测试环境中不一定安装了 htslib'''
+    with open(file_path, 'wb') as f:
+        for i in range(0, len(data), block_size):
+            block = data[i:i+block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            deflated = compressor.compress(block) + compressor.flush()
+            header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+            f.write(header + struct.pack('<H', len(header) + 2 + len(deflated) + 8 - 1))
+            f.write(deflated + struct.pack('<II', zlib.crc32(block), len(block)))
+        f.write(BGZF_EOF)
+
+def test_bgzf_array(tmp_path):
+    data = bytes(random.getrandbits(8) for _ in range(12345))
+    file_path = os.path.join(tmp_path, 'data.gz')
+    bgzip(data, file_path)
+    assert is_gzip(file_path) and is_bgzf(file_path)
+    with gzip.open(file_path, 'rb') as f:
+        assert f.read() == data
+    for threads in [1, 4]:
+        with BgzfArray(file_path, threads=threads, cache_blocks=2) as arr:
+            assert len(arr) == len(data)
+            assert arr[5] == data[5] and arr[-1] == data[-1]
+            for _ in range(50):
+                start = random.randint(0, len(data))
+                end = random.randint(start, len(data) + 10)
+                assert arr[start:end].tobytes() == data[start:end]
+            stream = arr.stream()
+            assert stream.read(999) + stream.read(5000) + stream.read() == data
+    # 生成的 .gzi 不包含第一个块，也不包含结尾的空块
+    offsets = read_gzi(file_path + '.gzi')
+    assert offsets[:, 1].tolist() == list(range(0, len(data), 1000))
+
+def test_compressed_fasta_reader(tmp_path, create_fasta):
+    fasta_file = os.path.join(tmp_path, 'test.fa')
+    create_fasta(fasta_file, 6, length=(0, 3000), prefix='chr', description=' description')
+    with open(fasta_file, 'rb') as f:
+        content = f.read()
+    with gzip.open(fasta_file + '.gz', 'wb') as f:
+        f.write(content)
+    bgzip(content, os.path.join(tmp_path, 'bgzip.fa.gz'))
+    expected = [(i, arr.tolist()) for i, arr in FastaReader(fasta_file)]
+    for file in [fasta_file + '.gz', os.path.join(tmp_path, 'bgzip.fa.gz')]:
+        assert [(i, arr.tolist()) for i, arr in FastaReader(file, buffer_size=777)] == expected
+    # 只顺序读取时不写出索引
+    assert not os.path.exists(os.path.join(tmp_path, 'bgzip.fa.gz.gzi'))
+    with IndexedFasta(os.path.join(tmp_path, 'bgzip.fa.gz'), threads=2) as fasta:
+        assert sorted(fasta.built_files) == sorted([fasta.fai_path, fasta.data.gzi_path])
+        for seq_id, arr in expected:
+            assert fasta[seq_id].tolist() == arr
+            start = random.randint(0, len(arr))
+            end = random.randint(start, len(arr))
+            assert fasta.read(seq_id, start, end, chunk_lines=3).tolist() == arr[start:end]
+    try:
+        IndexedFasta(fasta_file + '.gz')
+        assert False, 'plain gzip can not be accessed randomly'
+    except ValueError:
+        pass
+
+def test_gc_finder_on_compressed_fasta(work_dir, create_fasta):
+    create_fasta('test.fa', 8, length=(100, 3000), prefix='chr', description=' description')
+    with open('test.fa', 'rb') as f:
+        content = f.read()
+    with gzip.open('gzip.fa.gz', 'wb') as f:
+        f.write(content)
+    bgzip(content, 'bgzip.fa.gz')
+    results = []
+    for fasta_file in ['test.fa', 'gzip.fa.gz', 'bgzip.fa.gz']:
+        save_path, length = findIdealGCContentSegmentsonFasta(
+            fasta_file=fasta_file, window=20, top=20, ideal_value=0.6, cache=False, threads=2
+        ).find(save_path=f'{fasta_file}.result.jsonl')
+        with JsonlIO(selectedWindowExtended, save_path) as result:
+            results.append([i.model_dump() for i in result])
+        assert length == len(results[-1])
+    assert results[0] and results[0] == results[1] == results[2]
+    # cache=False 时删除本次生成的索引、解压文件和窗口值缓存
+    assert not os.listdir('.rotate_windows')
+    assert sorted(os.listdir('.')) == sorted(['test.fa', 'gzip.fa.gz', 'bgzip.fa.gz', '.rotate_windows'] +
+        [f'{i}.result.jsonl' for i in ['test.fa', 'gzip.fa.gz', 'bgzip.fa.gz']])
+    # cache=True 时保留解压后的序列，之后直接复用
+    findIdealGCContentSegmentsonFasta(fasta_file='gzip.fa.gz', window=20, top=20, ideal_value=0.6).find(save_path='again.jsonl')
+    assert os.path.exists('gzip.fa.bases')
+    finder = findIdealGCContentSegmentsonFasta(fasta_file='gzip.fa.gz', window=20, top=20, ideal_value=0.6)
+    assert finder.built_files == []
+    finder.find(save_path='again.jsonl')
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
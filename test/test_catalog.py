@@ -0,0 +1,115 @@
+import sys
+sys.path.append('.')
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments import catalog
+from src.find_ideal_segments.catalog import WindowValueSummary, load_window_value_summary, summary_file_of
+from src.find_ideal_segments.core import SequenceNumRotateCalculation
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.catalog import run_catalog
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+rng = np.random.default_rng(0)
+
+def biased_seq(rand):
+    # 每条序列的 GC 含量不同，远离理想值的序列可以由目录跳过
+    gc = rand.uniform(0.2, 0.8)
+    return ''.join(rand.choice('GC') if rand.random() < gc else rand.choice('AT') for _ in range(rand.randint(500, 3000)))
+
+def gapped_biased_seq(rand):
+    seq = biased_seq(rand)
+    return 'N' * rand.randint(0, 300) + seq[:len(seq)//2] + 'N' * rand.randint(1, 300) + seq[len(seq)//2:]
+
+class countingFinder(findIdealGCContentSegmentsonFasta):
+    scanned = 0
+
+    def iter_next_windows(self, seqs):
+        for i in super().iter_next_windows(seqs):
+            self.scanned += 1
+            yield i
+
+class uncatalogedFinder(countingFinder):
+    def diff_lower_bound(self, seq):
+        return float('-inf')
+
+def test_summary():
+    catalog.CATALOG_BUILD_CHUNK_SIZE, chunk_size = 1000, catalog.CATALOG_BUILD_CHUNK_SIZE
+    try:
+        values = rng.beta(2, 5, 10_000)
+        summary = WindowValueSummary.build(values, bins=64)
+    finally:
+        catalog.CATALOG_BUILD_CHUNK_SIZE = chunk_size
+    assert summary.count == len(values) and summary.min == values.min() and summary.max == values.max()
+    assert (summary.counts == np.histogram(values, bins=64)[0]).all()
+    assert abs(summary.mean - values.mean()) < 1e-12
+    width = (values.max() - values.min()) / 64
+    for q in [0, 0.1, 0.5, 0.9, 1]:
+        assert abs(summary.quantile(q) - np.quantile(values, q)) <= width
+    for ideal_value in [-0.5, 0.1, 0.3, 0.99, 2]:
+        diffs = np.abs(values - ideal_value)
+        assert diffs.min() - width <= summary.diff_lower_bound(ideal_value) <= diffs.min()
+    # 直方图中间的空区间也给出下界
+    values = np.concatenate([rng.uniform(0, 0.2, 100), rng.uniform(0.8, 1, 100)])
+    assert WindowValueSummary.build(values, bins=10).diff_lower_bound(0.5) >= 0.2
+    assert WindowValueSummary.build(np.zeros(0)).diff_lower_bound(0.5) == float('inf')
+    assert WindowValueSummary.build(np.full(10, 0.5)).diff_lower_bound(0.2) == 0.3
+
+def test_save_load(tmp_path):
+    cache_file = f'{tmp_path}/seq_10_mean.npy'
+    assert load_window_value_summary(cache_file) is None
+    values = rng.random(1000)
+    np.save(cache_file, values)
+    summary = load_window_value_summary(cache_file)
+    assert os.path.exists(summary_file_of(cache_file)) and summary_file_of(cache_file).endswith('seq_10_mean.summary.npz')
+    loaded = WindowValueSummary.load(summary_file_of(cache_file))
+    assert (loaded.count, loaded.min, loaded.max, loaded.sum) == (summary.count, summary.min, summary.max, summary.sum)
+    assert (loaded.counts == summary.counts).all()
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: summary.save(summary_file_of(cache_file)), range(32)))
+    assert WindowValueSummary.load(summary_file_of(cache_file)).count == summary.count and not [i for i in os.listdir(tmp_path) if i.endswith('.tmp')]
+
+def test_skip_sequences(work_dir, create_fasta):
+    create_fasta('test.fa', 8, make_seq=biased_seq)
+    # 窗口值缓存按序列 id 保存，两个文件的序列 id 不同
+    create_fasta('gaps.fa', 8, prefix='gapped', make_seq=gapped_biased_seq)
+    scanned = [0, 0]
+    for ideal_value in [0, 0.25, 0.5, 0.7]:
+        for kwargs in [dict(fasta_file='test.fa'), dict(fasta_file='test.fa', filter_out_partial_overlapped_result=False), dict(fasta_file='gaps.fa', skip_gaps=True)]:
+            results = []
+            for finder_class in [uncatalogedFinder, countingFinder, countingFinder]:
+                finder = finder_class(window=50, top=30, ideal_value=ideal_value, **kwargs)
+                save_path, _ = finder.find(save_path='result.jsonl')
+                with JsonlIO(selectedWindowExtended, save_path) as result:
+                    results.append(([i.model_dump() for i in result], finder.scanned))
+            assert results[0][0] == results[1][0] == results[2][0]
+            assert results[1][1] <= results[0][1]
+            scanned[0] += results[0][1]
+            scanned[1] += results[1][1]
+    assert scanned[1] < scanned[0]
+
+def test_catalog_cli(work_dir, create_fasta):
+    seqs = create_fasta('test.fa', 8, make_seq=biased_seq)
+    runner = CliRunner()
+    result = runner.invoke(run_catalog, ['-i', 'test.fa', '-w', '50', '-q', '0.5', '-o', 'catalog.tsv'])
+    assert result.exit_code == 0, result.output
+    with open('catalog.tsv') as f:
+        header, *rows = [line.rstrip('\n').split('\t') for line in f]
+    assert header == ['seq_id', 'windows', 'min', 'q0.5', 'max', 'mean']
+    assert [i[0] for i in rows] == list(seqs)
+    for seq_id, windows, low, median, high, mean in rows:
+        arr = np.array([1 if i in 'GC' else 0 for i in seqs[seq_id]], dtype=np.float64)
+        values = SequenceNumRotateCalculation(50, arr).rotate_on_window(arr)
+        assert int(windows) == len(values)
+        assert float(low) == round(values.min(), 4) and float(high) == round(values.max(), 4)
+        assert abs(float(mean) - values.mean()) < 1e-4 and abs(float(median) - np.median(values)) <= 0.02
+    # 目录已经保存，再次运行时不需要重新计算
+    assert runner.invoke(run_catalog, ['-i', 'test.fa', '-w', '50']).output.count('\n') == len(seqs) + 1
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
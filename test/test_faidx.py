@@ -0,0 +1,96 @@
+import sys
+sys.path.append('.')
+import os
+import random
+
+import numpy as np
+import pytest
+
+from src.find_ideal_segments.io.fasta import FastaReader
+from src.find_ideal_segments.io.faidx import IndexedFasta, UnevenLineError, build_fai, read_fai, write_fai
+from src.find_ideal_segments.io.seqstore import SequenceStore
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.encoding import build_lookup_table
+
+random.seed(0)
+
+# 长度正好在行宽附近、行宽各不相同的序列
+INDEXED_FASTA = dict(length=[0, 1, 59, 60, 61, 1234], prefix='chr', description=' some description', width=[1, 7, 60])
+
+def test_fai_format(tmp_path):
+    fasta_file = os.path.join(tmp_path, 'test.fa')
+    with open(fasta_file, 'w') as f:
+        f.write('>one\nACGTA\nCG\n>two desc\nACG\n')
+    with IndexedFasta(fasta_file) as fasta:
+        assert fasta.index_built
+    with open(fasta_file + '.fai') as f:
+        assert f.read() == 'one\t7\t5\t5\t6\ntwo\t3\t24\t3\t4\n'
+    # 索引比 FASTA 新时直接复用
+    assert not IndexedFasta(fasta_file).index_built
+
+def test_indexed_read_matches_reader(tmp_path, create_fasta):
+    lut = build_lookup_table({'G': 1, 'C': 1, 'g': 1, 'c': 1})
+    for newline, trailing_newline in [('\n', True), ('\r\n', True), ('\n', False)]:
+        fasta_file = os.path.join(tmp_path, 'test.fa')
+        create_fasta(fasta_file, 6, newline=newline, trailing_newline=trailing_newline, **INDEXED_FASTA)
+        expected = dict(FastaReader(fasta_file))
+        with IndexedFasta(fasta_file, fai_path=os.path.join(tmp_path, f'{len(newline)}{trailing_newline}.fai')) as fasta:
+            assert [i for i, _ in fasta.records()] == list(expected.keys())
+            for seq_id, arr in expected.items():
+                assert np.array_equal(fasta[seq_id], arr)
+                assert np.array_equal(fasta.read(seq_id, lookup_table=lut), lut[arr])
+                body, tail = fasta.lines_view(seq_id)
+                assert np.array_equal(np.concatenate((body.reshape(-1), tail)), arr)
+                for _ in range(20):
+                    start = random.randint(0, len(arr))
+                    end = random.randint(start, len(arr))
+                    assert fasta.fetch(seq_id, start, end) == arr[start:end].tobytes().decode()
+                    assert np.array_equal(fasta.read(seq_id, start, end, lookup_table=lut, chunk_lines=3), lut[arr[start:end]])
+
+def test_irregular_lines(tmp_path):
+    fasta_file = os.path.join(tmp_path, 'test.fa')
+    for content in ['>a\nACGT\nAC\nACGT\n', '>a\nACG\nACGT\n']:
+        with open(fasta_file, 'w') as f:
+            f.write(content)
+        try:
+            build_fai(fasta_file)
+            assert False, 'irregular line width should be rejected'
+        except UnevenLineError:
+            pass
+        # 不能建立索引的 FASTA 转换为碱基文件读取
+        fasta, built_files = findIdealGCContentSegmentsonFasta.open_fasta(fasta_file)
+        with fasta:
+            assert isinstance(fasta, SequenceStore) and fasta['a'].tobytes() == content.replace('>a', '').replace('\n', '').encode()
+        assert not os.path.exists(fasta_file + '.fai') and all(os.path.exists(i) for i in built_files)
+        for i in built_files:
+            os.remove(i)
+
+def test_duplicate_names(tmp_path):
+    fasta_file = os.path.join(tmp_path, 'test.fa')
+    with open(fasta_file, 'w') as f:
+        f.write('>a\nAC\n>a\nGT\n>b\nAA\n')
+    with pytest.raises(ValueError, match='"a"'):
+        build_fai(fasta_file)
+    with pytest.raises(ValueError, match='"a"'):
+        IndexedFasta(fasta_file)
+    assert not os.path.exists(fasta_file + '.fai')
+    with pytest.raises(ValueError, match='"a"'):
+        SequenceStore.build(FastaReader(fasta_file), os.path.join(tmp_path, 'test.bases'))
+
+def test_interrupted_writes_leave_no_files(tmp_path):
+    def records():
+        yield 'a', np.frombuffer(b'ACGT', dtype=np.uint8)
+        raise KeyboardInterrupt
+    bases_file = os.path.join(tmp_path, 'test.bases')
+    with pytest.raises(KeyboardInterrupt):
+        SequenceStore.build(records(), bases_file)
+    fasta_file = os.path.join(tmp_path, 'test.fa')
+    with open(fasta_file, 'w') as f:
+        f.write('>a\nACGT\n')
+    with pytest.raises(AttributeError):
+        write_fai(build_fai(fasta_file) + [None], fasta_file + '.fai')
+    # 不完整的序列文件和索引（包括临时文件）都不会留下
+    assert os.listdir(tmp_path) == ['test.fa']
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,55 @@
+import sys
+sys.path.append('.')
+import os
+
+import numpy as np
+import pytest
+from Bio import SeqIO
+
+from src.find_ideal_segments.io.fasta import FastaReader
+from src.find_ideal_segments.encoding import build_lookup_table, encode
+from src.find_ideal_segments.finder.file.wordratio import findIdealWordRatioInSlidingWindow, selectedWindowExtended
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.io.jsonl import JsonlIO
+
+# 折行长度不一、包含大小写和空序列的 FASTA 文件
+IRREGULAR_FASTA = dict(alphabet='ACGTNacgtn', prefix='seq_', description=' description', width=[50, 60, 80, 10_000])
+
+def test_reader_matches_biopython(tmp_path, create_fasta):
+    for newline in ['\n', '\r\n']:
+        fasta_file = os.path.join(tmp_path, 'test.fasta')
+        create_fasta(fasta_file, 5, length=(0, 3000), newline=newline, **IRREGULAR_FASTA)
+        expected = [(i.id, str(i.seq)) for i in SeqIO.parse(fasta_file, 'fasta')]
+        for buffer_size in [7, 1000, 1 << 20]:
+            records = [(seq_id, arr.tobytes().decode()) for seq_id, arr in FastaReader(fasta_file, buffer_size=buffer_size)]
+            assert records == expected
+        upper = [arr.tobytes().decode() for _, arr in FastaReader(fasta_file, uppercase=True)]
+        assert upper == [seq.upper() for _, seq in expected]
+
+def test_lookup_table():
+    lut = build_lookup_table({'G': 1, 'C': 1}, 0)
+    assert lut.dtype == np.uint8
+    assert encode(np.frombuffer(b'GATCg', dtype=np.uint8), lut).tolist() == [1, 0, 0, 1, 0]
+    assert build_lookup_table({'G': 0.5}, 0).dtype == np.float64
+
+def test_gc_finder_matches_jsonl_finder(work_dir, create_fasta):
+    create_fasta('test.fasta', 8, length=(100, 3000), **IRREGULAR_FASTA)
+    findIdealGCContentSegmentsonFasta.fasta2jsonl('test.fasta', 'words.jsonl')
+    expected_finder = findIdealWordRatioInSlidingWindow(
+        word_file='words.jsonl',
+        word_dict={'G': 1, 'C': 1, 'g': 1, 'c': 1},
+        window=20,
+        top=20,
+        ideal_value=0.6,
+    )
+    expected = [i.model_dump() for i in expected_finder.find(save_path='expected.jsonl')]
+    # 两次查找共用同一个窗口缓存，窗口大小相同时缓存内容一致
+    save_path, length = findIdealGCContentSegmentsonFasta(
+        fasta_file='test.fasta', window=20, top=20, ideal_value=0.6, cache=False
+    ).find(save_path='result.jsonl')
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        assert [i.model_dump() for i in result] == expected
+    assert length == len(expected) and not os.path.exists('test.fasta.fai')
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,61 @@
+import sys
+sys.path.append('.')
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.io.gaps import GapIndex, find_runs, gap_mask_table
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+def gapped_seq(rand):
+    parts = []
+    for _ in range(rand.randint(2, 5)):
+        # 大小写按整段生成，小写段为软屏蔽区域
+        case = rand.choice([str.upper, str.lower])
+        parts.append(case(''.join(rand.choice('ACGT') for _ in range(rand.randint(50, 400)))))
+        parts.append(rand.choice('Nn') * rand.randint(1, 300))
+    return ''.join(parts)
+
+def find(fasta_file, save_path, **kwargs):
+    save_path, _ = findIdealGCContentSegmentsonFasta(fasta_file=fasta_file, window=30, top=40, **kwargs).find(save_path=save_path)
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result]
+
+def test_find_runs():
+    bases = np.frombuffer(b'NNACnnGTaaNcgN', dtype=np.uint8)
+    assert find_runs(bases, gap_mask_table()).tolist() == [[0, 2], [4, 6], [10, 11], [13, 14]]
+    assert find_runs(bases, gap_mask_table(gaps=False, soft_masked=True)).tolist() == [[4, 6], [8, 10], [11, 13]]
+    assert find_runs(bases, gap_mask_table(soft_masked=True)).tolist() == [[0, 2], [4, 6], [8, 14]]
+    assert find_runs(np.zeros(0, dtype=np.uint8), gap_mask_table()).shape == (0, 2)
+
+def test_gap_index_roundtrip(tmp_path):
+    index = GapIndex.build([('a', np.frombuffer(b'NNAN', dtype=np.uint8)), ('b', np.frombuffer(b'ACGT', dtype=np.uint8))], gap_mask_table())
+    index.save(f'{tmp_path}/test.npz')
+    loaded = GapIndex.load(f'{tmp_path}/test.npz')
+    assert list(loaded) == ['a', 'b']
+    assert loaded['a'].tolist() == [[0, 2], [3, 4]] and loaded['b'].shape == (0, 2)
+    assert loaded.total_length() == 3
+    # 同一进程的多个线程同时保存同一个索引
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: index.save(f'{tmp_path}/test.npz'), range(64)))
+    assert GapIndex.load(f'{tmp_path}/test.npz')['a'].tolist() == [[0, 2], [3, 4]] and os.listdir(tmp_path) == ['test.npz']
+
+def test_skip_gaps(work_dir, create_fasta):
+    create_fasta('test.fa', make_seq=gapped_seq)
+    # 不跳过时，全部由 N 组成的窗口得分为 0
+    assert any('N' in i['seq'].upper() for i in find('test.fa', 'all.jsonl', ideal_value=0))
+    skipped = find('test.fa', 'gaps.jsonl', ideal_value=0, skip_gaps=True)
+    assert len(skipped) == 40 and not any('N' in i['seq'].upper() for i in skipped)
+    assert os.path.exists('test.fa.gaps.npz')
+    # 再次运行时读取已有的索引，多进程的结果相同
+    assert find('test.fa', 'gaps.2.jsonl', ideal_value=0, skip_gaps=True, workers=2) == skipped
+    masked = find('test.fa', 'masked.jsonl', ideal_value=0.5, skip_gaps=True, skip_soft_masked=True, cache=False)
+    assert masked and all(i['seq'].isupper() and 'N' not in i['seq'] for i in masked)
+    assert not os.path.exists('test.fa.gaps_softmasked.npz')
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
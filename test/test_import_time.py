@@ -0,0 +1,56 @@
+import sys
+sys.path.append('.')
+import os
+import subprocess
+import tomllib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = {'numpy', 'pandas', 'pydantic', 'Bio'}
+# 导入命令行模块的时间预算（微秒），只加载 click 时远小于该值
+STARTUP_BUDGET_US = 300_000
+
+with open(os.path.join(ROOT, 'pyproject.toml'), 'rb') as f:
+    # {命令: (模块, 函数)}，安装后的包名对应源码树中的 src.<包名>
+    SCRIPTS = {
+        name: tuple(f'src.{target}'.split(':'))
+        for name, target in tomllib.load(f)['project']['scripts'].items()
+    }
+
+def import_times(code: str):
+    '''用 `python -X importtime` 运行代码，返回 {模块名: 累计导入时间（微秒）}'''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times, result.stdout
+
+@pytest.mark.parametrize('script', SCRIPTS)
+def test_cli_startup(script):
+    module, _ = SCRIPTS[script]
+    times, _ = import_times(f'import {module}')
+    assert not HEAVY_MODULES & set(times), HEAVY_MODULES & set(times)
+    assert times[module] < STARTUP_BUDGET_US, f'{module} takes {times[module]}us to import'
+
+@pytest.mark.parametrize('script', SCRIPTS)
+def test_help_without_heavy_imports(script):
+    module, command = SCRIPTS[script]
+    times, output = import_times(
+        f'from {module} import {command}\n'
+        f'{command}(["--help"], standalone_mode=False)'
+    )
+    assert 'Usage:' in output
+    assert not HEAVY_MODULES & set(times), HEAVY_MODULES & set(times)
+
+def test_lazy_finder():
+    from src.find_ideal_segments.tool import gccontent
+    from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+    assert gccontent.findIdealGCContentSegmentsonFasta is findIdealGCContentSegmentsonFasta
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,122 @@
+import sys
+sys.path.append('.')
+import json
+import os
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.intervals import IntervalIndex, index_file_of
+from src.find_ideal_segments.io.sink import open_result_sink
+from src.find_ideal_segments.tool.index import cli, parse_region
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+rng = np.random.default_rng(0)
+
+def random_windows(num=300):
+    items = []
+    for _ in range(num):
+        start = int(rng.integers(1, 5000))
+        length = int(rng.integers(1, 200))
+        items.append(selectedWindowExtended(
+            seq_id=f'chr{rng.integers(0, 3)}', start_idx=start, end_idx=start + length - 1, consecutive_window_length=1,
+            score=0.5, score_diff=float(rng.random()), seq='A' * length
+        ))
+    return items
+
+def brute_overlap(items, seq_id, start, end):
+    # 结果使用 human readable index，即从 1 开始的闭区间
+    return sorted(i for i, w in enumerate(items) if w.seq_id == seq_id and w.start_idx - 1 < end and w.end_idx > start)
+
+def brute_nearest(items, seq_id, start, end):
+    distances = {i: max(w.start_idx - 1 - end, start - w.end_idx, 0) for i, w in enumerate(items) if w.seq_id == seq_id}
+    if brute_overlap(items, seq_id, start, end):
+        return 0, brute_overlap(items, seq_id, start, end)
+    if not distances:
+        return None, []
+    distance = min(distances.values())
+    return distance, sorted(i for i, d in distances.items() if d == distance)
+
+def test_queries():
+    items = random_windows()
+    index = IntervalIndex.build([i.seq_id for i in items], [i.start_idx for i in items], [i.end_idx for i in items])
+    for _ in range(500):
+        seq_id = f'chr{rng.integers(0, 4)}'
+        start = int(rng.integers(0, 5300))
+        end = start + int(rng.integers(1, 300))
+        assert sorted(index.overlap(seq_id, start, end).tolist()) == brute_overlap(items, seq_id, start, end)
+        distance, rows = index.nearest(seq_id, start, end)
+        assert (distance, rows.tolist()) == brute_nearest(items, seq_id, start, end)
+
+def test_result_files(tmp_path):
+    items = random_windows(100)
+    for name in ['result.jsonl', 'result.jsonl.gz', 'result.tsv', 'result.csv', 'result.npz']:
+        result_file = os.path.join(tmp_path, name)
+        with open_result_sink(selectedWindowExtended, result_file, batch_size=7) as sink:
+            for item in items:
+                sink.add_line(item)
+        IntervalIndex.from_result_file(result_file).save(index_file_of(result_file))
+        index = IntervalIndex.load(index_file_of(result_file))
+        assert len(index) == len(items) and bool(len(index.line_offsets)) == (name in ['result.jsonl', 'result.tsv', 'result.csv'])
+        rows = index.overlap('chr1', 1000, 3000)
+        assert sorted(rows.tolist()) == brute_overlap(items, 'chr1', 1000, 3000)
+        for row, item in zip(rows, index.read_rows(result_file, rows)):
+            assert selectedWindowExtended(**item) == items[row]
+        # 结果文件重新生成后索引失效
+        with open_result_sink(selectedWindowExtended, result_file) as sink:
+            for item in items[:50]:
+                sink.add_line(item)
+        assert not index.is_fresh(result_file)
+        try:
+            index.read_rows(result_file, rows)
+            assert False, 'a stale index should be rejected'
+        except ValueError:
+            pass
+
+def test_parse_region():
+    assert parse_region('chr1:1,001-2,000') == ('chr1', 1000, 2000)
+    assert parse_region('chr1:1500') == ('chr1', 1499, 1500)
+    assert parse_region('HLA:A:10-20') == ('HLA:A', 9, 20)
+    assert parse_region('chr2')[:2] == ('chr2', 0)
+    for text in ['chr1:0-10', 'chr1:20-10']:
+        try:
+            parse_region(text)
+            assert False, f'{text} should be rejected'
+        except ValueError:
+            pass
+
+def test_finder_index_cli(work_dir, create_fasta):
+    create_fasta('test.fa', 3, length=(500, 2000), alphabet='ACGT', prefix='indexed')
+    for human_readable_idx in [True, False]:
+        save_path, length = findIdealGCContentSegmentsonFasta(fasta_file='test.fa', window=30, top=20, ideal_value=0.5).find(
+            save_path='result.jsonl', human_readable_idx=human_readable_idx, index=True
+        )
+        index = IntervalIndex.load(index_file_of(save_path))
+        assert len(index) == length and index.one_based == human_readable_idx
+    runner = CliRunner()
+    with open('regions.bed', 'w') as f:
+        f.write('track name=test\nindexed0\t0\t300\n')
+    result = runner.invoke(cli, ['query', '-i', 'result.jsonl', '-R', 'indexed1:1-2000', '-b', 'regions.bed'])
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(i) for i in result.output.splitlines()]
+    with open('result.jsonl') as f:
+        items = [json.loads(i) for i in f]
+    # 最后一次运行的结果从 0 开始
+    expected = [i for i in items if i['seq_id'] == 'indexed1'] + [i for i in items if i['seq_id'] == 'indexed0' and i['start_idx'] < 300]
+    assert sorted((i['query'], i['seq_id'], i['start_idx']) for i in lines) == \
+        sorted(('indexed1:1-2000' if i['seq_id'] == 'indexed1' else 'indexed0:1-300', i['seq_id'], i['start_idx']) for i in expected)
+    result = runner.invoke(cli, ['query', '-i', 'result.jsonl', '-R', 'indexed2:1', '-n'])
+    assert result.exit_code == 0 and all('distance' in json.loads(i) for i in result.output.splitlines())
+    assert runner.invoke(cli, ['build', '-i', 'result.jsonl', '-r', 'false']).exit_code == 0
+    with open('result.jsonl', 'a') as f:
+        f.write(json.dumps(items[0]) + '\n')
+    result = runner.invoke(cli, ['query', '-i', 'result.jsonl', '-R', 'indexed1'])
+    assert result.exit_code != 0 and 'gccontent-index build' in result.output
+    # 不建立索引时删除之前运行留下的索引
+    findIdealGCContentSegmentsonFasta(fasta_file='test.fa', window=30, top=20, ideal_value=0.5).find(save_path='result.jsonl', index=False)
+    assert not os.path.exists(index_file_of('result.jsonl'))
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
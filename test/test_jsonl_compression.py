@@ -0,0 +1,59 @@
+import sys
+sys.path.append('.')
+import os
+import gzip
+import lzma
+
+import pytest
+from pydantic import BaseModel
+from src.find_ideal_segments.io.jsonl import JsonlIO, detect_compression, strip_jsonl_suffix
+
+class User(BaseModel):
+    name: str
+    age: int
+
+def test_detect_compression():
+    assert detect_compression('a.jsonl') is None
+    assert detect_compression('a.jsonl.gz') == 'gzip'
+    assert detect_compression('a.jsonl.XZ') == 'lzma'
+    assert strip_jsonl_suffix('a/b.jsonl.gz') == 'a/b'
+    assert strip_jsonl_suffix('a/b.jsonl') == 'a/b'
+
+def test_compressed_round_trip(tmp_path):
+    for suffix, opener in [('.jsonl.gz', gzip.open), ('.jsonl.xz', lzma.open)]:
+        file_path = os.path.join(tmp_path, f'users{suffix}')
+        with JsonlIO(User, file_path=file_path) as jio:
+            jio.empty()
+            for i in range(100):
+                jio.add_line(User(name=f'user-{i}', age=(i * 37) % 100))
+            assert len(jio) == 100
+            # 读取之后继续追加，会写入新的压缩段
+            jio.add_line(User(name='last', age=-1))
+            assert len(jio) == 101
+
+            jio.sort_by_fileds(('age', 'name'), chunk_size=7)
+            ages = [i.age for i in jio]
+            assert ages == sorted(ages)
+
+            jio.head(10)
+            assert len(jio) == 10
+            assert next(iter(jio)).name == 'last'
+
+        # 文件确实是压缩格式，可以直接用标准库解压
+        with opener(file_path, 'rt') as f:
+            assert len(f.readlines()) == 10
+
+def test_compressed_temp_file():
+    with JsonlIO(User, compression='gzip') as jio:
+        assert jio.file_path.endswith('.jsonl.gz')
+        jio.add_line({'name': 'Alice', 'age': 30})
+        jio.add_line({'name': 'Bob', 'age': 25})
+        assert [i.name for i in jio] == ['Alice', 'Bob']
+        jio.add_line({'name': 'Charlie', 'age': 35})
+        jio.flush()
+        # flush 之后其它 JsonlIO 可以读取到完整的压缩流
+        with JsonlIO(User, file_path=jio.file_path, mode='r') as reader:
+            assert len(reader) == 3
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,89 @@
+import sys
+sys.path.append('.')
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import BaseModel
+from src.find_ideal_segments.io.jsonl import JsonlIO, JsonlCursor
+
+class User(BaseModel):
+    name: str
+    age: int
+
+seq_random = random.Random(0)
+
+def random_users(num):
+    # 不同长度和多字节字符的行，切分点会落在行中间
+    return [User(name=f'用户-{i}-' + 'x' * seq_random.randint(0, 300), age=seq_random.randint(0, 100)) for i in range(num)]
+
+def test_nested_iteration():
+    users = random_users(50)
+    with JsonlIO(User) as jio:
+        for user in users:
+            jio.add_line(user)
+        pairs = [(a.name, b.name) for a in jio for b in jio]
+        assert pairs == [(a.name, b.name) for a in users for b in users]
+        # 迭代不影响追加和行数
+        for i, user in enumerate(jio):
+            if i == 0:
+                jio.add_line(User(name='appended', age=-1))
+        assert len(jio) == 51 and list(jio)[-1].name == 'appended'
+
+def test_split():
+    users = random_users(1000)
+    with JsonlIO(User) as jio:
+        for user in users:
+            jio.add_line(user)
+        for parts in [1, 2, 3, 7, 64, 5000]:
+            cursors = jio.split(parts)
+            assert len(cursors) == parts
+            assert [i for cursor in cursors for i in cursor] == users
+            offsets = [offset for cursor in cursors for offset, _ in cursor.lines()]
+            assert offsets == sorted(set(offsets)) and offsets[0] == 0
+        with ThreadPoolExecutor(8) as executor:
+            chunks = list(executor.map(list, jio.split(8)))
+        assert [i for chunk in chunks for i in chunk] == users
+        cursor = JsonlCursor(jio, block_size=7)
+        assert list(cursor) == users
+
+def test_threaded_append():
+    with JsonlIO(User) as jio:
+        def write(thread):
+            for i in range(200):
+                jio.add_line(User(name=f'{thread}-{i}', age=thread))
+                if i % 50 == 0:
+                    assert all(isinstance(j, User) for j in jio)
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(write, range(4)))
+        users = list(jio)
+        assert len(users) == len(jio) == 800
+        for thread in range(4):
+            assert [i.name for i in users if i.age == thread] == [f'{thread}-{i}' for i in range(200)]
+
+def test_compressed_cursor(tmp_path):
+    users = random_users(100)
+    file_path = os.path.join(tmp_path, 'users.jsonl.gz')
+    with JsonlIO(User, file_path=file_path) as jio:
+        jio.empty()
+        for user in users:
+            jio.add_line(user)
+        assert [(a.name, b.name) for a in jio for b in list(jio)[:2]] == [(a.name, b.name) for a in users for b in users[:2]]
+        assert len(jio.split(4)) == 1 and list(jio.split(4)[0]) == users
+        try:
+            jio.cursor(10)
+            assert False, 'a compressed file can not be read from a byte offset'
+        except ValueError:
+            pass
+    file_path = os.path.join(tmp_path, 'users.jsonl')
+    with JsonlIO(User, file_path=file_path) as jio:
+        for user in users:
+            jio.add_line(user)
+        assert list(jio) == users
+        # head 替换文件之后，游标读取新的文件
+        jio.head(10)
+        assert list(jio) == users[:10]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,79 @@
+import sys
+sys.path.append('.')
+import random
+
+import numpy as np
+import pytest
+
+from src.find_ideal_segments import encoding
+from src.find_ideal_segments.encoding import KmerLookupTable, build_lookup_table
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import findIdealWordRatioInSlidingWindow, wordSeqItem, selectedWindowExtended
+
+random.seed(0)
+WINDOW = 20
+
+def naive_encode(seq, word_dict, k, beyond=0):
+    word_dict = {w.upper(): v for w, v in word_dict.items()}
+    return [word_dict.get(seq[i:i+k].upper(), beyond) if i + k <= len(seq) else beyond for i in range(len(seq))]
+
+def create_sequences(seq_num=10):
+    return {f'contig{i}': ''.join(random.choice('ACGTNacgt') for _ in range(random.randint(50, 800))) for i in range(seq_num)}
+
+def load(save_path):
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result]
+
+def test_rolling_codes():
+    chunk_size = encoding.KMER_CHUNK_SIZE
+    try:
+        for kmer_chunk_size in [chunk_size, 7]:
+            # 很小的块检查块边界上的 k-mer
+            encoding.KMER_CHUNK_SIZE = kmer_chunk_size
+            for k in [2, 3, 5]:
+                word_dict = {''.join(random.choice('ACGT') for _ in range(k)): random.randint(1, 9) for _ in range(10)}
+                table = build_lookup_table(word_dict, 0)
+                assert isinstance(table, KmerLookupTable) and table.k == k and table.dtype == np.uint8
+                for seq in create_sequences(5).values():
+                    bases = np.frombuffer(seq.encode(), dtype=np.uint8)
+                    assert table[bases].tolist() == naive_encode(seq, word_dict, k)
+    finally:
+        encoding.KMER_CHUNK_SIZE = chunk_size
+    assert build_lookup_table({'CG': 0.5}, 0.1).dtype == np.float64
+    assert KmerLookupTable({'CG': 1})[np.zeros(0, dtype=np.uint8)].shape == (0,)
+    for word_dict in [{'CG': 1, 'C': 1}, {'CN': 1}, {'A' * 13: 1}]:
+        try:
+            build_lookup_table(word_dict)
+            assert False, f'{word_dict} should be rejected'
+        except ValueError:
+            pass
+
+def test_cpg_finder(work_dir, create_fasta):
+    sequences = create_fasta('test.fa', length=(50, 800))
+    with JsonlIO(wordSeqItem, file_path='test.jsonl') as jio:
+        jio.empty()
+        for seq_id, seq in sequences.items():
+            jio.add_line(wordSeqItem(id=seq_id, seq=seq))
+
+    save_path, _ = findIdealGCContentSegmentsonFasta('test.fa', window=WINDOW, top=20, ideal_value=0.2, dict_mode='CpG').find(save_path='fasta.jsonl')
+    fasta_result = load(save_path)
+    assert len(fasta_result) == 20
+    # 窗口的值为以窗口内每个位置开始的 CG 的比例
+    encoded = {seq_id: naive_encode(seq, {'CG': 1}, 2) for seq_id, seq in sequences.items()}
+    for item in fasta_result:
+        values = encoded[item['seq_id']][item['start_idx'] - 1:item['start_idx'] - 1 + WINDOW]
+        assert abs(item['score'] - sum(values) / WINDOW) < 1e-4
+    best = min(abs(sum(values[i:i+WINDOW]) / WINDOW - 0.2) for values in encoded.values() for i in range(len(values) - WINDOW + 1))
+    assert abs(fasta_result[0]['score_diff'] - best) < 1e-4
+    save_path, _ = findIdealGCContentSegmentsonFasta('test.fa', window=WINDOW, top=20, ideal_value=0.2, dict_mode='CpG', workers=2).find(save_path='parallel.jsonl')
+    assert load(save_path) == fasta_result
+
+    # 逐行的 jsonl 路径得到相同的结果
+    finder = findIdealWordRatioInSlidingWindow('test.jsonl', {'cg': 1}, window=WINDOW, top=20, ideal_value=0.2)
+    result = finder.find(save_path='jsonl.jsonl')
+    key = lambda i: (i['seq_id'], i['start_idx'], i['end_idx'], i['score'])
+    assert [key(i.model_dump()) for i in result] == [key(i) for i in fasta_result]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
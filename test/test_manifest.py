@@ -0,0 +1,87 @@
+import sys
+sys.path.append('.')
+import glob
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.io.atomic import atomic_path
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.manifest import runManifest, recordEntry, save_record_results, load_record_results
+from src.find_ideal_segments.finder.file.base import iterResult
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+seq_random = random.Random(0)
+
+def random_seq(length):
+    return ''.join(seq_random.choice('ACGTacgtN') for _ in range(length))
+
+def write_fasta(create_fasta, file_path, seqs):
+    patched = iter(seqs.values())
+    create_fasta(file_path, len(seqs), prefix='patched', make_seq=lambda _: next(patched))
+    # 同一秒内改写的文件也要有不同的修改时间
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+class countingFinder(findIdealGCContentSegmentsonFasta):
+    def scan_next_windows(self, seqs):
+        self.scanned = getattr(self, 'scanned', [])
+        for seq, score, windows in super().scan_next_windows(seqs):
+            self.scanned.append(seq.id)
+            yield seq, score, windows
+
+def run(**kwargs):
+    finder = countingFinder(fasta_file='test.fa', window=40, ideal_value=0.55, **{'top': 30, **kwargs})
+    save_path, _ = finder.find(save_path=f'result_{seq_random.random()}.jsonl')
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result], getattr(finder, 'scanned', []), finder
+
+def test_manifest(work_dir, create_fasta):
+    seqs = create_fasta('test.fa', 6, length=(300, 2000), alphabet='ACGTacgtN', prefix='patched')
+    first = runManifest.load(runManifest.manifest_file_of('test.fa'))
+    assert first is None
+    result, scanned, finder = run()
+    manifest = runManifest.load(runManifest.manifest_file_of('test.fa'))
+    assert [i.id for i in manifest.records] == list(seqs) and len(set(finder.record_digests.values())) == len(seqs)
+    assert scanned and os.path.exists(finder.results_file_of())
+    # 没有改变的 fasta 不重新计算摘要，每一轮的结果都从上次的结果中读取
+    assert run()[:2] == (result, [])
+    for kwargs in [dict(top=60), dict(workers=2), dict(filter_out_partial_overlapped_result=False)]:
+        assert run(**kwargs)[0] == run(cache=False, **kwargs)[0]
+    # 修改一条序列后只有它需要重新扫描，它的旧窗口值缓存被删除
+    old_digest = finder.record_digests['patched2']
+    seqs['patched2'] = seqs['patched2'][:100] + random_seq(500) + seqs['patched2'][100:]
+    write_fasta(create_fasta, 'test.fa', seqs)
+    result, scanned, finder = run()
+    assert finder.record_digests['patched2'] != old_digest
+    assert [finder.record_digests[i] for i in seqs if i != 'patched2'] == [i.digest for i in manifest.records if i.id != 'patched2']
+    assert 'patched2' in scanned and len(scanned) < len(seqs)
+    assert not glob.glob(f'.rotate_windows/patched2_*{old_digest}_*')
+    assert result == run(cache=False)[0]
+
+def test_concurrent_saves(tmp_path):
+    # gccontent-server 在同一进程的多个线程中写入同一 fasta 的清单和结果
+    manifest_file = os.path.join(tmp_path, 'test.fa.manifest.json')
+    results_file = os.path.join(tmp_path, 'test.fa.results.jsonl')
+    manifest = runManifest(fasta_size=1, fasta_mtime_ns=1, records=[recordEntry(id='a', length=1, digest='d0')])
+    results = {'a_d0': [iterResult(score=0.5, windows=[(0, 1)])]}
+    def save(_):
+        manifest.save(manifest_file)
+        save_record_results(results_file, results, ['d0'])
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(save, range(64)))
+    assert runManifest.load(manifest_file) == manifest and load_record_results(results_file) == results
+    try:
+        with atomic_path(manifest_file) as tmp_file:
+            with open(tmp_file, 'w') as f:
+                f.write('partial')
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert runManifest.load(manifest_file) == manifest and sorted(os.listdir(tmp_path)) == ['test.fa.manifest.json', 'test.fa.results.jsonl']
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
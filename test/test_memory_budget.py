@@ -0,0 +1,31 @@
+import sys
+sys.path.append('.')
+
+import numpy as np
+import pytest
+
+from benchmarks.memory import STAGES, DEFAULT_BUDGETS, stageBudget, measure_peak, profile_length, check_budgets
+
+LENGTH = 10**6
+
+def test_measure_peak():
+    peaks = []
+    with measure_peak('alloc', 10**6, peaks):
+        arr = np.ones(10**6, dtype=np.float64)
+        del arr
+    assert peaks[0].traced_peak >= 8 * 10**6
+    assert check_budgets(peaks, {'alloc': stageBudget(per_element=8, fixed=1 << 16)}) == []
+    assert len(check_budgets(peaks, {'alloc': stageBudget(per_element=1)})) == 1
+
+def test_stage_budgets(tmp_path):
+    peaks = profile_length(LENGTH, str(tmp_path), window=100, sort_chunk_size=250)
+    assert [i.stage for i in peaks] == STAGES
+    assert check_budgets(peaks, DEFAULT_BUDGETS) == []
+    peaks = {i.stage: i for i in peaks}
+    # numpy 数组作为输入时不复制
+    assert peaks['iterator_init'].traced_peak < 1 << 16
+    # 整条序列的窗口值为 float64
+    assert peaks['rotate_on_window'].traced_peak >= 8 * (LENGTH - 100 + 1)
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
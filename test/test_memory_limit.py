@@ -0,0 +1,86 @@
+import sys
+sys.path.append('.')
+import re
+
+import numpy as np
+import pytest
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.memory import parse_memory_size, plan_memory, BASE_OVERHEAD, MIN_SCAN_CHUNK_SIZE, MIN_SORT_CHUNK_SIZE
+from src.find_ideal_segments.iterator import IterableSequenceNumRotateCalculation
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+def test_parse_memory_size():
+    assert parse_memory_size('1024') == 1024
+    assert parse_memory_size('512M') == 512 << 20
+    assert parse_memory_size('1.5g') == 3 << 29
+    assert parse_memory_size('8GB') == parse_memory_size('8GiB') == 8 << 30
+    assert parse_memory_size(100) == 100
+    try:
+        parse_memory_size('lots')
+        assert False, 'invalid size should be rejected'
+    except ValueError:
+        pass
+
+def test_plan_memory():
+    small = plan_memory(BASE_OVERHEAD + (64 << 20), 10**7, 2, 100, 500)
+    large = plan_memory(BASE_OVERHEAD + (4 << 30), 10**7, 2, 100, 500)
+    assert small.scan_chunk_size < large.scan_chunk_size
+    assert small.sort_chunk_size < large.sort_chunk_size
+    # 小预算放不下整条序列的窗口值，大预算可以
+    assert small.window_cache_resident_bytes < 10**7 * 8 <= large.window_cache_resident_bytes
+    # 多进程时每个进程分到的预算更少
+    assert plan_memory(BASE_OVERHEAD * 4 + (4 << 30), 10**7, 2, 100, 500, processes=4).sort_chunk_size < large.sort_chunk_size
+    for args, kwargs in [((10**7, 2, 100, 500), {}), ((10, 1, 5, 10**6), {}), ((10**7, 2, 100, 500), dict(processes=3, shared_bytes=10**6))]:
+        # 预算放不下整条序列或最小的分块时报错，给出的最小预算可以通过，再小一点则不行
+        try:
+            plan_memory(BASE_OVERHEAD, *args, **kwargs)
+            assert False, 'a budget smaller than the longest sequence should be rejected'
+        except MemoryError as e:
+            needed = int(re.search(r'at least (\d+) bytes', str(e)).group(1))
+        plan = plan_memory(needed, *args, **kwargs)
+        assert plan.scan_chunk_size >= MIN_SCAN_CHUNK_SIZE and plan.sort_chunk_size >= MIN_SORT_CHUNK_SIZE
+        try:
+            plan_memory(needed - (kwargs.get('processes', 1)), *args, **kwargs)
+            assert False, f'{needed} bytes should be the smallest budget'
+        except MemoryError:
+            pass
+    # 很小的基因组在 64M 的预算内可以运行
+    assert plan_memory(64 << 20, 80_000, 2, 100, 500).sort_chunk_size >= MIN_SORT_CHUNK_SIZE
+
+def test_memory_mapped_window_values(work_dir):
+    arr = np.random.default_rng(0).integers(0, 2, 10_000).astype(np.uint8)
+    resident = IterableSequenceNumRotateCalculation(50, arr, cache_id='resident').load_whole_sequence_rotate_window_values()
+    for _ in range(2):
+        # 第一次写入缓存文件，第二次从缓存文件读取
+        mapped = IterableSequenceNumRotateCalculation(50, arr, cache_id='mapped', chunk_size=333, max_resident_bytes=1024).load_whole_sequence_rotate_window_values()
+        assert isinstance(mapped, np.memmap)
+        assert np.array_equal(mapped, resident)
+
+def test_sequence_shorter_than_window(work_dir):
+    # 比窗口短的序列没有窗口，也不会被选中
+    rotator = IterableSequenceNumRotateCalculation(20, np.ones(13, dtype=np.uint8), cache_id='short')
+    assert len(rotator.load_whole_sequence_rotate_window_values()) == 0
+    assert rotator.find_next_ideal_windows(0.5) == (None, [])
+
+def test_memory_limit_keeps_result(work_dir, create_fasta):
+    create_fasta('test.fa', seq_num=20, length=(100, 3000))
+    results = []
+    for memory_limit in [None, '1G', 'tiny']:
+        finder = findIdealGCContentSegmentsonFasta(
+            fasta_file='test.fa', window=40, top=60, ideal_value=0.5,
+            memory_limit=None if memory_limit == 'tiny' else memory_limit
+        )
+        if memory_limit == '1G':
+            assert finder.sort_chunk_size != 10_000_000 and finder.window_cache_resident_bytes is not None
+        elif memory_limit == 'tiny':
+            # 最小的分块，并且窗口值全部以内存映射方式读取
+            finder.scan_chunk_size, finder.sort_chunk_size, finder.window_cache_resident_bytes = 7, 5, 0
+        save_path, _ = finder.find(save_path=f'result.{memory_limit}.jsonl')
+        with JsonlIO(selectedWindowExtended, save_path) as result:
+            results.append([i.model_dump() for i in result])
+    assert len(results[0]) == 60 and results[0] == results[1] == results[2]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
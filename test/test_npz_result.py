@@ -0,0 +1,40 @@
+import sys
+sys.path.append('.')
+import os
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.npz import NpzResultIO
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+from src.find_ideal_segments.tool.gccontent import run_tool
+
+def test_npz_round_trip(tmp_path):
+    items = [
+        selectedWindowExtended(seq_id=f'chr{i%3}', start_idx=i, end_idx=i+10, consecutive_window_length=1, score=0.5, score_diff=i/100, seq='GC'*i)
+        for i in range(11)
+    ]
+    # seq 缺省为 None
+    items[4] = selectedWindowExtended(**items[4].model_dump(exclude={'seq'}))
+    file_path = os.path.join(tmp_path, 'result.npz')
+    with NpzResultIO(selectedWindowExtended, file_path, mode='w', chunk_size=4) as npz:
+        for item in items:
+            npz.add_line(item)
+    with NpzResultIO(selectedWindowExtended, file_path) as npz:
+        assert len(npz) == len(items)
+        assert list(npz) == items
+        df = npz.to_dataframe()
+        assert list(df['seq_id']) == [i.seq_id for i in items]
+        assert list(df['score_diff']) == [i.score_diff for i in items]
+        assert df['seq'].isna()[4] and df['seq'][3] == 'GCGCGC'
+
+def test_npz_cli_output(work_dir):
+    with open('example.fasta', 'w') as f:
+        f.write('>example_sequence\nGCGCGCGCGCGCGCGC\nATATATATATATAT\n')
+    result = CliRunner().invoke(run_tool, ['-i', 'example.fasta', '-w', '8', '-t', '1', '-v', '1.0', '-o', 'result.npz', '-c', 'False'])
+    assert result.exit_code == 0
+    with NpzResultIO(selectedWindowExtended, 'result.npz') as npz:
+        item = next(iter(npz))
+        assert item.seq == 'GCGCGCGCGCGCGCGC' and item.score == 1.0
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
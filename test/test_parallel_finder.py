@@ -0,0 +1,30 @@
+import sys
+sys.path.append('.')
+import os
+
+import pytest
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+def shared_memory_segments():
+    return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+def test_parallel_matches_serial(work_dir, create_fasta):
+    segments = shared_memory_segments()
+    create_fasta('test.fa', seq_num=40, length=(50, 2000))
+    results = []
+    for workers in [3, 1]:
+        save_path, length = findIdealGCContentSegmentsonFasta(
+            fasta_file='test.fa', window=30, top=50, ideal_value=0.55, workers=workers
+        ).find(save_path=f'result.{workers}.jsonl')
+        with JsonlIO(selectedWindowExtended, save_path) as result:
+            results.append([i.model_dump() for i in result])
+        assert length == len(results[-1])
+    assert len(results[0]) == 50 and results[0] == results[1]
+    # 所有共享内存块都已经释放
+    assert shared_memory_segments() <= segments
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,86 @@
+import sys
+sys.path.append('.')
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.find_ideal_segments.core import SequenceNumRotateCalculation
+from src.find_ideal_segments.iterator import IterableSequenceNumRotateCalculation, rotate_window_cache_file
+from src.find_ideal_segments.pyramid import WindowValuePyramid, diff_bounds, load_window_value_pyramid, pyramid_file_of
+
+rng = np.random.default_rng(0)
+
+def unpruned_round(rotator, ideal_value):
+    # 不使用金字塔时每个子序列都扫描
+    values = rotator.load_whole_sequence_rotate_window_values()
+    closest_score, result, min_diff = None, [], float('inf')
+    for start, arr in rotator.get_sub_arrs(rotator.arr, rotator.excluding_window_list):
+        length = len(arr) - rotator.window + 1
+        score, windows = SequenceNumRotateCalculation(rotator.window, arr).find_ideal_consecutive_windows(
+            ideal_value=ideal_value, cached_rotate_window_values=values[start:start+length], chunk_size=rotator.chunk_size
+        )
+        if abs(score - ideal_value) < min_diff:
+            closest_score, min_diff, result = score, abs(score - ideal_value), []
+        if abs(score - ideal_value) == min_diff:
+            result.extend((start + i, l) for i, l in windows)
+    return closest_score, result
+
+def test_min_max():
+    for block_size, fanout in [(1, 2), (4, 3), (7, 16)]:
+        values = rng.random(int(rng.integers(1, 3000)))
+        pyramid = WindowValuePyramid.build(values, block_size=block_size, fanout=fanout)
+        assert len(pyramid.levels[-1][0]) == 1
+        for _ in range(200):
+            start, end = sorted(int(i) for i in rng.integers(0, len(values) + 1, 2))
+            if start == end:
+                assert pyramid.min_max(values, start, end) == (np.inf, -np.inf)
+            else:
+                assert pyramid.min_max(values, start, end) == (values[start:end].min(), values[start:end].max())
+
+def test_diff_bounds():
+    assert diff_bounds(0.2, 0.4, 0.3) == (0, 0.09999999999999998)
+    assert diff_bounds(0.5, 0.6, 0.3) == (0.2, 0.2)
+    lower, upper = diff_bounds(0.1, 0.25, 0.3)
+    assert lower == upper == 0.3 - 0.25
+
+def test_save_load(tmp_path):
+    cache_file = f'{tmp_path}/seq_10_mean.npy'
+    values = rng.random(10_000)
+    np.save(cache_file, values)
+    pyramid = load_window_value_pyramid(cache_file, values)
+    path = pyramid_file_of(cache_file)
+    assert path == f'{tmp_path}/seq_10_mean.pyramid.npz' and WindowValuePyramid.is_fresh(path, cache_file)
+    loaded = WindowValuePyramid.load(path)
+    assert loaded.length == pyramid.length and len(loaded.levels) == len(pyramid.levels)
+    assert all((a == c).all() and (b == d).all() for (a, b), (c, d) in zip(loaded.levels, pyramid.levels))
+    # 同一进程的多个线程同时保存同一个金字塔
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: pyramid.save(path), range(32)))
+    assert WindowValuePyramid.load(path).length == pyramid.length and not [i for i in os.listdir(tmp_path) if i.endswith('.tmp')]
+    # 长度不同的旧金字塔会重新生成
+    load_window_value_pyramid(cache_file, values[:5000])
+    assert WindowValuePyramid.load(path).length == 5000
+    # 没有缓存文件时不写入金字塔
+    load_window_value_pyramid(f'{tmp_path}/missing.npy', values)
+    assert not os.path.exists(pyramid_file_of(f'{tmp_path}/missing.npy'))
+
+def test_pruned_rounds(work_dir):
+    # GC 含量沿序列缓慢变化，远离平均值的理想值只出现在少数块中
+    p = np.repeat(rng.uniform(0.3, 0.7, 200), 500)
+    arr = (rng.random(len(p)) < p).astype(np.uint8)
+    for ideal_value in [0.5, 0.68, 0.9]:
+        for chunk_size in [10**6, 997]:
+            found = []
+            rotator = IterableSequenceNumRotateCalculation(100, arr, found, cache_id='seq', chunk_size=chunk_size)
+            expected = IterableSequenceNumRotateCalculation(100, arr, found, cache_id='seq', chunk_size=chunk_size)
+            for _ in range(20):
+                score, windows = rotator.find_next_ideal_windows(ideal_value)
+                assert (score, windows) == unpruned_round(expected, ideal_value)
+                found.append(windows)
+            assert pathlib.Path(pyramid_file_of(rotate_window_cache_file('seq', 100, 'mean'))).exists()
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,91 @@
+import sys
+sys.path.append('.')
+import gzip
+import os
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.bed import iter_bed, read_bed, merge_regions, complement_regions
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+from src.find_ideal_segments.tool.gccontent import run_tool
+
+rng = np.random.default_rng(0)
+
+def write_bed(file_path, regions):
+    with (gzip.open(file_path, 'wt') if file_path.endswith('.gz') else open(file_path, 'w')) as f:
+        f.write('track name=regions\n# comment\n')
+        for seq_id, start, end in regions:
+            f.write(f'{seq_id}\t{start}\t{end}\tname\n')
+
+def run(save_path, **kwargs):
+    finder = findIdealGCContentSegmentsonFasta(fasta_file='test.fa', ideal_value=0.6, cache=False, **kwargs)
+    save_path, _ = finder.find(save_path=save_path, human_readable_idx=False)
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result]
+
+def test_bed(tmp_path):
+    assert merge_regions(np.array([[10, 20], [0, 5], [15, 30], [30, 31], [40, 41]])).tolist() == [[0, 5], [10, 31], [40, 41]]
+    assert merge_regions(np.zeros((0, 2))).shape == (0, 2)
+    assert complement_regions(np.array([[0, 5], [10, 31], [40, 60]]), 50).tolist() == [[5, 10], [31, 40]]
+    assert complement_regions(np.zeros((0, 2), dtype=np.int64), 50).tolist() == [[0, 50]]
+    for name in ['regions.bed', 'regions.bed.gz']:
+        bed_file = os.path.join(tmp_path, name)
+        write_bed(bed_file, [('chr2', 5, 10), ('chr1', 30, 40), ('chr1', 0, 35)])
+        assert list(iter_bed(bed_file)) == [('chr2', 5, 10), ('chr1', 30, 40), ('chr1', 0, 35)]
+        assert {k: v.tolist() for k, v in read_bed(bed_file).items()} == {'chr1': [[0, 40]], 'chr2': [[5, 10]]}
+    bed_file = os.path.join(tmp_path, 'invalid.bed')
+    with open(bed_file, 'w') as f:
+        f.write('chr1\t10\t5\n')
+    try:
+        list(iter_bed(bed_file))
+        assert False, 'the region should be rejected'
+    except ValueError:
+        pass
+
+def test_include_exclude(work_dir, create_fasta):
+    seqs = create_fasta('test.fa', 4, length=(1000, 3000), alphabet='ACGT', prefix='bedseq')
+    include = [('bedseq0', 100, 400), ('bedseq0', 350, 700), ('bedseq2', 0, 50), ('bedseq3', 900, 1000), ('other', 0, 100)]
+    exclude = [('bedseq0', 200, 260), ('bedseq3', 0, 10**6)]
+    write_bed('include.bed', include)
+    write_bed('exclude.bed', exclude)
+    window, top = 30, 20
+    result = run('include.jsonl', window=window, top=top, include_bed='include.bed', exclude_bed='exclude.bed')
+    assert result
+    # bedseq1 没有包含的区域，bedseq3 被整条排除
+    allowed = {'bedseq0': [(100, 200), (260, 700)], 'bedseq2': [(0, 50)]}
+    for item in result:
+        assert any(start <= item['start_idx'] and item['end_idx'] <= end for start, end in allowed[item['seq_id']])
+    # 最好的窗口就是允许的区域中所有窗口里最接近理想值的
+    diffs = []
+    for seq_id, regions in allowed.items():
+        gc = np.array([base in 'GC' for base in seqs[seq_id]], dtype=float)
+        diffs += [abs(round(gc[i:i + window].mean(), 4) - 0.6) for start, end in regions for i in range(start, end - window + 1)]
+    assert abs(result[0]['score_diff'] - min(diffs)) < 1e-9
+    # 排除包含区域的补集与包含区域的结果相同，包含整条序列与不使用 BED 的结果相同
+    write_bed('complement.bed', [('bedseq0', 0, 100), ('bedseq0', 200, 260), ('bedseq0', 700, 10**6), ('bedseq1', 0, 10**6), ('bedseq2', 50, 10**6), ('bedseq3', 0, 10**6)])
+    assert run('complement.jsonl', window=window, top=top, exclude_bed='complement.bed') == result
+    write_bed('whole.bed', [(seq_id, 0, len(seq)) for seq_id, seq in seqs.items()])
+    assert run('whole.jsonl', window=window, top=top, include_bed='whole.bed') == run('plain.jsonl', window=window, top=top)
+    result = CliRunner().invoke(run_tool, ['-i', 'test.fa', '-w', str(window), '-v', '0.6', '-o', 'cli.jsonl', '-k', 'include.bed', '-e', 'exclude.bed', '-r', 'false', '-c', 'false'])
+    assert result.exit_code == 0, result.output
+    with JsonlIO(selectedWindowExtended, 'cli.jsonl') as cli_result:
+        assert [i.model_dump() for i in cli_result] == run('include.jsonl', window=window, top=10, include_bed='include.bed', exclude_bed='exclude.bed')
+
+def test_many_regions(work_dir, create_fasta):
+    seqs = create_fasta('test.fa', 2, length=(200_000, 300_000), alphabet='ACGT', prefix='panel')
+    regions = [(seq_id, int(start), int(start) + int(rng.integers(50, 300))) for seq_id, seq in seqs.items() for start in rng.integers(0, len(seq) - 300, 2000)]
+    write_bed('panel.bed', regions)
+    result = run('panel.jsonl', window=40, top=200, include_bed='panel.bed')
+    assert len(result) == 200
+    merged = read_bed('panel.bed')
+    for item in result:
+        starts, ends = merged[item['seq_id']][:, 0], merged[item['seq_id']][:, 1]
+        i = np.searchsorted(starts, item['start_idx'], side='right') - 1
+        assert i >= 0 and item['end_idx'] <= ends[i]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
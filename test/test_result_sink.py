@@ -0,0 +1,72 @@
+import sys
+sys.path.append('.')
+import os
+import csv
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.sink import open_result_sink, result_file_type, TsvSink
+from src.find_ideal_segments.io.jsonl import JsonlIO, open_jsonl
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+from src.find_ideal_segments.tool.gccontent import run_tool
+
+def test_result_file_type():
+    assert result_file_type('a.csv') == 'csv'
+    assert result_file_type('a.TSV') == 'tsv'
+    assert result_file_type('a.jsonl.gz') == 'jsonl'
+    assert result_file_type('a.json') == 'jsonl'
+
+def test_sinks_write_in_batches(tmp_path):
+    items = [
+        selectedWindowExtended(seq_id='chr1', start_idx=i, end_idx=i+4, consecutive_window_length=1, score=0.5, score_diff=0.0, seq='GCAT')
+        for i in range(7)
+    ]
+    for file_type in ['jsonl', 'csv', 'tsv']:
+        file_path = os.path.join(tmp_path, f'result.{file_type}')
+        with open_result_sink(selectedWindowExtended, file_path, batch_size=3) as sink:
+            for item in items:
+                sink.add_line(item)
+        assert len(sink) == len(items)
+        if file_type == 'jsonl':
+            with JsonlIO(selectedWindowExtended, file_path) as jio:
+                assert list(jio) == items
+        else:
+            with open(file_path, newline='') as f:
+                rows = list(csv.DictReader(f, delimiter=TsvSink.delimiter if file_type == 'tsv' else ','))
+            assert [int(row['start_idx']) for row in rows] == list(range(7))
+            assert rows[0]['seq'] == 'GCAT'
+
+def test_empty_delimited_result(tmp_path):
+    for file_type, delimiter in [('csv', ','), ('tsv', '\t')]:
+        file_path = os.path.join(tmp_path, f'empty.{file_type}')
+        with open_result_sink(selectedWindowExtended, file_path):
+            pass
+        # 没有结果时仍然写出表头
+        with open(file_path, newline='') as f:
+            assert f.read() == delimiter.join(selectedWindowExtended.model_fields) + '\r\n'
+
+def test_compressed_results(tmp_path):
+    item = selectedWindowExtended(seq_id='chr1', start_idx=0, end_idx=4, consecutive_window_length=1, score=0.5, score_diff=0.0, seq='GCAT')
+    for file_name, delimiter in [('result.csv.gz', ','), ('result.tsv.xz', '\t')]:
+        file_path = os.path.join(tmp_path, file_name)
+        with open_result_sink(selectedWindowExtended, file_path) as sink:
+            sink.add_line(item)
+        with open_jsonl(file_path, newline='') as f:
+            rows = list(csv.DictReader(f, delimiter=delimiter))
+        assert len(rows) == 1 and rows[0]['seq'] == 'GCAT'
+    # npz 文件不能再压缩
+    with pytest.raises(ValueError, match='npz'):
+        open_result_sink(selectedWindowExtended, os.path.join(tmp_path, 'result.npz.gz'))
+
+def test_cli_writes_tsv_without_intermediate_jsonl(work_dir):
+    with open('example.fasta', 'w') as f:
+        f.write('>example_sequence\nGCGCGCGCGCGCGCGC\nATATATATATATAT\n')
+    result = CliRunner().invoke(run_tool, ['-i', 'example.fasta', '-w', '8', '-t', '1', '-v', '1.0', '-o', 'result.tsv', '-c', 'False'])
+    assert result.exit_code == 0
+    assert not os.path.exists('result.jsonl')
+    with open('result.tsv', newline='') as f:
+        rows = list(csv.DictReader(f, delimiter='\t'))
+    assert len(rows) == 1 and rows[0]['seq'] == 'GCGCGCGCGCGCGCGC'
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,74 @@
+import sys
+sys.path.append('.')
+import json
+import os
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from src.find_ideal_segments.seqarray import numeric_dtype_of
+from src.find_ideal_segments.finder.file.base import seqItem
+from src.find_ideal_segments.finder.ram.base import windowFinderinBundleSeqs, seqBundle
+from src.find_ideal_segments.finder.ram.wordratio import findIdealWordRatioInSlidingWindow, wordSeqBundle, wordSeqItem
+
+rng = np.random.default_rng(0)
+
+def round_trip(item):
+    return seqItem(**json.loads(item.model_dump_json()))
+
+def test_serialize():
+    for arr in [rng.random(1000), rng.integers(0, 2, 1000).astype(np.uint8), rng.integers(-5, 5, 10), np.zeros(0)]:
+        item = seqItem(id='seq', seq=arr)
+        assert item.seq is arr
+        loaded = round_trip(item)
+        assert loaded.seq.dtype == arr.dtype and (loaded.seq == arr).all()
+        if arr.dtype == np.uint8:
+            # base64 编码比每个数值一个 JSON 数字更紧凑
+            assert len(item.model_dump_json()) < len(json.dumps(arr.tolist()))
+    # 旧格式的列表仍然可以读取
+    item = seqItem(**json.loads('{"id": "seq", "seq": [1, 0, 0.5]}'))
+    assert item.seq.dtype == np.float64 and item.seq.tolist() == [1, 0, 0.5]
+    for seq in [['A', 'C'], np.zeros((2, 2))]:
+        try:
+            seqItem(id='seq', seq=seq)
+            assert False, 'only one dimensional numbers are accepted'
+        except ValidationError:
+            pass
+
+def test_memmap_reference(tmp_path):
+    path = os.path.join(tmp_path, 'seq.npy')
+    arr = rng.random(100_000)
+    np.save(path, arr)
+    mapped = np.load(path, mmap_mode='r')
+    for start, end in [(0, len(arr)), (7, 70_000), (99_990, 100_000)]:
+        item = seqItem(id='seq', seq=mapped[start:end])
+        data = json.loads(item.model_dump_json())['seq']
+        assert data['file'] == path and data['length'] == end - start and 'data' not in data
+        loaded = round_trip(item)
+        assert isinstance(loaded.seq, np.memmap) and (loaded.seq == arr[start:end]).all()
+    # 切片的切片仍然引用文件，运算得到的数组不映射文件，保存原始字节
+    data = json.loads(seqItem(id='seq', seq=mapped[100:][5:10]).model_dump_json())['seq']
+    assert data['offset'] == mapped.offset + 105 * 8 and data['length'] == 5
+    assert 'data' in json.loads(seqItem(id='seq', seq=mapped[:10] * 2).model_dump_json())['seq']
+
+def test_numeric_dtype():
+    assert numeric_dtype_of([1, 0]) == np.uint8
+    assert numeric_dtype_of([300, -1]).kind == 'i' and numeric_dtype_of([300, -1]).itemsize <= 4
+    assert numeric_dtype_of([1, 0.5]) == np.float64
+
+def test_bundle_finder(work_dir):
+    arr = rng.integers(0, 2, 5000)
+    results = []
+    for seq in [arr.tolist(), arr.astype(np.uint8), arr.astype(np.float64)]:
+        finder = windowFinderinBundleSeqs(seqBundle(id='bundle', seqs=[{'id': 'seq', 'seq': seq}]), window=300, top=5, ideal_value=200, window_apply_method='sum')
+        results.append([i.model_dump() for i in finder.find()])
+    assert results[0] == results[1] == results[2]
+    bases = ''.join(rng.choice(list('ACGT'), 5000))
+    finder = findIdealWordRatioInSlidingWindow(wordSeqBundle(id='bundle', seqs=[wordSeqItem(id='seq', seq=bases)]), {'G': 1, 'C': 1}, window=300, top=5, ideal_value=0.6)
+    assert finder.bundle.seqs[0].seq.dtype == np.uint8
+    expected = windowFinderinBundleSeqs(seqBundle(id='bundle', seqs=[{'id': 'seq', 'seq': [int(i in 'GC') for i in bases]}]), window=300, top=5, ideal_value=0.6)
+    assert [i.model_dump() for i in finder.find()] == [i.model_dump() for i in expected.find()]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
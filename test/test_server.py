@@ -0,0 +1,69 @@
+import sys
+sys.path.append('.')
+import os
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.tool.server import create_server, query_server, request, cli
+from src.find_ideal_segments.tool.resident import residentGenome, serverQuery, run_query
+from src.find_ideal_segments.pyramid import WindowValuePyramid
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+def expected_result(fasta_file, save_path, **kwargs):
+    save_path, _ = findIdealGCContentSegmentsonFasta(fasta_file=fasta_file, **kwargs).find(save_path=save_path)
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result]
+
+def test_server_matches_gccontent(work_dir, create_fasta):
+    server = None
+    try:
+        create_fasta('test.fa')
+        server = create_server({'test': 'test.fa'}, port=0, work_dir='server')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        assert request(server.url, '/genomes') == {'test': 'test.fa'}
+
+        for window, value, top, dict_mode in [(20, 0.6, 30, 'GC'), (37, 0.4, 5, 'AT'), (20, 0.6, 30, 'GC'), (15, 0.5, 10, {'G': 0.5, 'C': 0.5})]:
+            start = time.time()
+            results = query_server(server.url, {'window': window, 'value': value, 'top': top, 'dict': dict_mode})
+            # 小基因组上的查询应当在一秒内完成
+            assert time.time() - start < 1
+            expected = expected_result('test.fa', 'expected.jsonl', window=window, top=top, ideal_value=value, dict_mode=dict_mode)
+            assert results == expected and len(results) == top
+        # GC 在启动时编码，AT 在第一次查询时编码，非整数的字典不保存编码结果
+        assert len([i for i in os.listdir('server') if i.endswith('.prefix.npy')]) == 2
+
+        for params, error in [({'window': 20}, 'value'), ({'genome': 'x', 'window': 20, 'value': 0.5}, 'Unknown genome')]:
+            try:
+                query_server(server.url, params)
+                assert False, 'invalid query should be rejected'
+            except RuntimeError as e:
+                assert error in str(e)
+
+        result = CliRunner().invoke(cli, ['query', '-u', server.url, '-w', '20', '-v', '0.6', '-t', '30', '-o', 'client.jsonl'])
+        assert result.exit_code == 0, result.output
+        with JsonlIO(selectedWindowExtended, 'client.jsonl') as client_result:
+            assert [i.model_dump() for i in client_result] == expected_result('test.fa', 'expected.jsonl', window=20, top=30, ideal_value=0.6)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+def test_pyramid_built_once(work_dir, create_fasta, monkeypatch):
+    build = WindowValuePyramid.build
+    built = []
+    create_fasta('test.fa', seq_num=3)
+    genome = residentGenome('test', 'test.fa', 'server')
+    monkeypatch.setattr(WindowValuePyramid, 'build', lambda values, *args, **kwargs: built.append(len(values)) or build(values, *args, **kwargs))
+    # 窗口值来自前缀和，没有缓存文件，每条序列的金字塔在多轮之间只生成一次
+    results = run_query(genome, serverQuery(window=20, value=0.6, top=60))
+    assert results and len(built) == 3
+    assert not os.path.exists('.rotate_windows')
+    genome.close()
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
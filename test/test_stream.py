@@ -0,0 +1,93 @@
+import sys
+sys.path.append('.')
+import numpy as np
+import pytest
+
+from src.find_ideal_segments.core import SequenceNumRotateCalculation
+from src.find_ideal_segments.encoding import build_lookup_table, track_dict
+from src.find_ideal_segments.io.faidx import IndexedFasta
+from src.find_ideal_segments.io.gaps import find_runs, find_runs_in_chunks, gap_mask_table
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.io.stream import StreamedSequence
+from src.find_ideal_segments.iterator import IterableSequenceNumRotateCalculation
+from src.find_ideal_segments.memory import BASE_OVERHEAD, plan_memory
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+rng = np.random.default_rng(0)
+# N 较多的序列，跳过 N 区域时有较多的子序列
+STREAMED_FASTA = dict(length=(200, 3000), alphabet='ACGTNNacgt', prefix='streamed')
+
+def test_streamed_sequence(tmp_path, create_fasta):
+    create_fasta(f'{tmp_path}/test.fa', 6, **STREAMED_FASTA)
+    with IndexedFasta(f'{tmp_path}/test.fa') as fasta:
+        for lookup_table in [None, build_lookup_table(track_dict('GC')), build_lookup_table({'CG': 1, 'GC': 0.5})]:
+            for seq_id, length in fasta.records():
+                whole = fasta.read(seq_id, lookup_table=lookup_table)
+                seq = StreamedSequence(fasta, seq_id, length, lookup_table)
+                assert len(seq) == len(whole) and seq.dtype == whole.dtype
+                assert (np.asarray(seq) == whole).all()
+                for _ in range(20):
+                    start, end = sorted(int(i) for i in rng.integers(0, length + 1, 2))
+                    view = seq[start:end]
+                    assert len(view) == end - start
+                    assert (np.asarray(view) == whole[start:end]).all()
+                    a, b = sorted(int(i) for i in rng.integers(0, len(view) + 1, 2))
+                    assert (view[a:b].astype(np.float64) == whole[start:end][a:b]).all()
+                for chunk_size, overlap in [(1, 0), (97, 9), (length, 3)]:
+                    chunks = list(seq.chunks(chunk_size, overlap))
+                    assert [i for i, _ in chunks] == list(range(0, length, chunk_size))
+                    for i, chunk in chunks:
+                        assert (chunk == whole[i:i + chunk_size + overlap]).all()
+
+def test_find_runs_in_chunks():
+    mask_table = gap_mask_table()
+    for _ in range(50):
+        bases = rng.choice(np.frombuffer(b'ACGTN', dtype=np.uint8), int(rng.integers(0, 500)), p=[0.1, 0.1, 0.1, 0.1, 0.6])
+        bounds = [0, *sorted(int(i) for i in rng.integers(0, len(bases) + 1, 5)), len(bases)]
+        chunks = [bases[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        assert (find_runs_in_chunks(chunks, mask_table) == find_runs(bases, mask_table)).all()
+
+def test_group_runs():
+    calculation = SequenceNumRotateCalculation(5, np.zeros(10))
+    for _ in range(100):
+        indices = np.flatnonzero(rng.random(300) < 0.7)
+        split = sorted(int(i) for i in rng.integers(0, len(indices) + 1, 3))
+        # 分块保存的游程与整体分组的结果相同
+        runs = np.concatenate([calculation._consecutive_runs(i) for i in np.split(indices, split)])
+        for filter_out in [True, False]:
+            assert calculation._group_consecutive_runs(runs, filter_out) == calculation._group_consecutive_indices(indices, filter_out)
+
+def test_plan_streamed():
+    try:
+        plan_memory(BASE_OVERHEAD + (8 << 20), 10**8, 2, 100, 500)
+        assert False, 'the whole record does not fit in the budget'
+    except MemoryError:
+        pass
+    plan = plan_memory(BASE_OVERHEAD + (8 << 20), 10**8, 2, 100, 500, streamed_records=True)
+    assert plan.scan_chunk_size > 0 and plan.window_cache_resident_bytes < 10**8
+
+def test_streamed_scan(work_dir, create_fasta):
+    create_fasta('test.fa', 6, **STREAMED_FASTA)
+    lookup_table = build_lookup_table(track_dict('GC'))
+    with IndexedFasta('test.fa') as fasta:
+        for seq_id, length in fasta.records():
+            for chunk_size in [10**6, 101]:
+                results = []
+                for arr in [fasta.read(seq_id, lookup_table=lookup_table), StreamedSequence(fasta, seq_id, length, lookup_table)]:
+                    found = []
+                    rotator = IterableSequenceNumRotateCalculation(50, arr, found, chunk_size=chunk_size)
+                    for _ in range(5):
+                        found.append(rotator.find_next_ideal_windows(0.45)[1])
+                    results.append(found)
+                assert results[0] == results[1]
+    results = []
+    for workers in [1, 2]:
+        finder = findIdealGCContentSegmentsonFasta(fasta_file='test.fa', window=50, top=20, ideal_value=0.45, skip_gaps=True, workers=workers)
+        save_path, _ = finder.find(save_path=f'result{workers}.jsonl')
+        with JsonlIO(selectedWindowExtended, save_path) as result:
+            results.append([i.model_dump() for i in result])
+    assert results[0] == results[1]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
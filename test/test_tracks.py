@@ -0,0 +1,89 @@
+import sys
+sys.path.append('.')
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.encoding import TRACKS
+from src.find_ideal_segments.tool.gccontent import findIdealGCContentSegmentsonFasta, run_tool, TRACK_NAMES
+from src.find_ideal_segments.finder.file.tracks import findIdealMultiTrackSegmentsonFasta, trackTarget
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+WINDOW = 20
+
+def load(save_path):
+    with JsonlIO(selectedWindowExtended, save_path) as result:
+        return [i.model_dump() for i in result]
+
+def objective(seq, targets):
+    seq = seq.upper()
+    return sum(w * abs(sum(seq.count(b) for b in bases) / len(seq) - v) for bases, v, w in targets)
+
+def test_track_names():
+    assert TRACK_NAMES == list(TRACKS)
+
+def test_named_track(work_dir, create_fasta):
+    create_fasta('test.fa', length=(100, 1000))
+    results = []
+    for dict_mode in ['purine', {'A': 1, 'G': 1, 'a': 1, 'g': 1}]:
+        save_path, _ = findIdealGCContentSegmentsonFasta('test.fa', window=WINDOW, top=30, ideal_value=0.7, dict_mode=dict_mode).find(save_path='result.jsonl')
+        results.append(load(save_path))
+    assert len(results[0]) == 30 and results[0] == results[1]
+
+def test_combined_objective(work_dir, create_fasta):
+    sequences = create_fasta('test.fa', length=(100, 1000))
+    # 只有一个目标时与单轨道查找选出相同的窗口
+    save_path, _ = findIdealGCContentSegmentsonFasta('test.fa', window=WINDOW, top=30, ideal_value=0.6).find(save_path='gc.jsonl')
+    single = findIdealMultiTrackSegmentsonFasta('test.fa', window=WINDOW, top=30, targets=[{'track': 'GC', 'value': 0.6}])
+    save_path, _ = single.find(save_path='single.jsonl')
+    key = lambda i: (i['seq_id'], i['start_idx'], i['end_idx'])
+    assert [key(i) for i in load('gc.jsonl')] == [key(i) for i in load(save_path)]
+
+    targets = [('GC', 0.6, 1), ('AG', 0.3, 2)]
+    finder = findIdealMultiTrackSegmentsonFasta('test.fa', window=WINDOW, top=30, targets=[trackTarget.parse('GC=0.6'), trackTarget.parse('purine=0.3:2')])
+    save_path, _ = finder.find(save_path='combined.jsonl')
+    results = load(save_path)
+    assert len(results) == 30
+    best = min(objective(seq[i:i+WINDOW], targets) for seq in sequences.values() for i in range(len(seq) - WINDOW + 1))
+    assert abs(results[0]['score'] - best) < 1e-4
+    for item in results:
+        assert abs(item['score'] - objective(item['seq'][:WINDOW], targets)) < 1e-4
+
+def test_streamed_objective(work_dir, create_fasta):
+    create_fasta('test.fa', seq_num=3, length=(100, 1000))
+    finder = findIdealMultiTrackSegmentsonFasta('test.fa', window=WINDOW, top=10, targets=[trackTarget.parse('GC=0.6'), trackTarget.parse('CpG=0.05:3')], cache=False)
+    read = finder.word_file.read
+    read_lengths = []
+    def record_read(seq_id, start=0, end=None, **kwargs):
+        arr = read(seq_id, start, end, **kwargs)
+        read_lengths.append(len(arr))
+        return arr
+    finder.word_file.read = record_read
+    for seq_id, length in finder.lengths.items():
+        expected = np.zeros(length - WINDOW + 1)
+        finder.scan_chunk_size = 10**6
+        finder.fill_objective(seq_id, expected)
+        # 分块读取的碱基不超过块大小加上窗口和 k-mer 的重叠，结果与整条读取相同
+        for chunk_size in [WINDOW, 37, 100]:
+            read_lengths.clear()
+            finder.scan_chunk_size = chunk_size
+            values = np.zeros(length - WINDOW + 1)
+            finder.fill_objective(seq_id, values)
+            assert np.allclose(values, expected)
+            assert max(read_lengths) <= chunk_size + WINDOW and len(read_lengths) > 1
+    finder.close_word_file()
+
+def test_target_cli(work_dir, create_fasta):
+    create_fasta('test.fa', length=(100, 1000))
+    result = CliRunner().invoke(run_tool, ['-i', 'test.fa', '-w', str(WINDOW), '-o', 'cli.jsonl', '-T', 'GC=0.6', '-T', 'purine=0.3:2'])
+    assert result.exit_code == 0, result.output
+    save_path, _ = findIdealMultiTrackSegmentsonFasta('test.fa', window=WINDOW, top=10, targets=[
+        {'track': 'GC', 'value': 0.6}, {'track': 'purine', 'value': 0.3, 'weight': 2}
+    ]).find(save_path='api.jsonl')
+    assert load('cli.jsonl') == load(save_path)
+    assert CliRunner().invoke(run_tool, ['-i', 'test.fa', '-w', '20', '-o', 'x.jsonl']).exit_code != 0
+    assert CliRunner().invoke(run_tool, ['-i', 'test.fa', '-w', '20', '-o', 'x.jsonl', '-T', 'GC']).exit_code != 0
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,90 @@
+import sys
+sys.path.append('.')
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from src.find_ideal_segments.core import SequenceNumRotateCalculation
+from src.find_ideal_segments.io.jsonl import JsonlIO
+from src.find_ideal_segments.tool.gccontent import run_tool
+from src.find_ideal_segments.finder.file.variable import findIdealVariableSegmentsonFasta
+from src.find_ideal_segments.finder.file.gccontent import findIdealGCContentSegmentsonFasta
+from src.find_ideal_segments.memory import BASE_OVERHEAD
+from src.find_ideal_segments.finder.file.wordratio import selectedWindowExtended
+
+rng = np.random.default_rng(0)
+
+def naive(arr, ideal_value, min_window, max_window, top, method='mean', step=1, filter_overlapped=True):
+    candidates = []
+    for length in range(min_window, min(max_window, len(arr)) + 1, step):
+        for start in range(len(arr) - length + 1):
+            value = arr[start:start+length].sum()
+            value = value if method == 'sum' else value / length
+            candidates.append((abs(value - ideal_value), start, length, value))
+    candidates.sort(key=lambda i: i[:3])
+    result = []
+    for _, start, length, value in candidates:
+        if len(result) == top:
+            break
+        if filter_overlapped and any(start < s + l and s < start + length for s, l, _ in result):
+            continue
+        result.append((start, length, value))
+    return result
+
+def test_variable_windows():
+    for trial in range(100):
+        n = int(rng.integers(5, 120))
+        arr = rng.integers(0, 2, n).astype(np.uint8) if trial % 2 else rng.random(n)
+        min_window = int(rng.integers(1, n + 1))
+        max_window = int(rng.integers(min_window, n + 5))
+        top, step = int(rng.integers(1, 6)), int(rng.integers(1, 4))
+        method = 'sum' if trial % 5 == 0 else 'mean'
+        filter_overlapped = trial % 3 != 0
+        ideal_value = float(rng.random()) * (max_window if method == 'sum' else 1)
+        # 很小的块和小格数量检查分块和剪枝
+        result = SequenceNumRotateCalculation(min_window, arr).find_ideal_variable_windows(
+            ideal_value, min_window, max_window, top, method, step, filter_overlapped,
+            block_size=int(rng.integers(1, 64)), max_cells=int(rng.integers(1, 50))
+        )
+        expected = naive(arr, ideal_value, min_window, max_window, top, method, step, filter_overlapped)
+        assert [i[:2] for i in result] == [i[:2] for i in expected], trial
+        assert np.allclose([i[2] for i in result], [i[2] for i in expected])
+
+def test_variable_finder(work_dir, create_fasta):
+    sequences = create_fasta('test.fa', 8, length=(30, 300), alphabet='ACGTN')
+    save_path, length = findIdealVariableSegmentsonFasta('test.fa', window=20, max_window=40, top=15, ideal_value=0.55).find(save_path='result.jsonl')
+    with JsonlIO(selectedWindowExtended, save_path) as jio:
+        result = [i.model_dump() for i in jio]
+    assert length == len(result) == 15
+    candidates = []
+    for seq_order, (seq_id, seq) in enumerate(sequences.items()):
+        arr = np.array([c in 'GC' for c in seq], dtype=np.uint8)
+        for start, window, value in naive(arr, 0.55, 20, 40, 15):
+            candidates.append((round(abs(round(value, 4) - 0.55), 4), seq_order, start, window, seq_id))
+    expected = sorted(candidates)[:15]
+    assert [(i['seq_id'], i['start_idx'] - 1, i['end_idx'] - i['start_idx'] + 1) for i in result] == [(i[4], i[2], i[3]) for i in expected]
+    for item in result:
+        seq = sequences[item['seq_id']][item['start_idx'] - 1:item['end_idx']]
+        assert item['seq'] == seq and abs(item['score'] - sum(c in 'GC' for c in seq) / len(seq)) < 1e-4
+
+    runner = CliRunner()
+    cli = runner.invoke(run_tool, ['-i', 'test.fa', '-w', '20', '-W', '40', '-t', '15', '-v', '0.55', '-o', 'cli.jsonl'])
+    assert cli.exit_code == 0, cli.output
+    with JsonlIO(selectedWindowExtended, 'cli.jsonl') as jio:
+        assert [i.model_dump() for i in jio] == result
+    assert runner.invoke(run_tool, ['-i', 'test.fa', '-w', '20', '-W', '10', '-v', '0.5', '-o', 'x.jsonl']).exit_code != 0
+    assert runner.invoke(run_tool, ['-i', 'test.fa', '-w', '20', '-W', '40', '-T', 'GC=0.5', '-o', 'x.jsonl']).exit_code != 0
+
+def test_variable_memory_limit(work_dir, create_fasta):
+    create_fasta('test.fa', 4, length=(2000, 3000))
+    fixed = findIdealGCContentSegmentsonFasta('test.fa', window=20, top=5, ideal_value=0.5, memory_limit='64M')
+    variable = findIdealVariableSegmentsonFasta('test.fa', window=20, max_window=400, top=5, ideal_value=0.5, memory_limit='64M')
+    # 整段读入的子序列、前缀和以及小格的上下界计入预算
+    assert variable.search_bytes(3000) > 3000 * 9 and fixed.search_bytes(3000) == 0
+    assert variable.scan_chunk_size < fixed.scan_chunk_size
+    with pytest.raises(MemoryError):
+        findIdealVariableSegmentsonFasta('test.fa', window=20, max_window=2000, top=5, ideal_value=0.5, memory_limit=BASE_OVERHEAD + (1 << 20))
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))